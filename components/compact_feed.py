@@ -0,0 +1,57 @@
+import html
+import streamlit as st
+from services import pdf_proxy as pp
+
+# Characters of the abstract shown in a compact row
+PREVIEW_CHARS = 240
+
+def _single_line(text):
+    # A blank line would end Markdown's HTML block and show the rest of the row as code
+    return " ".join(str(text).split())
+
+def _row_html(number, research, abstract):
+    abstract = _single_line(abstract or '') or 'No abstract available'
+    if len(abstract) > PREVIEW_CHARS:
+        abstract = abstract[:PREVIEW_CHARS].rstrip() + "..."
+    download_url = pp.download_url(research['file_url'], research['id'], f"{str(research['title'])[:150]}.pdf")
+    return f"""
+    <div class="compact-row">
+        <div class="compact-title"><span class="compact-number">{number}</span>{html.escape(_single_line(research['title']))}</div>
+        <div class="compact-meta">{html.escape(_single_line(research['author_name']))} · {research['year_text'] or 'Year unknown'} · {html.escape(_single_line(research['category']))}</div>
+        <div class="compact-abstract">{html.escape(abstract)}</div>
+        <a class="compact-download" href="{html.escape(download_url)}" target="_blank">Download PDF</a>
+    </div>"""
+
+def display_compact_feed(page_df, abstracts, first_number=1):
+    """
+    Display a page of results as a single HTML block.
+
+    One element per page instead of a dozen widgets per paper keeps reruns fast
+    and small; the caller shows the interactive card only for the paper picked.
+
+    Args:
+        page_df (pd.DataFrame): The papers on the current page.
+        abstracts (dict): Paper id to full abstract.
+        first_number (int, optional): Number shown on the first row. Defaults to 1.
+    """
+    rows = "".join(
+        _row_html(first_number + n, research, abstracts.get(research['id']))
+        for n, (_, research) in enumerate(page_df.iterrows())
+    )
+    st.markdown(f"""
+    <style>
+    .compact-row {{
+        padding: 14px 18px;
+        margin-bottom: 10px;
+        border-radius: 8px;
+        background: #F3E7E7;
+        box-shadow: 0 1px 3px hsl(0deg 0% 0% / 0.12);
+    }}
+    .compact-title {{ font-weight: 600; font-size: 1.05rem; }}
+    .compact-number {{ color: #8a6d6d; margin-right: 8px; }}
+    .compact-meta {{ color: #555; font-size: 0.85rem; margin: 2px 0 6px; }}
+    .compact-abstract {{ font-size: 0.9rem; }}
+    .compact-download {{ font-size: 0.85rem; }}
+    </style>
+    <div class="compact-feed">{rows}</div>
+    """, unsafe_allow_html=True)
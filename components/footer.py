@@ -18,6 +18,7 @@ def display_footer():
         <div class="footer-subtitle">Research Management System</div>
         <div class="footer-college">Mabini Colleges Inc.</div>
         <div class="footer-links">
+            <a href="/researchers">Researchers</a>
             <a href="/about_us">About Us</a>
             <a href="/privacy_policy">Privacy Policy</a>
             <a href="/guide">Guide</a>
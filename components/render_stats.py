@@ -0,0 +1,58 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Totals per measured block: {"runs", "seconds", "bytes", "messages"}
+_totals = {}
+_lock = threading.Lock()
+
+
+@contextmanager
+def measure(name):
+    """
+    Times a block of the page script and sizes the messages it sends to the browser.
+
+    Every element the block draws becomes a message on the session's websocket; their
+    serialized size is what the browser downloads on each rerun. Results are added to
+    process-wide totals under the given name.
+
+    Args:
+        name (str): Label of the block, e.g. "feed:compact".
+    """
+    ctx = get_script_run_ctx()
+    sent = {"bytes": 0, "messages": 0}
+    original_enqueue = getattr(ctx, "_enqueue", None)
+    if original_enqueue is not None:
+        def counting_enqueue(msg):
+            sent["bytes"] += msg.ByteSize()
+            sent["messages"] += 1
+            original_enqueue(msg)
+        ctx._enqueue = counting_enqueue
+    start = time.perf_counter()
+    try:
+        yield sent
+    finally:
+        seconds = time.perf_counter() - start
+        if original_enqueue is not None:
+            ctx._enqueue = original_enqueue
+        with _lock:
+            totals = _totals.setdefault(name, {"runs": 0, "seconds": 0.0, "bytes": 0, "messages": 0})
+            totals["runs"] += 1
+            totals["seconds"] += seconds
+            totals["bytes"] += sent["bytes"]
+            totals["messages"] += sent["messages"]
+
+def summary():
+    """Return the average milliseconds, bytes and messages per run of every measured block"""
+    with _lock:
+        return {
+            name: {
+                "runs": totals["runs"],
+                "ms": 1000 * totals["seconds"] / totals["runs"],
+                "bytes": totals["bytes"] / totals["runs"],
+                "messages": totals["messages"] / totals["runs"],
+            }
+            for name, totals in _totals.items()
+        }
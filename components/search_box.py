@@ -0,0 +1,38 @@
+import streamlit as st
+from streamlit_searchbox import st_searchbox
+from services import suggest_service as sg
+
+
+@st.fragment
+def display_search_box(research_df, placeholder="Enter keywords, title, or author name"):
+    """
+    Display the search box with typeahead suggestions for authors, keywords and titles.
+
+    Typing only reruns this fragment and reads the prefix index, so the
+    search pipeline runs once, when a query is submitted.
+    """
+    prefix_index = sg.get_prefix_index(research_df)
+
+    def suggest(search_term):
+        if not search_term:
+            return []
+        # The typed text is always the first option so free-text queries still work
+        options = [(f"🔍 {search_term}", search_term)]
+        for display, kind in prefix_index.lookup(search_term):
+            if display != search_term:
+                options.append((f"{display} · {kind}", display))
+        return options
+
+    selected_query = st_searchbox(
+        suggest,
+        placeholder=placeholder,
+        label="Search",
+        default=st.session_state.search_query or None,
+        key="search_input",
+        # The component reruns the whole app after each update unless told otherwise
+        rerun_scope="fragment",
+    )
+    if (selected_query or "") != st.session_state.search_query:
+        st.session_state.search_query = selected_query or ""
+        st.session_state.page_num = 0
+        st.rerun()
@@ -0,0 +1,30 @@
+import streamlit as st
+from services import warmup_service as ws
+
+def display_loading_skeleton():
+    """
+    Display placeholder cards while this server process finishes warming up, then reload the page.
+    """
+    st.markdown("""
+    <style>
+    .skeleton-card {
+        height: 120px;
+        margin-bottom: 16px;
+        border-radius: 8px;
+        background: linear-gradient(90deg, #f0f0f0 25%, #e4e4e4 50%, #f0f0f0 75%);
+        background-size: 200% 100%;
+        animation: skeleton-shimmer 1.5s infinite;
+    }
+    @keyframes skeleton-shimmer {
+        0% { background-position: 200% 0; }
+        100% { background-position: -200% 0; }
+    }
+    </style>
+    """ + '<div class="skeleton-card"></div>' * 4, unsafe_allow_html=True)
+    _wait_for_warm_up()
+
+@st.fragment(run_every=1)
+def _wait_for_warm_up():
+    if not ws.is_warming():
+        st.rerun()
+    st.caption(f"Getting the library ready: {ws.status()['step']}...")
@@ -1,47 +1,29 @@
 import streamlit as st
 from services import sheets_service as ss
-from services import drive_service as ds
-from fuzzywuzzy import fuzz
-import pandas as pd
-import requests
-import re
+from services import catalog_service as cs
+from services import search_service as se
+from services import facet_service as fc
+from services import fulltext_service as ft
+from services import researcher_service as rd
+from services import job_queue as jq
+from services import publish_service as ps
+from services import sheet_journal as sj
+from services import image_service as img
+from services import metrics_service as ms
+from services import warmup_service as ws
+from services import profiler_service as prof
 import time
 from components.footer import display_footer
+from components.search_box import display_search_box
+from components.skeleton import display_loading_skeleton
+from components import render_stats
 
 
-# Load and cache data with preprocessing
-@st.cache_data
-def load_research_data():
-    """Load and cache research data with preprocessing for faster searching"""
-    data = ss.get_data_ls_dict("research_data")
-    df = pd.DataFrame(data)
-    
-    # Preprocess for searching
-    def preprocess_text(text):
-        return str(text).lower().strip()
-    
-    df['search_field'] = (
-        df['title'].apply(preprocess_text) + ' ' +
-        df['author_name'].apply(preprocess_text) + ' ' +
-        df['keywords'].apply(preprocess_text)
-    )
-    
-    df['created_year'] = pd.to_numeric(df['created_year'], errors='coerce')
-    return df
-
 # Function to fetch image from Google Drive link
 @st.cache_data
 def fetch_image_from_gdrive(gdrive_url):
     try:
-        match = re.search(r"/d/([a-zA-Z0-9_-]+)", gdrive_url)
-        if not match:
-            return None
-        file_id = match.group(1)
-        direct_url = f"https://drive.google.com/uc?export=download&id={file_id}"
-        response = requests.get(direct_url, stream=True)
-        if response.status_code == 200:
-            return response.content
-        return None
+        return img.fetch_drive_image(gdrive_url)
     except Exception as e:
         st.warning(f"Error fetching image: {e}")
         return None
@@ -89,7 +71,6 @@ def upload_paper_dialog(research_df):
     button_col1, button_col2 = st.columns([1, 3])
     with button_col1:
         publish_button = st.button("Publish Paper", type="primary", use_container_width=True)
-        st.cache_data.clear()
     
     message_container = st.empty()
     if publish_button:
@@ -105,31 +86,136 @@ def upload_paper_dialog(research_df):
             message_container.error(f"Please fill in all required fields: {', '.join(missing_fields)}")
         else:
             try:
-                with st.spinner("Publishing paper..."):
-                    author_img_url = ds.upload_img(author_img_file)
-                    file_url = ds.upload_pdf(paper_file)
-                    ss.post_add_new_paper(
-                        title=title,
-                        abstract=abstract,
-                        author_name=author_name,
-                        author_img_url=author_img_url,
-                        category=category,
-                        created_year=created_year,
-                        keywords=keywords,
-                        file_url=file_url
-                    )
-                st.toast("Paper published successfully!", icon="✅")
-                time.sleep(1)
+                # Uploads run in the background job queue so the page stays responsive
+                ps.submit_publish(
+                    title=title,
+                    abstract=abstract,
+                    author_name=author_name,
+                    category=category,
+                    created_year=created_year,
+                    keywords=keywords,
+                    author_img_file=author_img_file,
+                    paper_file=paper_file
+                )
+                st.toast("Paper queued for publishing", icon="⏳")
                 st.rerun()
             except Exception as e:
                 message_container.error(f"Error publishing paper: {str(e)}")
 
+# Define the edit paper dialog
+@st.dialog("Edit Paper", width="large")
+def edit_paper_dialog(research_df, research, abstract):
+    st.caption("Only the fields you change are written to the database")
+    original = {
+        'title': str(research['title']),
+        'author_name': str(research['author_name']),
+        'category': str(research['category']),
+        'created_year': str(research['year_text']),
+        'keywords': str(research['keywords']),
+        'abstract': abstract,
+    }
+
+    col1, col2 = st.columns(2)
+    with col1:
+        title = st.text_input("Title", value=original['title'])
+        author_name = st.text_input("Author Name", value=original['author_name'])
+        category_options = ["Hospital", "Community", "Others"]
+        if original['category'] not in category_options:
+            category_options.append(original['category'])
+        category = st.selectbox("Category", category_options, index=category_options.index(original['category']))
+        created_year = st.number_input("Year Published", min_value=1900, max_value=2100, value=int(research['created_year']) if original['created_year'] else None)
+        keywords = st.text_input("Keywords (comma separated)", value=original['keywords'])
+    with col2:
+        new_abstract = st.text_area("Abstract", value=abstract, height=250)
+
+    edited = {
+        'title': title,
+        'author_name': author_name,
+        'category': category,
+        # Left empty when the sheet has no year, instead of filling one in
+        'created_year': '' if created_year is None else str(created_year),
+        'keywords': keywords,
+        'abstract': new_abstract,
+    }
+    changes = {col: value for col, value in edited.items() if value != str(original[col])}
+
+    message_container = st.empty()
+    if st.button("Save Changes", type="primary", disabled=not changes):
+        if not title or not author_name:
+            message_container.error("Title and Author Name cannot be empty")
+            return
+        try:
+            cs.update_paper(
+                research_df,
+                research['id'],
+                {col: original[col] for col in changes},
+                {col: int(value) if col == 'created_year' and value else value for col, value in changes.items()}
+            )
+            st.toast("Paper updated", icon="✏️")
+            st.rerun()
+        except ss.RowConflictError:
+            message_container.error("This paper was changed by someone else. Refresh the data and try again.")
+        except Exception as e:
+            message_container.error(f"Error updating paper: {str(e)}")
+
+# Define the delete paper dialog
+@st.dialog("Delete Paper")
+def delete_paper_dialog(research_df, research):
+    st.write(f"Delete **{research['title']}** by {research['author_name']}?")
+    st.caption("The row is removed from the research sheet. The files stay on Drive.")
+    message_container = st.empty()
+    if st.button("Delete", type="primary"):
+        try:
+            cs.delete_paper(research_df, research['id'])
+            st.toast("Paper deleted", icon="🗑️")
+            st.rerun()
+        except ss.RowConflictError:
+            message_container.error("This paper was changed by someone else. Refresh the data and try again.")
+        except Exception as e:
+            message_container.error(f"Error deleting paper: {str(e)}")
+
+# Poll publish jobs without rerunning the whole page
+@st.fragment(run_every=2)
+def display_publish_jobs():
+    jobs = ps.list_publish_jobs(limit=5, since=time.time() - 24 * 60 * 60)
+    journal = sj.status()
+    # Papers saved locally stay "active" until the journal has written them to the sheet
+    active = any(job['status'] in (jq.QUEUED, jq.RUNNING) for job in jobs) or journal['pending'] > 0
+    # Reload the feed once the last running job finishes
+    if st.session_state.get('publish_jobs_active') and not active:
+        st.session_state.publish_jobs_active = False
+        st.rerun()
+    st.session_state.publish_jobs_active = active
+    for job in jobs:
+        title = job['payload']['fields']['title']
+        if job['status'] == jq.DONE:
+            st.caption(f"✅ Published: {title}")
+        elif job['status'] == jq.FAILED:
+            error_col, retry_col = st.columns([5, 1], vertical_alignment='center')
+            error_col.error(f"Failed to publish {title}: {job['error']}")
+            if retry_col.button("Retry", key=f"retry_job_{job['id']}", use_container_width=True):
+                jq.retry(job['id'])
+                st.rerun(scope="fragment")
+        elif job['status'] == jq.RUNNING:
+            st.info(f"⏳ {title}: {ps.STAGE_LABELS.get(job['stage'], 'Working')}...")
+        else:
+            st.info(f"🕒 {title}: waiting to start")
+    if journal['pending']:
+        message = f"📮 {journal['pending']} paper(s) saved, waiting to be written to Google Sheets"
+        if journal['last_error']:
+            message += f" (retrying: {journal['last_error']})"
+        st.caption(message)
+
+# Wait for this server process to load the catalog and indexes
+ws.start()
+if ws.is_warming():
+    display_loading_skeleton()
+    st.stop()
+
 # Initialize data
-research_df = load_research_data()
+research_df = cs.get_research_data()
 
 # Initialize session state
-if 'filtered_data' not in st.session_state:
-    st.session_state.filtered_data = research_df
 if 'page_num' not in st.session_state:
     st.session_state.page_num = 0
 if 'search_query' not in st.session_state:
@@ -146,80 +232,37 @@ if min_year == max_year:
 if 'year_range' not in st.session_state:
     st.session_state.year_range = (min_year, max_year)
 
-# Optimized filtering function
-def apply_filters(df, categories, keywords, year_range):
-    filtered_df = df.copy()
-    if categories:
-        filtered_df = filtered_df[filtered_df['category'].isin(categories)]
-    if keywords:
-        keyword_list = [k.strip().lower() for k in keywords.split(',')]
-        mask = filtered_df['keywords'].str.lower().apply(
-            lambda x: any(k in x for k in keyword_list)
-        )
-        filtered_df = filtered_df[mask]
-    year_min, year_max = year_range
-    filtered_df = filtered_df[
-        (filtered_df['created_year'] >= year_min) & 
-        (filtered_df['created_year'] <= year_max)
-    ]
-    return filtered_df
-
-# Optimized search function
-def search_data(df, query, threshold=70):
-    if not query:
-        return df
-    query = query.lower().strip()
-    exact_mask = df['search_field'].str.contains(query, na=False)
-    exact_matches = df[exact_mask]
-    if len(exact_matches) >= 10:
-        return exact_matches
-    df['match_score'] = df['search_field'].apply(
-        lambda x: fuzz.partial_ratio(query, x)
-    )
-    fuzzy_matches = df[df['match_score'] >= threshold].sort_values('match_score', ascending=False)
-    return fuzzy_matches.drop(columns=['match_score'])
-
-# Sorting function
-def sort_data(df, sort_option):
-    if sort_option == "Alphabetical (A-Z)":
-        return df.sort_values('title')
-    elif sort_option == "Alphabetical (Z-A)":
-        return df.sort_values('title', ascending=False)
-    elif sort_option == "Year (Newest First)":
-        return df.sort_values('created_year', ascending=False)
-    elif sort_option == "Year (Oldest First)":
-        return df.sort_values('created_year')
-    return df  # Default case returns unsorted (Relevance)
-
-def update_search():
-    st.session_state.filtered_data = search_data(
-        apply_filters(
-            research_df,
-            input_category_bar, 
-            input_keywords_bar, 
-            year_range
-        ), 
-        st.session_state.search_input
-    )
-    st.session_state.search_query = st.session_state.search_input
-    st.session_state.page_num = 0
-
 # Sidebar for filters
 with st.sidebar:
     st.header("Filter Research Papers")
     st.caption("Narrow down research results using the options below")
     
+    # Facet counts for the current query and applied filters, from precomputed bitmaps
+    facets = fc.facet_counts(
+        research_df,
+        st.session_state.search_query,
+        st.session_state.get('filter_categories', []),
+        st.session_state.get('filter_keywords', ''),
+        st.session_state.year_range
+    )
+    
     with st.form(key="filter_form"):
         categories = sorted(research_df['category'].dropna().unique())
         input_category_bar = st.multiselect(
             label="Categories", 
             options=categories,
-            placeholder="Select one or more categories"
+            format_func=lambda category: f"{category} ({facets['category'].get(category, 0)})",
+            placeholder="Select one or more categories",
+            key="filter_categories"
         )
         input_keywords_bar = st.text_input(
             label="Keywords", 
-            placeholder="e.g., machine learning, climate, healthcare"
+            placeholder="e.g., machine learning, climate, healthcare",
+            key="filter_keywords"
         )
+        top_keywords = [f"{keyword} ({count})" for keyword, count in facets['keyword'].items() if count]
+        if top_keywords:
+            st.caption(f"Top keywords: {', '.join(top_keywords)}")
         year_range = st.slider(
             "Publication Year",
             min_value=min_year,
@@ -228,23 +271,21 @@ with st.sidebar:
             step=2,
             key="year_range"
         )
+        year_counts = [f"{bucket}: {count}" for bucket, count in facets['year'].items() if count]
+        if year_counts:
+            st.caption(" · ".join(year_counts))
         filter_button = st.form_submit_button(
             label="Apply Filters", 
             type="primary",
             use_container_width=True
         )
         if filter_button:
-            st.session_state.filtered_data = apply_filters(
-                research_df,
-                input_category_bar, 
-                input_keywords_bar, 
-                year_range
-            )
             st.session_state.page_num = 0
     
     with st.expander("Admin Help"):
         st.markdown("""
-        - **Search**: Find papers by title, abstract, or author
+        - **Search**: Find papers by title, author, keywords, or text inside the PDF
+        - **Advanced search**: Combine `author:Santos`, `title:`, `category:Hospital`, `keyword:`, `year:2019..2023`, "exact phrases" and `-excluded` words
         - **Categories**: Filter by research categories
         - **Keywords**: Use comma-separated keywords
         - **Year Range**: Limit by publication years
@@ -260,14 +301,103 @@ with feed_col:
     st.image(r"static/images/admin-header_resized.svg", use_container_width=True)
  
     # Admin actions
-    admin_cols = st.columns(2)
+    admin_cols = st.columns(3)
     with admin_cols[0]:
         if st.button("📄 Upload New Paper", type="primary", use_container_width=True):
             upload_paper_dialog(research_df)
     with admin_cols[1]:
         if st.button("🔄 Refresh Data", use_container_width=True):
             st.cache_data.clear()
+            cs.invalidate_research_data()
             st.rerun()
+    with admin_cols[2]:
+        with st.popover("🛠️ Maintenance", use_container_width=True):
+            indexed_count = ft.store_version()[0]
+            st.caption(f"Full text indexed for {indexed_count} of {len(research_df)} papers")
+            if st.button("Index full text of existing papers", use_container_width=True):
+                queued = ft.backfill(research_df)
+                st.toast(f"Queued {queued} papers for full-text indexing", icon="📑")
+            st.divider()
+            image_totals = img.get_totals()
+            if image_totals['images']:
+                st.caption(
+                    f"Author images normalized: {image_totals['images']}, "
+                    f"{(image_totals['bytes_before'] - image_totals['bytes_after']) / 1024:.0f} KB saved"
+                )
+            if st.button("Re-encode existing author images", use_container_width=True):
+                img.submit_backfill(research_df['author_img_url'])
+                st.toast("Author image re-encoding queued", icon="🖼️")
+            last_backfill = img.last_backfill()
+            if last_backfill and last_backfill['status'] == jq.DONE:
+                backfill_result = last_backfill['results']['reencode']
+                st.caption(
+                    f"Last re-encode: {backfill_result['images']} images, "
+                    f"{backfill_result['bytes_saved'] / 1024:.0f} KB saved, {backfill_result['failed']} failed"
+                )
+            elif last_backfill and last_backfill['status'] == jq.FAILED:
+                st.caption(f"Last re-encode failed: {last_backfill['error']}")
+            elif last_backfill:
+                st.caption("Re-encoding author images...")
+            st.divider()
+            cache_stats = se.result_cache.stats()
+            st.caption(
+                f"Query cache: {cache_stats['entries']} results, "
+                f"{cache_stats['bytes'] / 1024:.0f} of {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB · "
+                f"{cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['evictions']} evictions"
+            )
+            warmup = ws.status()
+            if warmup['ready_at']:
+                st.caption(f"Server warm-up took {warmup['ready_at'] - warmup['started_at']:.1f} s")
+            elif warmup['error']:
+                st.caption(f"Server warm-up is retrying after an error: {warmup['error']}")
+            for name, render in sorted(render_stats.summary().items()):
+                st.caption(
+                    f"Visitor {name.split(':')[1]} feed: {render['ms']:.0f} ms, "
+                    f"{render['bytes'] / 1024:.1f} KB in {render['messages']:.0f} messages per page "
+                    f"({render['runs']} pages)"
+                )
+            memory = cs.memory_report(research_df)
+            st.caption(
+                f"Catalog memory: {memory['bytes_per_row']:,.0f} bytes per paper "
+                f"(was {memory['bytes_per_row_before']:,.0f} with string columns and a search field)"
+            )
+            st.divider()
+            # Sampling profiler for this session's next reruns; the files open in speedscope or flamegraph.pl
+            profile_runs = st.number_input("Reruns to profile", min_value=1, max_value=20, value=3, key="profile_count")
+            if st.button("Profile my next reruns", use_container_width=True):
+                st.session_state[prof.SESSION_KEY] = profile_runs
+            if st.session_state.get(prof.SESSION_KEY):
+                st.caption(f"Profiling the next {st.session_state[prof.SESSION_KEY]} reruns of this session")
+            # Only the chosen profile is read, not every listed one on every rerun
+            profile_sizes = {p['name']: p['bytes'] for p in prof.list_profiles(limit=10)}
+            profile_name = st.selectbox(
+                "Saved profiles",
+                list(profile_sizes),
+                index=None,
+                format_func=lambda name: f"{name} ({profile_sizes[name] / 1024:.0f} KB)",
+                placeholder="Choose a profile to download",
+                key="profile_name"
+            )
+            if profile_name:
+                try:
+                    profile_data = prof.read_profile(profile_name)
+                except FileNotFoundError:
+                    # Trimmed from the profile folder since it was listed
+                    st.caption("That profile was removed; choose another")
+                else:
+                    st.download_button(
+                        "Download profile",
+                        data=profile_data,
+                        file_name=profile_name,
+                        mime="text/plain",
+                        key="profile_download",
+                        use_container_width=True
+                    )
+
+    # Background publish progress
+    jq.start_workers()
+    sj.start()
+    display_publish_jobs()
 
     # Search bar and sort options
     st.markdown("""
@@ -279,20 +409,16 @@ with feed_col:
     """, unsafe_allow_html=True)
     
     search_bar_col, sort_col = st.columns([10, 1], vertical_alignment='center')
-    search_query = search_bar_col.text_input(
-        "Search", 
-        placeholder="Enter keywords, title, or author name",
-        key="search_input",
-        value=st.session_state.search_query,
-        on_change=update_search,
-    )
+    with search_bar_col:
+        display_search_box(research_df)
     with sort_col.popover(" "):
         sort_options = [
             "Relevance",
             "Alphabetical (A-Z)",
             "Alphabetical (Z-A)",
             "Year (Newest First)",
-            "Year (Oldest First)"
+            "Year (Oldest First)",
+            "Most viewed"
         ]
         selected_sort = st.radio(
             "Sort by:",
@@ -304,22 +430,25 @@ with feed_col:
             st.session_state.sort_option = selected_sort
             st.rerun()
 
-    # Apply search when query changes
-    if search_query != st.session_state.search_query:
-        st.session_state.search_query = search_query
-        filtered_by_criteria = apply_filters(
-            research_df,
-            input_category_bar, 
-            input_keywords_bar, 
-            year_range
-        )
-        st.session_state.filtered_data = search_data(filtered_by_criteria, search_query)
-        st.session_state.page_num = 0
-
     # Display results
-    filtered_data = sort_data(st.session_state.filtered_data, st.session_state.sort_option)
+    result_positions = se.run_query(
+        research_df,
+        st.session_state.search_query,
+        input_category_bar,
+        input_keywords_bar,
+        year_range,
+        st.session_state.sort_option
+    )
+    filtered_data = research_df.iloc[result_positions]
     total_items = len(filtered_data)
     st.write(f"Showing {total_items} results")
+    # Explaining re-runs the plan with timings, so only do it when asked
+    if st.session_state.search_query and st.toggle("Explain query", key="explain_query"):
+        query_plan = se.explain_query(research_df, st.session_state.search_query, input_category_bar, input_keywords_bar, year_range)
+        if query_plan:
+            st.code(query_plan, language=None)
+        else:
+            st.caption("Plain text searches have no query plan")
     if total_items == 0:
         st.info("No papers found.")
 
@@ -331,25 +460,40 @@ with feed_col:
     start_idx = st.session_state.page_num * items_per_page
     end_idx = min(start_idx + items_per_page, total_items)
 
+    # Usage counters, including counts not flushed yet
+    view_counts = ms.get_counts(ms.VIEW)
+    download_counts = ms.get_counts(ms.DOWNLOAD)
+    copy_counts = ms.get_counts(ms.CITATION_COPY)
+
+    # Full abstracts are read for the current page only
+    page_abstracts = cs.get_abstracts(filtered_data.iloc[start_idx:end_idx], cs.catalog_version(research_df))
+
     # Display research items
     for i in range(start_idx, end_idx):
         if i < len(filtered_data):
             research = filtered_data.iloc[i]
             with st.container(key=f"feed_container_{i}"):
                 st.markdown(f"##### {research['title']}")
-                st.caption(f"**Category:** {research.get('category', 'Uncategorized')}")
+                paper_key = str(research['id'])
+                st.caption(
+                    f"**Category:** {research.get('category', 'Uncategorized')} · "
+                    f"👁 {view_counts.get(paper_key, 0)} views · "
+                    f"⬇ {download_counts.get(paper_key, 0)} downloads · "
+                    f"❝ {copy_counts.get(paper_key, 0)} citations copied"
+                )
                 
                 col1, col2, col3 = st.columns([2, 2, 1])
                 with col1:
                     author_name = research.get('author_name', 'Unknown')
                     if st.button(f"**Author:** {author_name}", key=f"author_btn_{i}"):
                         author_img_url = research.get('author_img_url', '')
-                        author_research = research_df[research_df['author_name'] == author_name]['title'].tolist()
+                        author_research = rd.get_directory(research_df).titles(research_df, author_name)
                         show_author_details(author_name, author_img_url, author_research)
-                    st.markdown(f"**Year:** {int(research.get('created_year', 'Unknown')) if pd.notnull(research.get('created_year')) else 'Unknown'}")
+                    st.markdown(f"**Year:** {research['year_text'] or 'Unknown'}")
                 
                 with col2:
-                    abstract_preview = research.get('abstract', 'No abstract available')
+                    abstract = page_abstracts.get(research['id']) or 'No abstract available'
+                    abstract_preview = abstract
                     if len(abstract_preview) > 100:
                         abstract_preview = abstract_preview[:100] + "..."
                     st.markdown(f"**Abstract:** {abstract_preview}")
@@ -357,9 +501,13 @@ with feed_col:
                 with col3:
                     if 'file_url' in research:
                         st.link_button("📄 View PDF", url=research['file_url'], use_container_width=True)
+                    if st.button("✏️ Edit", key=f"edit_btn_{i}", use_container_width=True):
+                        edit_paper_dialog(research_df, research, page_abstracts.get(research['id'], ''))
+                    if st.button("🗑️ Delete", key=f"delete_btn_{i}", use_container_width=True):
+                        delete_paper_dialog(research_df, research)
                 
                 with st.expander("View full abstract"):
-                    st.write(research.get('abstract', 'No abstract available'))
+                    st.write(abstract)
                     
     # Pagination controls
     if total_pages > 1:
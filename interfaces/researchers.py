@@ -0,0 +1,107 @@
+import streamlit as st
+from services import catalog_service as cs
+from services import researcher_service as rd
+from services import image_service as img
+from services import warmup_service as ws
+from components.footer import display_footer
+from components.skeleton import display_loading_skeleton
+
+# Researcher cards per page
+PAGE_SIZE = 12
+
+
+# Function to fetch image from Google Drive link
+@st.cache_data
+def fetch_image_from_gdrive(gdrive_url):
+    try:
+        return img.fetch_drive_image(gdrive_url)
+    except Exception:
+        return None
+
+def display_photo(img_url, width):
+    """Show a researcher's photo, or a placeholder when there is none"""
+    image_data = fetch_image_from_gdrive(img_url) if img_url and "drive.google.com" in img_url else None
+    st.image(image_data or "https://via.placeholder.com/200", width=width)
+
+def year_range(entry):
+    """Format the years a researcher published in"""
+    if entry['first_year'] is None:
+        return "Year unknown"
+    if entry['first_year'] == entry['last_year']:
+        return str(entry['first_year'])
+    return f"{entry['first_year']}–{entry['last_year']}"
+
+# Define the researcher details dialog
+@st.dialog("Researcher Details", width="large")
+def show_researcher_details(research_df, entry):
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        display_photo(entry['img_url'], 200)
+        for field, value in entry['profile'].items():
+            st.caption(f"**{field.replace('_', ' ').title()}:** {value}")
+    with col2:
+        st.subheader(entry['name'])
+        st.write(f"{entry['paper_count']} papers · {year_range(entry)}")
+        if entry['keywords']:
+            st.write("**Keywords:** " + ", ".join(entry['keywords']))
+        st.write("### Research Papers")
+        papers = research_df.iloc[entry['positions']]
+        for title, year in zip(papers['title'], papers['year_text']):
+            st.write(f"- {title} ({year or 'n.d.'})")
+
+# Wait for this server process to load the catalog and indexes
+ws.start()
+if ws.is_warming():
+    display_loading_skeleton()
+    st.stop()
+
+research_df = cs.get_research_data()
+directory = rd.get_directory(research_df)
+
+if 'researcher_page' not in st.session_state:
+    st.session_state.researcher_page = 0
+
+def reset_researcher_page():
+    st.session_state.researcher_page = 0
+
+_, feed_col, _ = st.columns([1, 8, 1])
+
+with feed_col:
+    st.markdown("<h1 class='page-title'>Researchers</h1>", unsafe_allow_html=True)
+    st.markdown(f"<p class='page-subtitle'>{len(directory)} researchers in the E-LAMP catalog</p>", unsafe_allow_html=True)
+
+    name_filter = st.text_input("Find a researcher", placeholder="Type a name", on_change=reset_researcher_page)
+    entries = directory.search(name_filter)
+    total_pages = max((len(entries) + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+    st.session_state.researcher_page = min(st.session_state.researcher_page, total_pages - 1)
+    start_idx = st.session_state.researcher_page * PAGE_SIZE
+
+    if not entries:
+        st.info("No researchers match your search.")
+
+    for row_start in range(start_idx, min(start_idx + PAGE_SIZE, len(entries)), 3):
+        cols = st.columns(3)
+        for col, entry in zip(cols, entries[row_start:row_start + 3]):
+            with col, st.container(border=True):
+                display_photo(entry['img_url'], 120)
+                st.markdown(f"**{entry['name']}**")
+                st.caption(f"{entry['paper_count']} papers · {year_range(entry)}")
+                if entry['categories']:
+                    st.caption(", ".join(entry['categories']))
+                if st.button("View profile", key=f"researcher_{entry['key']}"):
+                    show_researcher_details(research_df, entry)
+
+    if total_pages > 1:
+        prev_col, page_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button("← Previous", disabled=st.session_state.researcher_page == 0):
+                st.session_state.researcher_page -= 1
+                st.rerun()
+        with page_col:
+            st.markdown(f"<p style='text-align:center'>Page {st.session_state.researcher_page + 1} of {total_pages}</p>", unsafe_allow_html=True)
+        with next_col:
+            if st.button("Next →", disabled=st.session_state.researcher_page >= total_pages - 1):
+                st.session_state.researcher_page += 1
+                st.rerun()
+
+display_footer()
@@ -1,11 +1,23 @@
+import os
 import streamlit as st
-from services import sheets_service as ss
-from services import drive_service as ds
-from fuzzywuzzy import fuzz
-import pandas as pd
-import requests
-import re
+from services import catalog_service as cs
+from services import search_service as se
+from services import facet_service as fc
+from services import recommender_service as rs
+from services import researcher_service as rd
+from services import citation_service as cit
+from services import bulk_download_service as bd
+from services import job_queue as jq
+from services import preview_service as pv
+from services import metrics_service as ms
+from services import warmup_service as ws
+from services import pdf_proxy as pp
+from services import image_service as img
 from components.footer import display_footer
+from components.search_box import display_search_box
+from components.skeleton import display_loading_skeleton
+from components.compact_feed import display_compact_feed
+from components import render_stats
 
 # This CSS will override the global .stMain style for the current page
 page_bg_css = """
@@ -22,38 +34,11 @@ st.markdown(page_bg_css, unsafe_allow_html=True)
     
     
 
-# Load and cache data with preprocessing
-@st.cache_data
-def load_research_data():
-    """Load and cache research data with preprocessing for faster searching"""
-    data = ss.get_data_ls_dict("research_data")
-    df = pd.DataFrame(data)
-    
-    def preprocess_text(text):
-        return str(text).lower().strip()
-    
-    df['search_field'] = (
-        df['title'].apply(preprocess_text) + ' ' +
-        df['author_name'].apply(preprocess_text) + ' ' +
-        df['keywords'].apply(preprocess_text)
-    )
-    
-    df['created_year'] = pd.to_numeric(df['created_year'], errors='coerce')
-    return df
-
 # Function to fetch image from Google Drive link
 @st.cache_data
 def fetch_image_from_gdrive(gdrive_url):
     try:
-        match = re.search(r"/d/([a-zA-Z0-9_-]+)", gdrive_url)
-        if not match:
-            return None
-        file_id = match.group(1)
-        direct_url = f"https://drive.google.com/uc?export=download&id={file_id}"
-        response = requests.get(direct_url, stream=True)
-        if response.status_code == 200:
-            return response.content
-        return None
+        return img.fetch_drive_image(gdrive_url)
     except Exception as e:
         st.warning(f"Error fetching image: {e}")
         return None
@@ -77,31 +62,116 @@ def show_author_details(author_name, author_img_url, created_research):
         for research in created_research:
             st.write(f"- {research}")
 
-# Sorting function
-def sort_data(df, sort_option):
-    """Sort the DataFrame based on selected option"""
-    if sort_option == "Alphabetical (A-Z)":
-        return df.sort_values('title')
-    elif sort_option == "Alphabetical (Z-A)":
-        return df.sort_values('title', ascending=False)
-    elif sort_option == "Year (Newest First)":
-        return df.sort_values('created_year', ascending=False, na_position='last')
-    elif sort_option == "Year (Oldest First)":
-        return df.sort_values('created_year', na_position='last')
-    return df  # Default case returns unsorted
+# Display one result with its author, download, citation and related-paper widgets
+def display_research_item(i, research, abstract, research_df, related_index, catalog_positions):
+    with st.container(key=f"feed_container_{i}"):
+        st.markdown(f"##### {research['title']}")
+        st.caption(f"**Category:** {research.get('category', 'Uncategorized')}")
+        
+        preview_col, col1, col2, col3 = st.columns([1, 2, 2, 1])
+        
+        with preview_col:
+            # First-page previews are rendered once in a worker process and cached
+            preview_path = pv.get_preview(research['file_url'])
+            if preview_path:
+                st.image(preview_path, use_container_width=True)
+            elif pv.preview_unavailable(research['file_url']):
+                st.caption("No preview")
+            else:
+                pv.request_preview(research['file_url'])
+                st.caption("Preview is being prepared")
+        
+        with col1:
+            author_name = research.get('author_name', 'Unknown')
+            if st.button(f"**Author:** {author_name}", key=f"author_btn_{i}"):
+                author_img_url = research.get('author_img_url', '')
+                author_research = rd.get_directory(research_df).titles(research_df, author_name)
+                show_author_details(author_name, author_img_url, author_research)
+            st.markdown(f"**Year:** {research['year_text'] or 'Unknown'}")
+        
+        with col2:
+            abstract = abstract or 'No abstract available'
+            abstract_preview = abstract
+            if len(abstract_preview) > 100:
+                abstract_preview = abstract_preview[:100] + "..."
+            st.markdown(f"**Abstract:** {abstract_preview}")
+        
+        with col3:
+            # Through the caching PDF proxy when it is enabled, which also counts the download
+            st.link_button("Download", url=pp.download_url(research['file_url'], research['id'], f"{str(research['title'])[:150]}.pdf"), use_container_width=True)
+            
+            with st.popover("Cite", use_container_width=True):
+                tab1, tab2 = st.tabs(["APA", "MLA"])
+                with tab1:
+                    st.code(research['cite_apa'], language=None)
+                    st.button("Copy", key=f"copy_apa_{i}", use_container_width=True, on_click=ms.record, args=(ms.CITATION_COPY, research['id']))
+                with tab2:
+                    st.code(research['cite_mla'], language=None)
+                    st.button("Copy", key=f"copy_mla_{i}", use_container_width=True, on_click=ms.record, args=(ms.CITATION_COPY, research['id']))
+
+            with st.popover("Related", use_container_width=True):
+                related = [
+                    related_id for related_id, _ in related_index.related(research['id'])
+                    if related_id in catalog_positions
+                ]
+                if not related:
+                    st.caption("No related papers found.")
+                for related_id in related:
+                    related_paper = research_df.iloc[catalog_positions[related_id]]
+                    st.markdown(f"**{related_paper['title']}**  \n{related_paper['author_name']} · {related_paper['year_text'] or 'n.d.'}")
+        
+        with st.expander("View full abstract"):
+            st.write(abstract)
+
+# Poll a ZIP job without rerunning the whole page; rerun it once the archive is ready
+@st.fragment(run_every=2)
+def display_zip_progress(job_id):
+    zip_job = bd.get_zip_job(job_id)
+    if zip_job is None or zip_job['status'] in (jq.DONE, jq.FAILED):
+        st.rerun()
+    if zip_job['status'] == jq.RUNNING:
+        st.caption("⏳ Collecting PDFs...")
+    else:
+        st.caption("🕒 Waiting to start...")
+
+def display_zip_download(zip_job, paper_count):
+    if zip_job['papers'] < paper_count:
+        st.caption(f"{paper_count - zip_job['papers']} papers could not be fetched; see MISSING.txt in the archive.")
+    zip_url = pp.zip_url(zip_job['file_name'])
+    if zip_url:
+        st.link_button("Download ZIP", url=zip_url, use_container_width=True)
+        return
+    # Without the proxy the archive goes through Streamlit, which holds it in memory
+    path = bd.archive_path(zip_job['file_name'])
+    if path and os.path.getsize(path) <= bd.MAX_INLINE_BYTES:
+        with open(path, "rb") as f:
+            st.download_button("Download ZIP", data=f.read(), file_name="papers.zip", mime="application/zip", use_container_width=True)
+    elif path:
+        st.caption("This archive is too large to download here. Choose fewer papers.")
+    else:
+        st.caption("This archive expired. Prepare it again.")
+
+# Wait for this server process to load the catalog and indexes
+ws.start()
+pp.start()
+if ws.is_warming():
+    display_loading_skeleton()
+    st.stop()
 
 # Initialize data
-research_df = load_research_data()
+# Paper text is loaded by the search itself, only for the years it covers
+research_df = cs.get_research_data(fulltext=False)
 
 # Initialize session state
-if 'filtered_data' not in st.session_state:
-    st.session_state.filtered_data = research_df
 if 'page_num' not in st.session_state:
     st.session_state.page_num = 0
 if 'search_query' not in st.session_state:
     st.session_state.search_query = ""
 if 'sort_option' not in st.session_state:
     st.session_state.sort_option = "Relevance"  # Default sort
+if 'compact_feed' not in st.session_state:
+    # One HTML block per page, with widgets only for the opened paper
+    st.session_state.compact_feed = os.environ.get("ELAMP_COMPACT_FEED", "1") == "1"
 
 # Extract year data for filtering
 years = research_df['created_year'].dropna()
@@ -112,71 +182,37 @@ if min_year == max_year:
 if 'year_range' not in st.session_state:
     st.session_state.year_range = (min_year, max_year)
 
-# Optimized filtering function
-def apply_filters(df, categories, keywords, year_range):
-    """Filter research data using pandas for better performance"""
-    filtered_df = df.copy()
-    if categories:
-        filtered_df = filtered_df[filtered_df['category'].isin(categories)]
-    if keywords:
-        keyword_list = [k.strip().lower() for k in keywords.split(',')]
-        mask = filtered_df['keywords'].str.lower().apply(
-            lambda x: any(k in x for k in keyword_list)
-        )
-        filtered_df = filtered_df[mask]
-    year_min, year_max = year_range
-    filtered_df = filtered_df[
-        (filtered_df['created_year'] >= year_min) & 
-        (filtered_df['created_year'] <= year_max)
-    ]
-    return filtered_df
-
-# Optimized search function
-def search_data(df, query, threshold=70):
-    if not query:
-        return df
-    query = query.lower().strip()
-    exact_mask = df['search_field'].str.contains(query, na=False)
-    exact_matches = df[exact_mask]
-    if len(exact_matches) >= 10:
-        return exact_matches
-    df['match_score'] = df['search_field'].apply(
-        lambda x: fuzz.partial_ratio(query, x)
-    )
-    fuzzy_matches = df[df['match_score'] >= threshold].sort_values(
-        'match_score', ascending=False
-    )
-    return fuzzy_matches.drop(columns=['match_score'])
-
-def update_search():
-    st.session_state.filtered_data = search_data(
-        apply_filters(
-            research_df,
-            input_category_bar, 
-            input_keywords_bar, 
-            year_range
-        ), 
-        st.session_state.search_input
-    )
-    st.session_state.search_query = st.session_state.search_input
-    st.session_state.page_num = 0
-
 # Sidebar for filters
 with st.sidebar:
     st.header("Search & Filters")
     st.caption("Narrow down research results using the options below")
     
+    # Facet counts for the current query and applied filters, from precomputed bitmaps
+    facets = fc.facet_counts(
+        research_df,
+        st.session_state.search_query,
+        st.session_state.get('filter_categories', []),
+        st.session_state.get('filter_keywords', ''),
+        st.session_state.year_range
+    )
+    
     with st.form(key="filter_form"):
         categories = sorted(research_df['category'].dropna().unique())
         input_category_bar = st.multiselect(
             label="Categories", 
             options=categories,
-            placeholder="Select one or more categories"
+            format_func=lambda category: f"{category} ({facets['category'].get(category, 0)})",
+            placeholder="Select one or more categories",
+            key="filter_categories"
         )
         input_keywords_bar = st.text_input(
             label="Keywords", 
-            placeholder="e.g., machine learning, climate, healthcare"
+            placeholder="e.g., machine learning, climate, healthcare",
+            key="filter_keywords"
         )
+        top_keywords = [f"{keyword} ({count})" for keyword, count in facets['keyword'].items() if count]
+        if top_keywords:
+            st.caption(f"Top keywords: {', '.join(top_keywords)}")
         st.caption("Enter comma-separated keywords")
         year_range = st.slider(
             "Publication Year",
@@ -186,23 +222,21 @@ with st.sidebar:
             step=2,
             key="year_range"
         )
+        year_counts = [f"{bucket}: {count}" for bucket, count in facets['year'].items() if count]
+        if year_counts:
+            st.caption(" · ".join(year_counts))
         filter_button = st.form_submit_button(
             label="Apply Filters", 
             type="primary",
             use_container_width=True
         )
         if filter_button:
-            st.session_state.filtered_data = apply_filters(
-                research_df,
-                input_category_bar, 
-                input_keywords_bar, 
-                year_range
-            )
             st.session_state.page_num = 0
 
     with st.expander("How to use filters"):
         st.markdown("""
-        - **Search**: Find papers by title, abstract content, or author name
+        - **Search**: Find papers by title, author name, keywords, or text inside the paper
+        - **Advanced search**: Combine `author:Santos`, `title:`, `category:Hospital`, `keyword:`, `year:2019..2023`, "exact phrases" and `-excluded` words
         - **Categories**: Select specific research categories
         - **Keywords**: Enter comma-separated keywords to match paper topics
         - **Year Range**: Limit results to specific publication years
@@ -224,20 +258,16 @@ with feed_col:
     """, unsafe_allow_html=True)
     
     search_bar_col, sort_col = st.columns([10, 1], vertical_alignment='center')
-    search_query = search_bar_col.text_input(
-        "Search", 
-        placeholder="Enter keywords, title, or author name",
-        key="search_input",
-        value=st.session_state.search_query,
-        on_change=update_search,
-    )
+    with search_bar_col:
+        display_search_box(research_df)
     with sort_col.popover("Sort"):
         sort_options = [
             "Relevance",
             "Alphabetical (A-Z)",
             "Alphabetical (Z-A)",
             "Year (Newest First)",
-            "Year (Oldest First)"
+            "Year (Oldest First)",
+            "Most viewed"
         ]
         selected_sort = st.radio(
             "Sort by:",
@@ -249,20 +279,16 @@ with feed_col:
             st.session_state.sort_option = selected_sort
             st.rerun()
 
-    # Apply search when query changes
-    if search_query != st.session_state.search_query:
-        st.session_state.search_query = search_query
-        filtered_by_criteria = apply_filters(
-            research_df,
-            input_category_bar, 
-            input_keywords_bar, 
-            year_range
-        )
-        st.session_state.filtered_data = search_data(filtered_by_criteria, search_query)
-        st.session_state.page_num = 0
-
-    # Apply sorting to filtered data
-    filtered_data = sort_data(st.session_state.filtered_data, st.session_state.sort_option)
+    # Filter, search and sort through the cross-session result cache
+    result_positions = se.run_query(
+        research_df,
+        st.session_state.search_query,
+        input_category_bar,
+        input_keywords_bar,
+        year_range,
+        st.session_state.sort_option
+    )
+    filtered_data = research_df.iloc[result_positions]
     
     # Pagination setup
     items_per_page = 10
@@ -274,50 +300,102 @@ with feed_col:
     end_idx = min(start_idx + items_per_page, total_items)
 
     # Results summary
-    st.write(f"Showing {total_items} results")
+    summary_col, export_col, zip_col = st.columns([3, 1, 1], vertical_alignment='center')
+    with summary_col:
+        st.write(f"Showing {total_items} results")
+        st.toggle("Compact view", key="compact_feed", help="Show results as a light list and open one paper at a time")
+    with export_col.popover("Export citations", use_container_width=True, disabled=total_items == 0):
+        export_format = st.selectbox("Format", list(cit.FORMATS), key="export_format")
+        if st.button("Prepare file", key="export_citations", use_container_width=True):
+            export_path = cit.export_citations(filtered_data, export_format, cs.catalog_version(research_df))
+            st.session_state.citation_export = (result_positions, export_format, export_path)
+        # Only offer the file while it still matches the results on screen
+        last_export = st.session_state.get('citation_export')
+        if last_export and last_export[0] is result_positions and last_export[1] == export_format:
+            extension = cit.FORMATS[export_format]
+            try:
+                with open(last_export[2], "rb") as f:
+                    export_data = f.read()
+            except FileNotFoundError:
+                # Removed after EXPORT_MAX_AGE; prepared again on the next click
+                del st.session_state.citation_export
+            else:
+                st.download_button(
+                    "Download citations",
+                    data=export_data,
+                    file_name=f"citations_{export_format.lower()}.{extension}",
+                    mime=cit.MIME_TYPES[extension],
+                    use_container_width=True
+                )
+    with zip_col.popover("Download PDFs", use_container_width=True, disabled=total_items == 0):
+        zip_scope = st.radio("Papers", ["All results", "Selected papers"], key="zip_scope", horizontal=True)
+        if zip_scope == "Selected papers":
+            selected_positions = st.multiselect(
+                "Select papers",
+                options=list(result_positions),
+                format_func=lambda pos: research_df.iloc[pos]['title'],
+                key="zip_selection",
+                placeholder="Choose papers from the current results"
+            )
+            zip_data = research_df.iloc[selected_positions]
+        else:
+            zip_data = filtered_data
+        too_many = len(zip_data) > bd.MAX_PAPERS
+        if too_many:
+            st.caption(f"A ZIP holds at most {bd.MAX_PAPERS} papers. Narrow the results or choose papers.")
+        if st.button(f"Prepare ZIP of {len(zip_data)} papers", key="export_zip", use_container_width=True, disabled=len(zip_data) == 0 or too_many):
+            # Built by a background worker, so the page stays usable while PDFs are fetched
+            zip_job_id = bd.submit_zip(zip_data, cs.catalog_version(research_df))
+            for paper_id in zip_data['id']:
+                ms.record(ms.DOWNLOAD, paper_id)
+            st.session_state.zip_export = (tuple(zip_data.index), zip_job_id)
+        last_zip = st.session_state.get('zip_export')
+        if last_zip and last_zip[0] == tuple(zip_data.index):
+            zip_job = bd.get_zip_job(last_zip[1])
+            if zip_job is None or zip_job['status'] == jq.FAILED:
+                st.error(f"Could not build the ZIP: {zip_job['error'] if zip_job else 'job not found'}")
+            elif zip_job['status'] == jq.DONE:
+                display_zip_download(zip_job, len(zip_data))
+            else:
+                display_zip_progress(last_zip[1])
     if total_items == 0:
         st.info("No papers found.")
 
+    # Related papers are precomputed once per data version
+    related_index = rs.get_related_index(research_df)
+    catalog_positions = cs.get_positions(research_df)
+
+    # Full abstracts are read for the current page only
+    page_data = filtered_data.iloc[start_idx:end_idx]
+    page_abstracts = cs.get_abstracts(page_data, cs.catalog_version(research_df))
+
     # Display research items
-    for i in range(start_idx, end_idx):
-        if i < len(filtered_data):
-            research = filtered_data.iloc[i]
-            with st.container(key=f"feed_container_{i}"):
-                st.markdown(f"##### {research['title']}")
-                st.caption(f"**Category:** {research.get('category', 'Uncategorized')}")
-                
-                col1, col2, col3 = st.columns([2, 2, 1])
-                
-                with col1:
-                    author_name = research.get('author_name', 'Unknown')
-                    if st.button(f"**Author:** {author_name}", key=f"author_btn_{i}"):
-                        author_img_url = research.get('author_img_url', '')
-                        author_research = research_df[research_df['author_name'] == author_name]['title'].tolist()
-                        show_author_details(author_name, author_img_url, author_research)
-                    st.markdown(f"**Year:** {int(research.get('created_year', 'Unknown')) if pd.notnull(research.get('created_year')) else 'Unknown'}")
-                
-                with col2:
-                    abstract_preview = research.get('abstract', 'No abstract available')
-                    if len(abstract_preview) > 100:
-                        abstract_preview = abstract_preview[:100] + "..."
-                    st.markdown(f"**Abstract:** {abstract_preview}")
-                
-                with col3:
-                    st.link_button("Download", url=f"https://drive.google.com/uc?export=download&id={research['file_url'].split('/')[-2]}", use_container_width=True)
-                    
-                    with st.popover("Cite", use_container_width=True):
-                        tab1, tab2 = st.tabs(["APA", "MLA"])
-                        with tab1:
-                            citation = f"{research.get('author_name', 'Author, A.')} ({int(research.get('created_year', 'n.d.')) if pd.notnull(research.get('created_year')) else 'n.d.'}). {research['title']}."
-                            st.code(citation, language=None)
-                            st.button("Copy", key=f"copy_apa_{i}", use_container_width=True)
-                        with tab2:
-                            citation = f"{research.get('author_name', 'Author, A.')}. \"{research['title']}.\" {int(research.get('created_year', 'n.d.')) if pd.notnull(research.get('created_year')) else 'n.d.'}."
-                            st.code(citation, language=None)
-                            st.button("Copy", key=f"copy_mla_{i}", use_container_width=True)
-                
-                with st.expander("View full abstract"):
-                    st.write(research.get('abstract', 'No abstract available'))
+    viewed_papers = st.session_state.setdefault('viewed_papers', set())
+    for paper_id in page_data['id']:
+        # Count a view once per session for each paper shown
+        if paper_id not in viewed_papers:
+            viewed_papers.add(paper_id)
+            ms.record(ms.VIEW, paper_id)
+    if st.session_state.compact_feed and len(page_data):
+        with render_stats.measure("feed:compact"):
+            # Widgets only for the paper the visitor opens; the page itself is one HTML block
+            picked = st.selectbox(
+                "Open a paper",
+                options=range(start_idx, end_idx),
+                format_func=lambda i: f"{i - start_idx + 1}. {filtered_data.iloc[i]['title']}",
+                index=None,
+                placeholder="Choose a paper for the author, citations, preview and related papers",
+                key=f"compact_pick_{start_idx}"
+            )
+            if picked is not None:
+                research = filtered_data.iloc[picked]
+                display_research_item(picked, research, page_abstracts.get(research['id']), research_df, related_index, catalog_positions)
+            display_compact_feed(page_data, page_abstracts)
+    else:
+        with render_stats.measure("feed:full"):
+            for i in range(start_idx, end_idx):
+                research = filtered_data.iloc[i]
+                display_research_item(i, research, page_abstracts.get(research['id']), research_df, related_index, catalog_positions)
 
     # Pagination controls
     if total_pages > 1:
@@ -0,0 +1,202 @@
+import hashlib
+import logging
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from services import job_queue as jq
+from services import local_store
+from services import pdf_cache
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND = "zip"
+# Archives are served by the PDF proxy from here, not by Streamlit's static folder
+ZIP_DIR = local_store.get_dir("zip_exports")
+ZIP_MAX_AGE = 6 * 60 * 60
+
+# Concurrent Drive downloads per archive
+MAX_WORKERS = 4
+# Downloads allowed to run ahead of the ZIP writer, bounds disk and thread use
+MAX_IN_FLIGHT = MAX_WORKERS * 2
+# Papers allowed in one archive
+MAX_PAPERS = int(os.environ.get("ELAMP_ZIP_MAX_PAPERS", "100"))
+# Largest archive offered through Streamlit when the PDF proxy is not enabled; it is held in memory
+MAX_INLINE_BYTES = int(os.environ.get("ELAMP_ZIP_INLINE_MB", "50")) * 1024 * 1024
+
+_ZIP_NAME_PATTERN = re.compile(r"^papers_[0-9a-f]{16}\.zip$")
+# Columns a ZIP job needs, copied into its payload
+_ZIP_COLUMNS = ['title', 'author_name', 'year_text', 'file_url']
+
+
+def _archive_name(row, used_names):
+    parts = [str(row.year_text or "n.d."), str(row.author_name), str(row.title)]
+    name = re.sub(r'[\\/:*?"<>|\s]+', " ", " - ".join(parts)).strip()[:150]
+    candidate = f"{name}.pdf"
+    count = 1
+    while candidate in used_names:
+        count += 1
+        candidate = f"{name} ({count}).pdf"
+    used_names.add(candidate)
+    return candidate
+
+def iter_pdf_paths(df, max_workers=MAX_WORKERS, max_in_flight=MAX_IN_FLIGHT):
+    """
+    Fetches the PDFs of a result set concurrently and yields them in order.
+
+    At most max_in_flight downloads are pending at once, and each download
+    streams into the local PDF cache, so memory stays flat however many
+    papers are selected. PDFs that are already cached are not downloaded again.
+
+    Args:
+        df (pd.DataFrame): Papers to fetch, with 'file_url', 'title', 'author_name' and 'year_text'.
+        max_workers (int, optional): Concurrent downloads. Defaults to MAX_WORKERS.
+        max_in_flight (int, optional): Downloads allowed ahead of the consumer. Defaults to MAX_IN_FLIGHT.
+
+    Yields:
+        tuple: (row, local path or None, error message or None).
+    """
+    rows = iter(df[['title', 'author_name', 'year_text', 'file_url']].itertuples(index=False))
+    pending = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for row in rows:
+            pending.append((row, pool.submit(pdf_cache.fetch, row.file_url)))
+            if len(pending) >= max_in_flight:
+                yield _result(*pending.pop(0))
+        while pending:
+            yield _result(*pending.pop(0))
+
+def _result(row, future):
+    try:
+        return row, future.result(), None
+    except Exception as e:
+        logger.warning("Could not fetch %s: %s", row.file_url, e)
+        return row, None, str(e)
+
+def write_zip(df, path):
+    """
+    Writes the PDFs of a result set into a ZIP file, one entry at a time.
+
+    PDFs are already compressed, so entries are stored rather than deflated.
+    Papers that could not be fetched are listed in MISSING.txt inside the archive.
+
+    Args:
+        df (pd.DataFrame): Papers to include, in display order.
+        path (str): Destination of the archive.
+
+    Returns:
+        int: Number of PDFs written.
+    """
+    used_names = set()
+    missing = []
+    written = 0
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for row, pdf_path, error in iter_pdf_paths(df):
+            if pdf_path is None:
+                missing.append(f"{row.title} ({row.file_url}): {error}")
+                continue
+            arcname = _archive_name(row, used_names)
+            try:
+                # ZipFile.write copies the file in chunks rather than reading it whole
+                zf.write(pdf_path, arcname=arcname)
+            except FileNotFoundError:
+                # Another session's download evicted it from the PDF cache; fetch it once more
+                try:
+                    zf.write(pdf_cache.fetch(row.file_url), arcname=arcname)
+                except Exception as e:
+                    logger.warning("Could not fetch %s again: %s", row.file_url, e)
+                    missing.append(f"{row.title} ({row.file_url}): {e}")
+                    continue
+            written += 1
+        if missing:
+            zf.writestr("MISSING.txt", "\n".join(missing) + "\n")
+    return written
+
+def archive_path(file_name):
+    """
+    Returns the local path of a built archive.
+
+    Args:
+        file_name (str): The name a ZIP job reported.
+
+    Returns:
+        str | None: The path, or None if the name is not an archive name or the file is gone.
+    """
+    if not _ZIP_NAME_PATTERN.match(file_name or ""):
+        return None
+    path = os.path.join(ZIP_DIR, file_name)
+    return path if os.path.exists(path) else None
+
+def _remove_old_archives():
+    cutoff = time.time() - ZIP_MAX_AGE
+    for name in os.listdir(ZIP_DIR):
+        path = os.path.join(ZIP_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+# Job stage, run by a job queue worker
+def _build_zip(payload, results):
+    _remove_old_archives()
+    file_name = payload["file_name"]
+    path = os.path.join(ZIP_DIR, file_name)
+    if os.path.exists(path):
+        # The same selection was archived earlier for this data version
+        with zipfile.ZipFile(path) as zf:
+            written = sum(1 for name in zf.namelist() if name.endswith(".pdf"))
+        os.utime(path)
+    else:
+        tmp_path = local_store.temp_path(path)
+        try:
+            written = write_zip(pd.DataFrame(payload["papers"], columns=_ZIP_COLUMNS), tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return {"file_name": file_name, "papers": written}
+
+jq.register_stages(JOB_KIND, [("build", _build_zip)])
+
+def submit_zip(df, version):
+    """
+    Queues building a ZIP of the given papers in a job queue worker.
+
+    The same selection is archived only once per data version.
+
+    Args:
+        df (pd.DataFrame): Papers to include, in display order; at most MAX_PAPERS.
+        version (str): The catalog data version.
+
+    Returns:
+        int: The job id; see get_zip_job.
+
+    Raises:
+        ValueError: If more than MAX_PAPERS papers are selected.
+    """
+    if len(df) > MAX_PAPERS:
+        raise ValueError(f"A ZIP holds at most {MAX_PAPERS} papers, {len(df)} were selected")
+    digest = hashlib.sha1(f"{version}|zip|".encode() + df.index.values.tobytes()).hexdigest()[:16]
+    payload = {
+        "file_name": f"papers_{digest}.zip",
+        "papers": df[_ZIP_COLUMNS].astype(str).values.tolist(),
+    }
+    return jq.submit(JOB_KIND, payload)
+
+def get_zip_job(job_id):
+    """
+    Returns the state of a ZIP job.
+
+    Returns:
+        dict | None: 'status' (job_queue.QUEUED, RUNNING, DONE or FAILED), 'error', and once
+                     done 'file_name' and 'papers' (PDFs in the archive); None if the job is unknown.
+    """
+    job = jq.get_job(job_id)
+    if job is None:
+        return None
+    return {"status": job["status"], "error": job["error"], **job["results"].get("build", {})}
@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from services import local_store
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_DIR = local_store.get_dir("catalog_segments")
+MANIFEST_NAME = "manifest.json"
+# Publication years per partition, one cohort block each: 2020-2024, 2015-2019, ...
+PARTITION_YEARS = int(os.environ.get("ELAMP_PARTITION_YEARS", "5"))
+UNDATED = "undated"
+RESEARCHERS = "researchers"
+# Partitions read from disk at the same time
+LOAD_WORKERS = 4
+
+
+def partition_of(year):
+    """Return the name of the partition a publication year belongs to"""
+    if pd.isna(year):
+        return UNDATED
+    start = int(year) // PARTITION_YEARS * PARTITION_YEARS
+    return f"{start}-{start + PARTITION_YEARS - 1}"
+
+def partition_bounds(name):
+    """Return the (first, last) years of a partition, or None for undated papers"""
+    if name == UNDATED:
+        return None
+    first, last = name.split("-")
+    return int(first), int(last)
+
+def _path(file_name):
+    return os.path.join(SEGMENT_DIR, file_name)
+
+def _write_file(file_name, content):
+    tmp_path = local_store.temp_path(_path(file_name))
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, _path(file_name))
+
+def read_manifest():
+    """Return the manifest of the segments on disk, or None if there are none"""
+    try:
+        with open(_path(MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def is_current(manifest, source_modified):
+    """Return True if the segments were written from the sheet as it was last modified"""
+    return bool(manifest and source_modified and manifest.get("source_modified") == source_modified)
+
+def write(research_df, researchers_df, source_modified):
+    """
+    Splits the catalog into one segment file per partition and writes their manifest.
+
+    Segment files are named after the catalog version, so readers of the previous
+    manifest never see a half-written file; files it no longer lists are removed.
+
+    Args:
+        research_df (pd.DataFrame): The catalog, as built from the sheet.
+        researchers_df (pd.DataFrame): The researchers_data worksheet.
+        source_modified (str | None): The sheet's modification time the catalog was read at.
+
+    Returns:
+        dict: The new manifest.
+    """
+    version = research_df.attrs['version']
+    names = research_df['created_year'].map(partition_of)
+    partitions = []
+    for name, rows in research_df.groupby(names.to_numpy(), sort=True):
+        file_name = f"{name}.{version}.pkl"
+        _write_file(file_name, pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL))
+        years = rows['created_year'].dropna()
+        partitions.append({
+            "name": name,
+            "file": file_name,
+            "rows": len(rows),
+            "min_year": int(years.min()) if len(years) else None,
+            "max_year": int(years.max()) if len(years) else None,
+        })
+    researchers_file = f"{RESEARCHERS}.{researchers_df.attrs.get('version')}.pkl"
+    _write_file(researchers_file, pickle.dumps(researchers_df, protocol=pickle.HIGHEST_PROTOCOL))
+
+    manifest = {
+        "version": version,
+        "source_modified": source_modified,
+        "rows": len(research_df),
+        "partitions": partitions,
+        "researchers": researchers_file,
+    }
+    _write_file(MANIFEST_NAME, json.dumps(manifest, indent=1).encode("utf-8"))
+
+    keep = {p["file"] for p in partitions} | {researchers_file, MANIFEST_NAME}
+    for file_name in os.listdir(SEGMENT_DIR):
+        if file_name not in keep and not file_name.endswith(".tmp"):
+            try:
+                os.remove(_path(file_name))
+            except OSError:
+                pass
+    return manifest
+
+def _read(file_name):
+    with open(_path(file_name), "rb") as f:
+        return pickle.load(f)
+
+def load(manifest):
+    """
+    Reads every partition in parallel and reassembles the catalog.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: The catalog in sheet order, with the
+        version it was written with, and the researchers frame.
+    """
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as pool:
+        researchers = pool.submit(_read, manifest["researchers"])
+        parts = list(pool.map(_read, [p["file"] for p in manifest["partitions"]]))
+        researchers_df = researchers.result()
+    if not parts:
+        raise ValueError("The catalog segments are empty")
+    # Partitions were cut from one frame, so categorical columns share their categories and stay categorical
+    df = pd.concat(parts).sort_index()
+    if len(df) != manifest["rows"]:
+        raise ValueError("Catalog segments do not match their manifest")
+    df.attrs = {
+        'version': manifest["version"],
+        'base_version': manifest["version"],
+        'source_modified': manifest.get("source_modified"),
+    }
+    return df, researchers_df
+
+def invalidate():
+    """Forget the segments so the next catalog build reads the sheet"""
+    try:
+        os.remove(_path(MANIFEST_NAME))
+    except OSError:
+        pass
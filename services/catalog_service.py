@@ -0,0 +1,532 @@
+import hashlib
+import logging
+import uuid
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import streamlit as st
+import pandas as pd
+from services import sheets_service as ss
+from services import fulltext_service as ft
+from services import metrics_service as ms
+from services import preview_service as ps
+from services import citation_service as cit
+from services import shared_cache as sc
+from services import catalog_segments as seg
+
+logger = logging.getLogger(__name__)
+
+# Name of the catalog's version in the shared cache tier
+CATALOG = "catalog"
+# Columns the feed needs; full abstracts are fetched per page with get_abstracts
+LIST_COLUMNS = [
+    'id', 'title', 'author_name', 'author_img_url', 'category',
+    'created_year', 'keywords', 'file_url', 'created_at'
+]
+# Worksheet with one row per researcher, joined to papers by researcher_service
+RESEARCHERS_SHEET = "researchers_data"
+# Abstracts kept in memory across sessions
+MAX_ABSTRACTS = int(os.environ.get("ELAMP_ABSTRACT_CACHE_SIZE", "2000"))
+# Minimum time between checks of the sheet's modification time for edits made outside the app
+SOURCE_POLL_SECONDS = int(os.environ.get("ELAMP_SOURCE_POLL_SECONDS", "60"))
+
+_abstracts = OrderedDict()
+_abstracts_lock = threading.Lock()
+
+# Admin edits applied on top of a loaded catalog when there is no shared cache tier,
+# keyed by the version of the frame they apply to
+_patches = {}
+_patches_lock = threading.Lock()
+
+# Researchers frames loaded with the catalog, keyed by the catalog's base version
+_researchers = OrderedDict()
+_researchers_lock = threading.Lock()
+
+_source_checked_at = None
+_source_lock = threading.Lock()
+
+
+def _snapshot_key(shared_version):
+    # Snapshots hold (papers, researchers); the suffix keeps older single-frame entries from being read
+    return f"{CATALOG}:{shared_version}:with-researchers"
+
+# Load and cache data with preprocessing
+@st.cache_data
+def load_research_data(shared_version="local"):
+    """Load and cache research data, reading the snapshot other replicas already built when there is one"""
+    df, researchers_df = sc.get_or_build(_snapshot_key(shared_version), _build_catalog)
+    with _researchers_lock:
+        _researchers[base_version(df)] = researchers_df
+        while len(_researchers) > 4:
+            _researchers.popitem(last=False)
+    return df
+
+# Another replica published or refreshed, so drop this process's copy
+sc.on_version_change(CATALOG, load_research_data.clear)
+
+# Columns with few distinct values, stored once per value instead of once per row
+CATEGORICAL_COLUMNS = ['category', 'author_name', 'author_img_url']
+
+def _read_researchers():
+    researchers_df = ss.get_data_df(RESEARCHERS_SHEET)
+    # get_data_df reports errors as a message; a missing profile sheet must not block the catalog
+    if not isinstance(researchers_df, pd.DataFrame):
+        researchers_df = pd.DataFrame()
+    researchers_df.attrs['version'] = compute_version(researchers_df)
+    return researchers_df
+
+def _build_catalog():
+    source_modified = ss.get_modified_time()
+    manifest = seg.read_manifest()
+    if seg.is_current(manifest, source_modified):
+        # The sheet has not changed since the segments on disk were cut from it
+        try:
+            return seg.load(manifest)
+        except Exception as e:
+            logger.warning("Could not load the catalog segments, reading the sheet: %s", e)
+    # The two worksheets are separate round trips to Sheets, so read them at the same time
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        papers = pool.submit(ss.get_columns, "research_data", LIST_COLUMNS)
+        researchers = pool.submit(_read_researchers)
+        df, researchers_df = _prepare_research_data(papers.result()), researchers.result()
+    # Lets replicas notice edits made directly in the sheet, even to a snapshot that outlived a restart
+    df.attrs['source_modified'] = source_modified
+    try:
+        seg.write(df, researchers_df, source_modified)
+    except OSError as e:
+        logger.warning("Could not write the catalog segments: %s", e)
+    return df, researchers_df
+
+def _prepare_research_data(df):
+    # Floored and range-checked first: a fractional year or a typo like 202020 typed
+    # into the sheet cannot be cast to Int16 and would fail the whole load
+    years = np.floor(pd.to_numeric(df['created_year'], errors='coerce').astype('float64'))
+    df['created_year'] = years.where(years.between(1, 9999)).astype('Int16')
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype(str).astype('category')
+    df.attrs['version'] = compute_version(df)
+    # Stays the same through admin edits, for indexes too costly to rebuild on each one
+    df.attrs['base_version'] = df.attrs['version']
+    return _add_citations(df)
+
+def _add_citations(df):
+    # Citations are built once per data version instead of on every rerun
+    df = cit.add_citation_columns(df)
+    df['year_text'] = df['year_text'].astype('category')
+    return df
+
+def build_search_text(df):
+    """Lowercased title, author and keywords of every row, the text the search box matches against"""
+    def preprocess_text(column):
+        return df[column].astype(str).str.lower().str.strip()
+
+    return preprocess_text('title') + ' ' + preprocess_text('author_name') + ' ' + preprocess_text('keywords')
+
+def compute_version(df):
+    """Fingerprint the catalog contents so derived structures can be cached per data version"""
+    if df.empty:
+        return "empty"
+    hashed = pd.util.hash_pandas_object(df.drop(columns=['year_text', 'cite_apa', 'cite_mla'], errors='ignore').astype(str), index=False)
+    return hashlib.sha1(hashed.values.tobytes()).hexdigest()[:16]
+
+def catalog_version(df):
+    """Return the data version of a frame produced by load_research_data"""
+    return df.attrs.get('version') or compute_version(df)
+
+def base_version(df):
+    """Return the version of the sheet load a frame comes from, ignoring later admin edits"""
+    return df.attrs.get('base_version') or catalog_version(df)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _get_positions(version, _research_df):
+    return {paper_id: pos for pos, paper_id in enumerate(_research_df['id'])}
+
+def get_positions(research_df):
+    """Return a map of paper id to row position in the catalog, built once per data version"""
+    return _get_positions(catalog_version(research_df), research_df)
+
+def get_sheet_row(research_df, paper_id):
+    """Return the sheet row number of a paper, kept current through admin edits"""
+    return int(research_df['_row'].iat[get_positions(research_df)[paper_id]])
+
+def apply_patch(df, patch_id, paper_id, changes=None, deleted=False, source_modified=None):
+    """
+    Applies one admin edit to a catalog frame without reloading the sheet.
+
+    Args:
+        df (pd.DataFrame): The catalog, modified in place unless a row is deleted.
+        patch_id (str): Unique id of the edit, part of the new version.
+        paper_id: The edited paper's id.
+        changes (dict, optional): List-view column to new value.
+        deleted (bool, optional): Remove the paper; rows below it move up one sheet row.
+        source_modified (str, optional): The sheet's modification time after the edit was saved.
+
+    Returns:
+        pd.DataFrame: The patched catalog with a new version.
+    """
+    base = base_version(df)
+    version = f"{base}.{patch_id}"
+    source_modified = source_modified or df.attrs.get('source_modified')
+    matches = df['id'] == paper_id
+    if deleted:
+        row = df.loc[matches, '_row'].min()
+        df = df[~matches].reset_index(drop=True)
+        df.loc[df['_row'] > row, '_row'] -= 1
+    else:
+        for col, value in (changes or {}).items():
+            if col == 'created_year':
+                value = pd.to_numeric(value, errors='coerce')
+            elif col in CATEGORICAL_COLUMNS and value not in df[col].cat.categories:
+                df[col] = df[col].cat.add_categories([value])
+            df.loc[matches, col] = value
+        df = _add_citations(df)
+    df.attrs['version'] = version
+    df.attrs['base_version'] = base
+    df.attrs['source_modified'] = source_modified
+    return df
+
+def get_researchers(research_df):
+    """
+    Returns the researchers_data worksheet loaded together with a catalog frame.
+
+    The frame is shared across sessions; do not modify it.
+
+    Args:
+        research_df (pd.DataFrame): A frame from load_research_data or get_research_data.
+
+    Returns:
+        pd.DataFrame: One row per researcher, empty if the worksheet could not be read.
+    """
+    with _researchers_lock:
+        researchers_df = _researchers.get(base_version(research_df))
+    if researchers_df is None:
+        # Loaded so long ago that newer loads pushed it out
+        researchers_df = _read_researchers()
+        with _researchers_lock:
+            _researchers[base_version(research_df)] = researchers_df
+    return researchers_df
+
+def _source_changed(df):
+    """
+    Returns the sheet's modification time if it differs from the one the catalog was read at.
+
+    Checks at most once every SOURCE_POLL_SECONDS per process; returns None in between.
+    """
+    global _source_checked_at
+    now = time.monotonic()
+    with _source_lock:
+        if _source_checked_at is not None and now - _source_checked_at < SOURCE_POLL_SECONDS:
+            return None
+        _source_checked_at = now
+    source_modified = ss.get_modified_time()
+    if source_modified and source_modified != df.attrs.get('source_modified'):
+        return source_modified
+    return None
+
+# The catalog with this process's admin edits applied, built once per edit instead of on every rerun
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _get_patched_catalog(version, last_patch_id, _df, _patches):
+    for patch in _patches:
+        _df = apply_patch(_df, *patch)
+    return _df
+
+def _apply_patches(df):
+    with _patches_lock:
+        patches = tuple(_patches.get(catalog_version(df), []))
+    if not patches:
+        return df
+    # Sessions replace whole columns, e.g. 'fulltext', so a shallow copy keeps the shared frame intact
+    return _get_patched_catalog(catalog_version(df), patches[-1][0], df, patches).copy(deep=False)
+
+def _load_catalog():
+    df = _apply_patches(load_research_data(sc.current_version(CATALOG)))
+    source_modified = _source_changed(df)
+    if source_modified is None:
+        return df
+    # The sheet was edited outside the app. Only the first replica to notice reloads it;
+    # the lock is left to expire so the others pick up its version instead of bumping again.
+    if sc.acquire_lock(f"{CATALOG}:source:{source_modified}") is not None:
+        logger.info("The research sheet changed, reloading the catalog")
+        invalidate_research_data()
+        df = _apply_patches(load_research_data(sc.current_version(CATALOG)))
+    return df
+
+def _patch_research_data(paper_id, changes=None, deleted=False):
+    # Taken after the edit was saved, so the edit itself does not look like an outside change
+    patch = (uuid.uuid4().hex[:8], paper_id, changes, deleted, ss.get_modified_time())
+    # The sheet changed, so the segments on disk are out of date
+    seg.invalidate()
+    if sc.backend is None:
+        loaded_version = catalog_version(load_research_data(sc.current_version(CATALOG)))
+        with _patches_lock:
+            _patches.setdefault(loaded_version, []).append(patch)
+        return
+    # Every replica, this one included, loads the patched snapshot instead of the sheet
+    # apply_patch edits the frame in place, and without .copy() that would be the cached one
+    patched = apply_patch(_apply_patches(load_research_data(sc.current_version(CATALOG))).copy(), *patch)
+    sc.put(_snapshot_key(sc.bump_version(CATALOG)), (patched, get_researchers(patched)))
+
+def update_paper(research_df, paper_id, original, changes):
+    """
+    Saves an admin's edit of a paper to the sheet and patches the cached catalog.
+
+    Args:
+        research_df (pd.DataFrame): The catalog the admin edited from.
+        paper_id: The paper's id.
+        original (dict): Column to the value the admin started from, for every changed column.
+        changes (dict): Column to new value; may include 'abstract'.
+
+    Raises:
+        sheets_service.RowConflictError: If the paper changed in the sheet meanwhile.
+    """
+    if not changes:
+        return
+    position = get_positions(research_df)[paper_id]
+    expected = {'id': paper_id, 'created_at': research_df['created_at'].iat[position]}
+    expected.update(original)
+    ss.update_row_cells(get_sheet_row(research_df, paper_id), expected, changes)
+    _patch_research_data(paper_id, {col: value for col, value in changes.items() if col in LIST_COLUMNS})
+
+def delete_paper(research_df, paper_id):
+    """
+    Deletes a paper's row from the sheet and removes it from the cached catalog.
+
+    Its stored full text, preview and usage counts are removed too: new papers get the
+    next free id, so a later paper could otherwise inherit them.
+
+    Raises:
+        sheets_service.RowConflictError: If the paper changed in the sheet meanwhile.
+    """
+    position = get_positions(research_df)[paper_id]
+    expected = {'id': paper_id, 'created_at': research_df['created_at'].iat[position]}
+    ss.delete_row(get_sheet_row(research_df, paper_id), expected)
+    _patch_research_data(paper_id, deleted=True)
+    file_url = research_df['file_url'].iat[position]
+    purges = [(ft.delete_text, paper_id), (ms.delete_counts, paper_id)]
+    # Another paper may link the same Drive file
+    if (research_df['file_url'] == file_url).sum() == 1:
+        purges.append((ps.delete_preview, file_url))
+    for purge, key in purges:
+        try:
+            purge(key)
+        except Exception as e:
+            # The row is already gone; a leftover entry must not report the delete as failed
+            logger.warning("Could not remove %s data of deleted paper %s: %s", purge.__module__, paper_id, e)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _get_partitions(version, _research_df):
+    names = _research_df['created_year'].map(seg.partition_of).to_numpy()
+    partitions = []
+    for name in sorted(set(names)):
+        positions = (names == name).nonzero()[0]
+        positions.setflags(write=False)
+        partitions.append({'name': name, 'years': seg.partition_bounds(name), 'positions': positions})
+    return partitions
+
+def get_partitions(research_df):
+    """
+    Returns the catalog's year partitions, built once per data version.
+
+    Returns:
+        list[dict]: 'name', 'years' ((first, last) or None for undated papers) and the
+                    read-only row 'positions' of every partition.
+    """
+    return _get_partitions(catalog_version(research_df), research_df)
+
+def partitions_in_range(research_df, year_range):
+    """
+    Prunes partitions against a publication year range before any row is compared.
+
+    Args:
+        research_df (pd.DataFrame): The catalog.
+        year_range (tuple[int, int] | None): Inclusive range; None selects everything.
+
+    Returns:
+        tuple[list[dict], list[dict]]: Partitions wholly inside the range, and those
+                                       only partly inside it whose rows need checking.
+    """
+    partitions = get_partitions(research_df)
+    if year_range is None:
+        return partitions, []
+    year_min, year_max = year_range
+    inside, boundary = [], []
+    for partition in partitions:
+        # Papers without a year never match a range
+        if partition['years'] is None:
+            continue
+        first, last = partition['years']
+        if year_min <= first and last <= year_max:
+            inside.append(partition)
+        elif first <= year_max and year_min <= last:
+            boundary.append(partition)
+    return inside, boundary
+
+# The extracted PDF text of one partition, shared by every session and reloaded only when the store or catalog changes
+@st.cache_resource(max_entries=64, show_spinner=False)
+def load_fulltext(store_version, version, partition, _paper_ids):
+    """Load the extracted texts of a partition's papers as a read-only array in the order of the ids"""
+    texts = ft.load_texts(_paper_ids)
+    column = np.array([texts.get(paper_id, '') for paper_id in _paper_ids], dtype=object)
+    column.setflags(write=False)
+    return column
+
+def _clear_fulltext(research_df, fulltext_version):
+    research_df['fulltext'] = ''
+    research_df.attrs['fulltext_version'] = fulltext_version
+    research_df.attrs['fulltext_partitions'] = []
+
+def add_fulltext(research_df, year_range=None):
+    """
+    Fills the 'fulltext' column for the partitions a year range touches, loading only those.
+
+    Partitions loaded earlier for the same frame are kept, so a session that widens
+    its range only reads the older partitions it now needs.
+
+    Args:
+        research_df (pd.DataFrame): A frame from get_research_data; modified in place.
+        year_range (tuple[int, int], optional): Inclusive publication years. Defaults to all.
+
+    Returns:
+        pd.DataFrame: The same frame.
+    """
+    fulltext_version = ft.store_version()
+    if research_df.attrs.get('fulltext_version') != fulltext_version or 'fulltext' not in research_df:
+        _clear_fulltext(research_df, fulltext_version)
+    loaded = research_df.attrs['fulltext_partitions']
+    inside, boundary = partitions_in_range(research_df, year_range)
+    missing = [p for p in inside + boundary if p['name'] not in loaded]
+    if not missing:
+        return research_df
+    version = catalog_version(research_df)
+    column = research_df['fulltext'].to_numpy(dtype=object, copy=True)
+    for partition in missing:
+        paper_ids = research_df['id'].iloc[partition['positions']].astype(str).tolist()
+        # Copies references to the shared strings, not the text itself
+        column[partition['positions']] = load_fulltext(fulltext_version, version, partition['name'], paper_ids)
+    research_df['fulltext'] = column
+    research_df.attrs['fulltext_partitions'] = loaded + [p['name'] for p in missing]
+    return research_df
+
+def get_abstracts(rows_df, version):
+    """
+    Returns the full abstracts of some catalog rows, reading the missing ones from the sheet in one request.
+
+    Abstracts the sheet could not be read for are left out, so callers show a placeholder.
+
+    Args:
+        rows_df (pd.DataFrame): Catalog rows, usually the current page.
+        version (str): Catalog version the rows come from.
+
+    Returns:
+        dict: Paper id to abstract.
+    """
+    abstracts = {}
+    missing = {}
+    with _abstracts_lock:
+        for paper_id, row in zip(rows_df['id'], rows_df['_row']):
+            key = (version, paper_id)
+            if key in _abstracts:
+                _abstracts.move_to_end(key)
+                abstracts[paper_id] = _abstracts[key]
+            else:
+                missing[int(row)] = paper_id
+    if not missing:
+        return abstracts
+
+    try:
+        cells = ss.get_cells("research_data", ['id', 'abstract'], list(missing))
+    except Exception as e:
+        logger.warning("Could not read abstracts from the sheet: %s", e)
+        cells = {}
+    fetched = {
+        paper_id: str(cells[row]['abstract'])
+        for row, paper_id in missing.items()
+        if str(cells.get(row, {}).get('id')) == str(paper_id)
+    }
+    if len(fetched) < len(missing):
+        # Rows moved since the catalog was loaded; look the rest up by id
+        try:
+            column = _get_abstract_column(version)
+        except Exception as e:
+            # Not cached, so the page shows no abstract for these and the next render tries again
+            logger.warning("Could not read the abstract column from the sheet: %s", e)
+            column = None
+        if column is not None:
+            for paper_id in missing.values():
+                if paper_id not in fetched:
+                    fetched[paper_id] = column.get(str(paper_id), '')
+
+    with _abstracts_lock:
+        for paper_id, abstract in fetched.items():
+            _abstracts[(version, paper_id)] = abstract
+        while len(_abstracts) > MAX_ABSTRACTS:
+            _abstracts.popitem(last=False)
+    abstracts.update(fetched)
+    return abstracts
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _get_abstract_column(version):
+    return load_abstract_column()
+
+def load_abstract_column():
+    """Read every abstract from the sheet as a Series indexed by paper id (str)"""
+    df = ss.get_columns("research_data", ['id', 'abstract'])
+    column = pd.Series(df['abstract'].astype(str).to_numpy(), index=df['id'].astype(str), dtype=object)
+    return column[~column.index.duplicated()]
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _memory_report(version, _df):
+    compact = _df.drop(columns=['fulltext'], errors='ignore')
+    loose = compact.astype(object)
+    loose['created_year'] = compact['created_year'].astype('float64')
+    loose['search_field'] = build_search_text(compact)
+    rows = max(len(compact), 1)
+    return {
+        'rows': len(compact),
+        'bytes_per_row': float(compact.memory_usage(deep=True).sum()) / rows,
+        'bytes_per_row_before': float(loose.memory_usage(deep=True).sum()) / rows,
+    }
+
+def memory_report(df):
+    """
+    Compares the memory of the cached catalog with the layout it replaced, once per data version.
+
+    The old layout kept every column as Python strings, years as float64 and a
+    duplicated lowercase 'search_field' column.
+
+    Args:
+        df (pd.DataFrame): The catalog from load_research_data.
+
+    Returns:
+        dict: 'rows', 'bytes_per_row' and 'bytes_per_row_before'.
+    """
+    return _memory_report(catalog_version(df), df)
+
+def invalidate_research_data():
+    """Reload the catalog from the sheet on the next run, in this process and on every other replica"""
+    load_research_data.clear()
+    with _patches_lock:
+        _patches.clear()
+    seg.invalidate()
+    sc.bump_version(CATALOG)
+
+def get_research_data(fulltext=False):
+    """
+    Returns the research data with a 'fulltext' column holding each paper's extracted PDF text.
+
+    Args:
+        fulltext (bool, optional): Load every paper's text now. When False the column starts
+                                   empty and add_fulltext fills in the partitions a search
+                                   touches. Defaults to False.
+
+    Returns:
+        pd.DataFrame: The catalog.
+    """
+    df = _load_catalog()
+    if fulltext:
+        return add_fulltext(df)
+    _clear_fulltext(df, ft.store_version())
+    return df
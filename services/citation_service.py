@@ -0,0 +1,151 @@
+import hashlib
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from services import local_store
+
+# Exports are handed to st.download_button from this folder; static serving would send them as text/plain
+EXPORT_DIR = local_store.get_dir("citation_exports")
+# Old export files are removed after this long
+EXPORT_MAX_AGE = 6 * 60 * 60
+
+FORMATS = {
+    "APA": "txt",
+    "MLA": "txt",
+    "BibTeX": "bib",
+    "RIS": "ris",
+}
+MIME_TYPES = {
+    "txt": "text/plain",
+    "bib": "application/x-bibtex",
+    "ris": "application/x-research-info-systems",
+}
+
+
+def add_citation_columns(df):
+    """
+    Adds the year text and APA/MLA citation strings as vectorized columns.
+
+    Args:
+        df (pd.DataFrame): Research data with 'title', 'author_name' and numeric 'created_year'.
+
+    Returns:
+        pd.DataFrame: The same frame with 'year_text', 'cite_apa' and 'cite_mla' columns.
+    """
+    # Floored first: a fractional year typed into the sheet cannot be cast to an integer
+    year_number = np.floor(pd.to_numeric(df['created_year'], errors='coerce').astype('float64')).astype('Int64')
+    df['year_text'] = year_number.astype(str).replace('<NA>', '')
+    year = df['year_text'].replace('', 'n.d.')
+    author = df['author_name'].astype(str).replace('', 'Author, A.')
+    title = df['title'].astype(str)
+    df['cite_apa'] = author + ' (' + year + '). ' + title + '.'
+    df['cite_mla'] = author + '. "' + title + '." ' + year + '.'
+    return df
+
+def _bibtex_escape(value):
+    return re.sub(r"([{}%&$#_])", r"\\\1", str(value))
+
+def _bibtex_key(row, seen):
+    surname = re.sub(r"\W", "", str(row.author_name).split(',')[0].split(' ')[0]).lower() or "anon"
+    first_word = next((w for w in re.findall(r"\w+", str(row.title).lower()) if len(w) > 3), "paper")
+    key = f"{surname}{row.year_text or 'nd'}{first_word}"
+    count = seen.get(key, 0)
+    seen[key] = count + 1
+    if count:
+        key += chr(ord('a') + count - 1) if count <= 26 else str(count)
+    return key
+
+def _bibtex_entry(row, seen):
+    fields = [
+        ("author", row.author_name),
+        ("title", row.title),
+        ("year", row.year_text),
+        ("keywords", row.keywords),
+        ("note", row.category),
+        ("url", row.file_url),
+    ]
+    body = ",\n".join(f"  {name} = {{{_bibtex_escape(value)}}}" for name, value in fields if value and pd.notnull(value))
+    return f"@misc{{{_bibtex_key(row, seen)},\n{body}\n}}\n\n"
+
+def _ris_entry(row):
+    lines = ["TY  - THES", f"AU  - {row.author_name}", f"TI  - {row.title}"]
+    if row.year_text:
+        lines.append(f"PY  - {row.year_text}")
+    for keyword in str(row.keywords).split(','):
+        if keyword.strip():
+            lines.append(f"KW  - {keyword.strip()}")
+    if row.file_url:
+        lines.append(f"UR  - {row.file_url}")
+    lines.append("ER  - ")
+    return "\n".join(lines) + "\n\n"
+
+def iter_citations(df, fmt):
+    """
+    Yields the citations of a result set one entry at a time.
+
+    Args:
+        df (pd.DataFrame): Rows to export, in display order, with the citation columns.
+        fmt (str): One of FORMATS.
+
+    Yields:
+        str: One formatted entry.
+    """
+    if fmt == "APA":
+        for citation in df['cite_apa']:
+            yield citation + "\n"
+    elif fmt == "MLA":
+        for citation in df['cite_mla']:
+            yield citation + "\n"
+    elif fmt == "BibTeX":
+        seen = {}
+        for row in df[['title', 'author_name', 'year_text', 'keywords', 'category', 'file_url']].itertuples(index=False):
+            yield _bibtex_entry(row, seen)
+    elif fmt == "RIS":
+        for row in df[['title', 'author_name', 'year_text', 'keywords', 'file_url']].itertuples(index=False):
+            yield _ris_entry(row)
+    else:
+        raise ValueError(f"Unsupported citation format: {fmt}")
+
+def remove_old_exports():
+    """Delete export files older than EXPORT_MAX_AGE"""
+    cutoff = time.time() - EXPORT_MAX_AGE
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+def export_citations(df, fmt, version):
+    """
+    Writes the citations of a result set to a local file through a generator.
+
+    The same result set and format are written only once per data version.
+
+    Args:
+        df (pd.DataFrame): Rows to export, in display order, with the citation columns.
+        fmt (str): One of FORMATS.
+        version (str): The catalog data version.
+
+    Returns:
+        str: Path of the export file.
+    """
+    remove_old_exports()
+    digest = hashlib.sha1(f"{version}|{fmt}|".encode() + df.index.values.tobytes()).hexdigest()[:16]
+    file_name = f"citations_{digest}.{FORMATS[fmt]}"
+    path = os.path.join(EXPORT_DIR, file_name)
+    if not os.path.exists(path):
+        tmp_path = local_store.temp_path(path)
+        try:
+            with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+                f.writelines(iter_citations(df, fmt))
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return path
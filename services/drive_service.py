@@ -4,7 +4,18 @@ from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 from googleapiclient.http import MediaIoBaseUpload
 import io
+import re
+import hashlib
+import time
 from datetime import datetime
+from services import local_store
+from services import image_service
+
+HASH_DB_NAME = "drive_hashes.sqlite3"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Folders whose hash index was seeded from Drive in this process
+_seeded_folders = set()
 
 # Initialize Google Drive API client
 def get_drive_service():
@@ -20,6 +31,21 @@ def get_drive_service():
         st.error(f"Error initializing Drive service: {str(e)}")
         raise
 
+# Extract the Drive file ID from a share or view link
+def get_file_id(file_url):
+    if not file_url:
+        return None
+    file_url = str(file_url)
+    match = re.search(r"/d/([a-zA-Z0-9_-]+)", file_url) or re.search(r"[?&]id=([a-zA-Z0-9_-]+)", file_url)
+    return match.group(1) if match else None
+
+# Build the direct download link for a Drive share or view link
+def get_download_url(file_url):
+    file_id = get_file_id(file_url)
+    if not file_id:
+        return None
+    return f"https://drive.google.com/uc?export=download&id={file_id}"
+
 # Create or get folder ID
 def get_or_create_folder(drive_service, folder_name, parent_folder_id=None):
     try:
@@ -56,6 +82,98 @@ def get_or_create_folder(drive_service, folder_name, parent_folder_id=None):
         st.error(f"Error managing folder: {str(e)}")
         raise
 
+# Compute the SHA-256 of file content in fixed-size chunks
+def compute_sha256(file_content):
+    digest = hashlib.sha256()
+    view = memoryview(file_content)
+    for start in range(0, len(view), HASH_CHUNK_SIZE):
+        digest.update(view[start:start + HASH_CHUNK_SIZE])
+    return digest.hexdigest()
+
+def _connect_hash_index():
+    conn = local_store.connect(HASH_DB_NAME)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS file_hashes ("
+        "sha256 TEXT NOT NULL, folder_id TEXT NOT NULL, file_id TEXT NOT NULL, "
+        "web_view_link TEXT NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (sha256, folder_id))"
+    )
+    return conn
+
+# Remember which Drive file holds content with the given hash
+def record_file_hash(folder_id, sha256, file_id, web_view_link):
+    conn = _connect_hash_index()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?, ?)",
+                (sha256, folder_id, file_id, web_view_link, time.time())
+            )
+    finally:
+        conn.close()
+
+def _forget_file_hash(folder_id, sha256):
+    conn = _connect_hash_index()
+    try:
+        with conn:
+            conn.execute("DELETE FROM file_hashes WHERE sha256 = ? AND folder_id = ?", (sha256, folder_id))
+    finally:
+        conn.close()
+
+# Seed the local hash index from the sha256 appProperty of files already in a folder
+def seed_hash_index(drive_service, folder_id):
+    page_token = None
+    while True:
+        response = drive_service.files().list(
+            q=f"'{folder_id}' in parents and trashed = false",
+            spaces='drive',
+            fields='nextPageToken, files(id, webViewLink, appProperties)',
+            pageSize=1000,
+            pageToken=page_token
+        ).execute()
+        for file in response.get('files', []):
+            sha256 = (file.get('appProperties') or {}).get('sha256')
+            if sha256:
+                record_file_hash(folder_id, sha256, file['id'], file['webViewLink'])
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+    _seeded_folders.add(folder_id)
+
+# Look up a file with the same content, returning its webViewLink or None
+def find_existing_file(drive_service, folder_id, sha256):
+    if folder_id not in _seeded_folders:
+        seed_hash_index(drive_service, folder_id)
+
+    conn = _connect_hash_index()
+    try:
+        row = conn.execute(
+            "SELECT file_id, web_view_link FROM file_hashes WHERE sha256 = ? AND folder_id = ?",
+            (sha256, folder_id)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row:
+        # Make sure the file was not deleted or trashed since it was indexed
+        try:
+            file = drive_service.files().get(fileId=row[0], fields='id, webViewLink, trashed').execute()
+            if not file.get('trashed'):
+                return file.get('webViewLink')
+        except Exception:
+            pass
+        _forget_file_hash(folder_id, sha256)
+
+    # Another server process may have uploaded it after this one seeded its index
+    response = drive_service.files().list(
+        q=f"'{folder_id}' in parents and trashed = false and appProperties has {{ key='sha256' and value='{sha256}' }}",
+        spaces='drive',
+        fields='files(id, webViewLink)'
+    ).execute()
+    files = response.get('files', [])
+    if files:
+        record_file_hash(folder_id, sha256, files[0]['id'], files[0]['webViewLink'])
+        return files[0]['webViewLink']
+    return None
+
 def upload_img(file_uploaded, parent_folder_id=None):
     try:
         drive_service = get_drive_service()
@@ -63,18 +181,28 @@ def upload_img(file_uploaded, parent_folder_id=None):
         # Create/get images folder
         images_folder_id = get_or_create_folder(drive_service, "author_images", st.secrets.gdrive.author_images_folder_id)
         
-        # Generate unique filename
+        # Generate unique filename; images are always stored as WebP
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_extension = file_uploaded.name.split('.')[-1]
+        file_extension = "webp"
         file_name = f"img_{timestamp}.{file_extension}"
         
         # Read file content
         file_content = file_uploaded.getvalue()  # This is the in-memory content
         
+        # Reuse the existing Drive file if the same content was uploaded before
+        sha256 = compute_sha256(file_content)
+        existing_link = find_existing_file(drive_service, images_folder_id, sha256)
+        if existing_link:
+            return existing_link
+        
+        # Auto-orient, strip metadata and downsize before uploading
+        file_content = image_service.normalize_image(file_content)
+        
         # Prepare file metadata
         file_metadata = {
             'name': file_name,
-            'parents': [images_folder_id]
+            'parents': [images_folder_id],
+            'appProperties': {'sha256': sha256}
         }
         
         # Upload file using MediaIoBaseUpload for in-memory content
@@ -97,6 +225,7 @@ def upload_img(file_uploaded, parent_folder_id=None):
             body={'type': 'anyone', 'role': 'reader'}
         ).execute()
         
+        record_file_hash(images_folder_id, sha256, file.get('id'), file.get('webViewLink'))
         return file.get('webViewLink')
     except Exception as e:
         st.error(f"Error uploading image: {str(e)}")
@@ -117,10 +246,17 @@ def upload_pdf(file_uploaded, parent_folder_id=None):
         # Read file content
         file_content = file_uploaded.getvalue()  # This is the in-memory content
         
+        # Reuse the existing Drive file if the same content was uploaded before
+        sha256 = compute_sha256(file_content)
+        existing_link = find_existing_file(drive_service, pdfs_folder_id, sha256)
+        if existing_link:
+            return existing_link
+        
         # Prepare file metadata
         file_metadata = {
             'name': file_name,
-            'parents': [pdfs_folder_id]
+            'parents': [pdfs_folder_id],
+            'appProperties': {'sha256': sha256}
         }
         
         # Upload file using MediaIoBaseUpload for in-memory content
@@ -143,6 +279,7 @@ def upload_pdf(file_uploaded, parent_folder_id=None):
             body={'type': 'anyone', 'role': 'reader'}
         ).execute()
         
+        record_file_hash(pdfs_folder_id, sha256, file.get('id'), file.get('webViewLink'))
         return file.get('webViewLink')
     except Exception as e:
         st.error(f"Error uploading PDF: {str(e)}")
@@ -0,0 +1,185 @@
+import threading
+
+import numpy as np
+import streamlit as st
+
+from services import catalog_service as cs
+from services import query_service as qs
+from services import search_service as se
+
+YEAR_BUCKET_SIZE = 5
+TOP_KEYWORDS = 15
+
+# Number of set bits in every possible byte
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class FacetIndex:
+    """
+    Packed bitmaps of the catalog rows matching each facet value.
+
+    Counting a facet against a result set is one AND of the facet's bitmap
+    matrix with the result bitmap, followed by a popcount lookup.
+    """
+
+    def __init__(self, research_df):
+        self.n_rows = len(research_df)
+        self.years = research_df['created_year'].to_numpy(dtype=float, na_value=np.nan)
+        self.keywords_lower = research_df['keywords'].astype(str).str.lower().to_numpy()
+        self.values = {}
+        self.bitmaps = {}
+        # Bitmaps of recent sidebar keyword filters, which match substrings of any keyword
+        self._keyword_filters = {}
+        self._keyword_filters_lock = threading.Lock()
+
+        categories = research_df['category'].astype(object).fillna('').astype(str).to_numpy()
+        category_values = sorted(c for c in set(categories) if c)
+        self._add("category", category_values, [categories == c for c in category_values])
+
+        buckets = np.floor(self.years / YEAR_BUCKET_SIZE) * YEAR_BUCKET_SIZE
+        bucket_starts = sorted(int(b) for b in set(buckets[~np.isnan(buckets)]))
+        self._add(
+            "year",
+            [f"{b}–{b + YEAR_BUCKET_SIZE - 1}" for b in bucket_starts],
+            [buckets == b for b in bucket_starts]
+        )
+
+        keyword_sets = [
+            {k.strip() for k in keywords.split(',') if k.strip()}
+            for keywords in self.keywords_lower
+        ]
+        frequency = {}
+        for keyword_set in keyword_sets:
+            for keyword in keyword_set:
+                frequency[keyword] = frequency.get(keyword, 0) + 1
+        top_keywords = sorted(frequency, key=lambda k: (-frequency[k], k))[:TOP_KEYWORDS]
+        self._add(
+            "keyword",
+            top_keywords,
+            [np.array([k in keyword_set for keyword_set in keyword_sets], dtype=bool) for k in top_keywords]
+        )
+
+    def _add(self, name, values, masks):
+        self.values[name] = values
+        if masks:
+            self.bitmaps[name] = np.packbits(np.vstack(masks), axis=1)
+        else:
+            self.bitmaps[name] = np.zeros((0, (self.n_rows + 7) // 8), dtype=np.uint8)
+
+    def positions_bitmap(self, positions):
+        """Return the bitmap of the given row positions"""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[positions] = True
+        return np.packbits(mask)
+
+    def all_rows(self):
+        """Return the bitmap of every row"""
+        return np.packbits(np.ones(self.n_rows, dtype=bool))
+
+    def year_bitmap(self, year_range):
+        """Return the bitmap of rows published in an inclusive year range; undated rows never match"""
+        with np.errstate(invalid='ignore'):
+            return np.packbits((self.years >= year_range[0]) & (self.years <= year_range[1]))
+
+    def category_bitmap(self, categories):
+        """Return the bitmap of rows in any of the given categories"""
+        rows = [i for i, value in enumerate(self.values["category"]) if value in set(categories)]
+        if not rows:
+            return np.zeros_like(self.all_rows())
+        return np.bitwise_or.reduce(self.bitmaps["category"][rows], axis=0)
+
+    def keyword_bitmap(self, keywords):
+        """Return the bitmap of rows whose keywords contain any of the given lowercase keywords"""
+        keywords = tuple(keywords)
+        with self._keyword_filters_lock:
+            bitmap = self._keyword_filters.get(keywords)
+        if bitmap is None:
+            bitmap = np.packbits(np.fromiter(
+                (any(k in text for k in keywords) for text in self.keywords_lower), dtype=bool, count=self.n_rows
+            ))
+            with self._keyword_filters_lock:
+                if len(self._keyword_filters) >= 64:
+                    self._keyword_filters.clear()
+                self._keyword_filters[keywords] = bitmap
+        return bitmap
+
+    def counts(self, name, result_bitmap):
+        """
+        Counts the rows of a result set in every value of a facet.
+
+        Args:
+            name (str): "category", "year" or "keyword".
+            result_bitmap (np.ndarray): Packed bitmap of the result rows.
+
+        Returns:
+            dict: Facet value to number of result rows.
+        """
+        totals = _POPCOUNT[self.bitmaps[name] & result_bitmap].sum(axis=1, dtype=np.int64)
+        return dict(zip(self.values[name], totals.tolist()))
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _get_facet_index(version, _research_df):
+    return FacetIndex(_research_df)
+
+def get_facet_index(research_df):
+    """Return the facet bitmaps for the current data version, building them once per version"""
+    return _get_facet_index(cs.catalog_version(research_df), research_df)
+
+def facet_counts(research_df, query, categories, keywords, year_range):
+    """
+    Counts categories, year buckets and top keywords within the current search results.
+
+    Categories and keywords are counted against the results with every other active
+    filter applied but not their own, so users see what choosing another value would
+    give. Year buckets are counted within the selected range, so a search never loads
+    the full text of years outside it.
+
+    The query is matched once, without the sidebar filters; each result set is that
+    match intersected with the category, keyword and year bitmaps. A plain query falls
+    back to fuzzy matches per filter combination exactly as search_data does, so the
+    counts agree with the feed.
+
+    Args:
+        research_df (pd.DataFrame): The catalog.
+        query (str): The search box text.
+        categories (list[str]): Selected categories.
+        keywords (str): Comma-separated keyword filter.
+        year_range (tuple[int, int]): Selected publication years.
+
+    Returns:
+        dict: {"category": {...}, "year": {...}, "keyword": {...}} of value to count.
+    """
+    index = get_facet_index(research_df)
+    key = se.make_query_key(research_df, query, categories, keywords, year_range, "Relevance")
+    text, selected_keywords = key[0], key[2]
+    category_filter = index.category_bitmap(categories) if categories else index.all_rows()
+    keyword_filter = index.keyword_bitmap(selected_keywords) if selected_keywords else index.all_rows()
+
+    if text and not qs.is_structured(text):
+        exact = index.positions_bitmap(se.text_matches(research_df, query, year_range))
+        fuzzy = []
+
+        def matches(filter_bitmap):
+            hits = exact & filter_bitmap
+            if _POPCOUNT[hits].sum() >= se.MIN_EXACT_MATCHES:
+                return hits
+            if not fuzzy:
+                # Only needed when the exact matches thin out under a filter
+                fuzzy.append(index.positions_bitmap(se.text_matches(research_df, query, year_range, fuzzy=True)))
+            return fuzzy[0] & filter_bitmap
+    else:
+        if text:
+            # Structured queries match row by row, so the sidebar filters can be applied afterwards
+            base = index.positions_bitmap(se.run_query(research_df, query, None, "", year_range, "Relevance"))
+        else:
+            base = index.year_bitmap(year_range)
+
+        def matches(filter_bitmap):
+            return base & filter_bitmap
+
+    results = matches(category_filter & keyword_filter)
+    return {
+        "category": index.counts("category", matches(keyword_filter) if categories else results),
+        "year": index.counts("year", results),
+        "keyword": index.counts("keyword", matches(category_filter) if selected_keywords else results),
+    }
@@ -0,0 +1,178 @@
+import io
+import logging
+import re
+import time
+import zlib
+
+from services import drive_service as ds
+from services import local_store
+from services import pdf_cache
+from services import workers
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = "fulltext.sqlite3"
+
+# Upper bound on indexed characters per paper; enough for a full thesis body
+MAX_CHARS = 300_000
+
+def _connect():
+    conn = local_store.connect(DB_NAME)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS fulltext ("
+        "paper_id TEXT PRIMARY KEY, body BLOB NOT NULL, chars INTEGER NOT NULL, updated_at REAL NOT NULL)"
+    )
+    return conn
+
+def normalize_text(text):
+    """Lowercase text and collapse whitespace so it matches the search field format"""
+    return re.sub(r"\s+", " ", str(text)).lower().strip()
+
+def extract_pdf_text(pdf_bytes):
+    """
+    Extracts the text layer of a PDF.
+
+    Args:
+        pdf_bytes (bytes): Content of the PDF file.
+
+    Returns:
+        str: Normalized text, truncated to MAX_CHARS. Empty for scanned PDFs without a text layer.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    parts = []
+    total = 0
+    for page in reader.pages:
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            # A single malformed page should not lose the rest of the paper
+            continue
+        parts.append(text)
+        total += len(text)
+        if total >= MAX_CHARS:
+            break
+    return normalize_text(" ".join(parts))[:MAX_CHARS]
+
+def put_text(paper_id, text):
+    """
+    Stores the extracted text of a paper, compressed, replacing any previous entry.
+
+    Args:
+        paper_id (str | int): The paper's id in the research_data sheet.
+        text (str): The normalized text.
+    """
+    body = zlib.compress(text.encode("utf-8"), 9)
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO fulltext (paper_id, body, chars, updated_at) VALUES (?, ?, ?, ?)",
+                (str(paper_id), body, len(text), time.time())
+            )
+    finally:
+        conn.close()
+
+def delete_text(paper_id):
+    """Removes a paper's stored text, e.g. after the paper was deleted"""
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("DELETE FROM fulltext WHERE paper_id = ?", (str(paper_id),))
+    finally:
+        conn.close()
+
+def load_texts(paper_ids=None):
+    """
+    Returns the stored texts of some papers, or of every paper.
+
+    Args:
+        paper_ids (Iterable[str], optional): Paper ids to read. Defaults to all.
+
+    Returns:
+        dict: Mapping of paper id (str) to normalized text.
+    """
+    conn = _connect()
+    try:
+        if paper_ids is None:
+            rows = conn.execute("SELECT paper_id, body FROM fulltext").fetchall()
+        else:
+            paper_ids = list(paper_ids)
+            rows = []
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(paper_ids), 500):
+                chunk = paper_ids[start:start + 500]
+                rows += conn.execute(
+                    f"SELECT paper_id, body FROM fulltext WHERE paper_id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+    finally:
+        conn.close()
+    return {paper_id: zlib.decompress(body).decode("utf-8") for paper_id, body in rows}
+
+def indexed_ids():
+    """Returns the set of paper ids that already have stored text"""
+    conn = _connect()
+    try:
+        return {row[0] for row in conn.execute("SELECT paper_id FROM fulltext")}
+    finally:
+        conn.close()
+
+def store_version():
+    """
+    Returns a cheap fingerprint of the store that changes whenever a text is added or replaced.
+
+    Returns:
+        tuple: (number of entries, time of the latest write).
+    """
+    conn = _connect()
+    try:
+        return tuple(conn.execute("SELECT COUNT(*), COALESCE(MAX(updated_at), 0) FROM fulltext").fetchone())
+    finally:
+        conn.close()
+
+# Worker process tasks
+def index_pdf(paper_id, pdf_bytes):
+    put_text(paper_id, extract_pdf_text(pdf_bytes))
+
+def index_pdf_url(paper_id, file_url):
+    # Through the PDF cache, which publishing seeds with the uploaded file
+    with open(pdf_cache.fetch(file_url), "rb") as f:
+        index_pdf(paper_id, f.read())
+
+def submit_pdf(paper_id, pdf_bytes):
+    """
+    Queues text extraction of a freshly uploaded PDF in a worker process.
+
+    Args:
+        paper_id (str | int): The paper's id in the research_data sheet.
+        pdf_bytes (bytes): Content of the PDF file.
+
+    Returns:
+        concurrent.futures.Future: The pending extraction.
+    """
+    return workers.submit(index_pdf, str(paper_id), pdf_bytes)
+
+def submit_pdf_url(paper_id, file_url):
+    """Queue extraction of a paper whose PDF is on Drive, usually already in the PDF cache"""
+    return workers.submit(index_pdf_url, str(paper_id), file_url)
+
+def backfill(research_df):
+    """
+    Queues extraction for every paper with a file_url that has no stored text yet.
+
+    Args:
+        research_df (pd.DataFrame): The research data with 'id' and 'file_url' columns.
+
+    Returns:
+        int: Number of papers queued.
+    """
+    done = indexed_ids()
+    queued = 0
+    for paper_id, file_url in zip(research_df['id'], research_df['file_url']):
+        if str(paper_id) in done or not ds.get_file_id(file_url):
+            continue
+        submit_pdf_url(paper_id, file_url)
+        queued += 1
+    logger.info("Queued %d papers for full-text extraction", queued)
+    return queued
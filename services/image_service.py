@@ -0,0 +1,202 @@
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import requests
+from PIL import Image, ImageOps
+
+from services import job_queue as jq
+from services import shared_cache as sc
+
+logger = logging.getLogger(__name__)
+
+# Author photos are shown at 200 px; twice that stays sharp on high-density screens
+MAX_SIZE = 400
+WEBP_QUALITY = 80
+
+# Totals for images normalized by this process
+_totals = {"images": 0, "bytes_before": 0, "bytes_after": 0}
+_totals_lock = threading.Lock()
+
+# Author images fetched by this process, most recently used last
+MAX_CACHED_IMAGE_BYTES = int(os.environ.get("ELAMP_IMAGE_CACHE_MB", "32")) * 1024 * 1024
+_images = OrderedDict()
+_images_bytes = 0
+_images_lock = threading.Lock()
+
+
+def normalize_image(image_bytes, max_size=MAX_SIZE, quality=WEBP_QUALITY):
+    """
+    Decodes, auto-orients, strips metadata and downsizes an image, re-encoding it as WebP.
+
+    Images that are already small WebP files without metadata are returned unchanged,
+    so normalizing twice does not lose quality.
+
+    Args:
+        image_bytes (bytes): The original file content.
+        max_size (int, optional): Longest side in pixels. Defaults to MAX_SIZE.
+        quality (int, optional): WebP quality. Defaults to WEBP_QUALITY.
+
+    Returns:
+        bytes: The WebP file content.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        if (
+            image.format == "WEBP"
+            and max(image.size) <= max_size
+            and not image.info.get("exif")
+            and not image.info.get("icc_profile")
+        ):
+            return image_bytes
+
+        # Apply the EXIF rotation before the metadata is dropped
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        # Saving without exif/icc arguments writes no metadata
+        image.save(output, format="WEBP", quality=quality, method=6)
+    normalized = output.getvalue()
+
+    with _totals_lock:
+        _totals["images"] += 1
+        _totals["bytes_before"] += len(image_bytes)
+        _totals["bytes_after"] += len(normalized)
+    logger.info(
+        "Image normalized from %d to %d bytes (%d saved)",
+        len(image_bytes), len(normalized), len(image_bytes) - len(normalized)
+    )
+    return normalized
+
+def get_totals():
+    """Return how many images this process normalized and the bytes before and after"""
+    with _totals_lock:
+        return dict(_totals)
+
+def fetch_drive_image(gdrive_url):
+    """
+    Downloads an image stored on Drive, through the shared cache so each replica does not fetch it again.
+
+    Recently used images are also kept in this process's memory.
+
+    Args:
+        gdrive_url (str): The Drive share link stored in the sheet.
+
+    Returns:
+        bytes | None: The file content, or None if the link has no file id or the download failed.
+    """
+    from services import drive_service as ds
+
+    file_id = ds.get_file_id(gdrive_url)
+    if not file_id:
+        return None
+
+    def download():
+        response = requests.get(ds.get_download_url(gdrive_url), timeout=60)
+        response.raise_for_status()
+        return response.content
+
+    global _images_bytes
+    with _images_lock:
+        if file_id in _images:
+            _images.move_to_end(file_id)
+            return _images[file_id]
+    try:
+        content = sc.get_or_build(f"img:{file_id}", download)
+    except requests.RequestException as e:
+        logger.warning("Could not fetch image %s: %s", gdrive_url, e)
+        return None
+    with _images_lock:
+        if file_id not in _images:
+            _images[file_id] = content
+            _images_bytes += len(content)
+            while _images_bytes > MAX_CACHED_IMAGE_BYTES and _images:
+                _images_bytes -= len(_images.popitem(last=False)[1])
+    return content
+
+
+class _MemoryUpload:
+    def __init__(self, content, name):
+        self._content = content
+        self.name = name
+
+    def getvalue(self):
+        return self._content
+
+def backfill_author_images(author_img_urls):
+    """
+    Re-encodes existing author images and points the research sheet at the new files.
+
+    Args:
+        author_img_urls (Iterable[str]): Drive links from the 'author_img_url' column.
+
+    Returns:
+        list[dict]: One report per image with 'url', 'new_url', 'bytes_before', 'bytes_after'
+                    or 'error'. Images that are already normalized are skipped.
+    """
+    from services import drive_service as ds
+    from services import sheets_service as ss
+
+    report = []
+    replacements = {}
+    for url in sorted({u for u in author_img_urls if ds.get_file_id(u)}):
+        try:
+            response = requests.get(ds.get_download_url(url), timeout=60)
+            response.raise_for_status()
+            original = response.content
+            normalized = normalize_image(original)
+            if normalized is original:
+                continue
+            new_url = ds.upload_img(_MemoryUpload(normalized, "author.webp"))
+            replacements[url] = new_url
+            report.append({"url": url, "new_url": new_url, "bytes_before": len(original), "bytes_after": len(normalized)})
+        except Exception as e:
+            logger.warning("Could not re-encode %s: %s", url, e)
+            report.append({"url": url, "error": str(e)})
+
+    if replacements:
+        ss.replace_column_values("author_img_url", replacements)
+    return report
+
+BACKFILL_JOB_KIND = "image_backfill"
+
+def _run_backfill_job(payload, results):
+    report = backfill_author_images(payload["urls"])
+    done = [r for r in report if "error" not in r]
+    return {
+        "images": len(done),
+        "failed": len(report) - len(done),
+        "bytes_saved": sum(r["bytes_before"] - r["bytes_after"] for r in done),
+    }
+
+def _on_backfill_done(payload, results):
+    from services import catalog_service as cs
+    cs.invalidate_research_data()
+
+jq.register_stages(BACKFILL_JOB_KIND, [("reencode", _run_backfill_job)], on_done=_on_backfill_done)
+
+def submit_backfill(author_img_urls):
+    """Queue re-encoding of existing author images as a background job"""
+    return jq.submit(BACKFILL_JOB_KIND, {"urls": sorted(set(author_img_urls))})
+
+def last_backfill():
+    """Return the most recent backfill job, or None"""
+    jobs = jq.list_jobs(kind=BACKFILL_JOB_KIND, limit=1)
+    return jobs[0] if jobs else None
+
+if __name__ == "__main__":
+    # Backfill command: python -m services.image_service
+    from services import sheets_service as ss
+
+    urls = ss.get_data_df("research_data", ["author_img_url"])["author_img_url"]
+    results = backfill_author_images(urls)
+    saved = sum(r["bytes_before"] - r["bytes_after"] for r in results if "error" not in r)
+    for r in results:
+        if "error" in r:
+            print(f"FAILED  {r['url']}: {r['error']}")
+        else:
+            print(f"{r['bytes_before']:>10,} -> {r['bytes_after']:>8,} bytes  {r['url']}")
+    print(f"Re-encoded {sum('error' not in r for r in results)} images, saved {saved:,} bytes")
@@ -0,0 +1,307 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from services import local_store
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = "jobs.sqlite3"
+WORKER_THREADS = int(os.environ.get("ELAMP_JOB_THREADS", "2"))
+# A running job whose process has not touched it for this long is taken over by another worker;
+# live processes refresh their jobs three times per lease
+LEASE_SECONDS = int(os.environ.get("ELAMP_JOB_LEASE_SECONDS", "300"))
+# Pause after a worker error such as a locked database, so a persistent fault does not spin
+ERROR_BACKOFF_SECONDS = 5
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# Stage handlers per job kind, run in order; see register_stages
+_stages = {}
+# Callbacks run after a job of a given kind completes
+_on_done = {}
+
+_workers_started = False
+_start_lock = threading.Lock()
+_wakeup = threading.Condition()
+# Ids of the jobs this process is running, kept alive by the heartbeat thread
+_running = set()
+_running_lock = threading.Lock()
+
+
+class SpooledUpload:
+    """An uploaded file saved to disk, readable like Streamlit's UploadedFile"""
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+
+    def getvalue(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+def _connect():
+    conn = local_store.connect(DB_NAME)
+    conn.row_factory = sqlite3.Row
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, status TEXT NOT NULL, "
+        "stage TEXT, payload TEXT NOT NULL, results TEXT NOT NULL DEFAULT '{}', error TEXT, "
+        "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    return conn
+
+def register_stages(kind, stages, on_done=None):
+    """
+    Declares the stages of a job kind.
+
+    Args:
+        kind (str): Job kind, e.g. "publish".
+        stages (list[tuple[str, callable]]): (stage name, handler) pairs. A handler
+            receives the job payload and the results of earlier stages, and returns
+            a JSON-serializable result that is recorded before the next stage runs.
+        on_done (callable, optional): Called with (payload, results) when a job finishes.
+    """
+    _stages[kind] = stages
+    if on_done:
+        _on_done[kind] = on_done
+
+def spool_file(uploaded_file):
+    """
+    Saves an uploaded file to disk so a job can still read it after the session ends.
+
+    Args:
+        uploaded_file (UploadedFile): The file from st.file_uploader.
+
+    Returns:
+        dict: {"path", "name"} to store in a job payload.
+    """
+    folder = local_store.get_dir("uploads", uuid.uuid4().hex)
+    path = os.path.join(folder, os.path.basename(uploaded_file.name))
+    with open(path, "wb") as f:
+        f.write(uploaded_file.getvalue())
+    return {"path": path, "name": uploaded_file.name}
+
+def open_spooled(spooled):
+    """Return a readable upload for a {"path", "name"} entry created by spool_file"""
+    return SpooledUpload(spooled["path"], spooled["name"])
+
+def submit(kind, payload):
+    """
+    Adds a job to the durable queue and wakes a worker.
+
+    Args:
+        kind (str): A kind declared with register_stages.
+        payload (dict): JSON-serializable job input.
+
+    Returns:
+        int: The job id.
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (kind, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, QUEUED, json.dumps(payload), now, now)
+            )
+        job_id = cursor.lastrowid
+    finally:
+        conn.close()
+    start_workers()
+    with _wakeup:
+        _wakeup.notify()
+    return job_id
+
+def retry(job_id):
+    """Requeue a failed job; it resumes after its last completed stage"""
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = NULL, updated_at = ? WHERE id = ? AND status = ?",
+                (QUEUED, time.time(), job_id, FAILED)
+            )
+    finally:
+        conn.close()
+    with _wakeup:
+        _wakeup.notify()
+
+def list_jobs(kind=None, limit=10, since=None):
+    """
+    Returns the most recent jobs, newest first.
+
+    Args:
+        kind (str, optional): Only jobs of this kind.
+        limit (int, optional): Maximum number of jobs. Defaults to 10.
+        since (float, optional): Only jobs updated after this UNIX time.
+
+    Returns:
+        list[dict]: Jobs with decoded payload and results.
+    """
+    query = "SELECT * FROM jobs WHERE 1 = 1"
+    params = []
+    if kind:
+        query += " AND kind = ?"
+        params.append(kind)
+    if since:
+        query += " AND updated_at >= ?"
+        params.append(since)
+    query += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    conn = _connect()
+    try:
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+    return [_decode(row) for row in rows]
+
+def get_job(job_id):
+    """Return one job with decoded payload and results, or None if there is no such job"""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return _decode(row) if row else None
+
+def _decode(row):
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["results"] = json.loads(job["results"])
+    return job
+
+def _requeue_expired(conn):
+    # Jobs of a process that stopped mid-run; they resume from their last completed stage
+    conn.execute(
+        "UPDATE jobs SET status = ? WHERE status = ? AND updated_at < ?",
+        (QUEUED, RUNNING, time.time() - LEASE_SECONDS)
+    )
+
+def _claim_next():
+    kinds = list(_stages)
+    if not kinds:
+        return None
+    conn = _connect()
+    try:
+        with conn:
+            _requeue_expired(conn)
+            # Only kinds this process can run; another process may have registered more
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE status = ? AND kind IN ({','.join('?' * len(kinds))}) ORDER BY id LIMIT 1",
+                (QUEUED, *kinds)
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), row["id"], QUEUED)
+            ).rowcount
+        return dict(row) if claimed else None
+    finally:
+        conn.close()
+
+def _update(job_id, **fields):
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+    finally:
+        conn.close()
+
+def _run_job(job):
+    payload = json.loads(job["payload"])
+    results = json.loads(job["results"])
+    for stage_name, handler in _stages[job["kind"]]:
+        # Stages recorded by an earlier, interrupted run are not repeated
+        if stage_name in results:
+            continue
+        _update(job["id"], stage=stage_name)
+        try:
+            results[stage_name] = handler(payload, results)
+        except Exception as e:
+            logger.exception("Job %s failed at stage %s", job["id"], stage_name)
+            _update(job["id"], status=FAILED, error=f"{stage_name}: {e}")
+            return
+        _update(job["id"], results=json.dumps(results))
+    _update(job["id"], status=DONE, stage=None)
+    if job["kind"] in _on_done:
+        try:
+            _on_done[job["kind"]](payload, results)
+        except Exception:
+            logger.exception("Completion callback of job %s failed", job["id"])
+
+def _worker_loop():
+    while True:
+        job = None
+        try:
+            job = _claim_next()
+            if job is None:
+                with _wakeup:
+                    _wakeup.wait(timeout=5)
+                continue
+            with _running_lock:
+                _running.add(job["id"])
+            _run_job(job)
+        except Exception as e:
+            # A locked database, a bad payload or an unknown kind must not stop the worker
+            logger.exception("Job worker error%s", f" on job {job['id']}" if job else "")
+            if job is not None:
+                try:
+                    _update(job["id"], status=FAILED, error=str(e))
+                except Exception:
+                    logger.exception("Could not mark job %s as failed", job["id"])
+            time.sleep(ERROR_BACKOFF_SECONDS)
+        finally:
+            if job is not None:
+                with _running_lock:
+                    _running.discard(job["id"])
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(LEASE_SECONDS / 3)
+        with _running_lock:
+            job_ids = list(_running)
+        if not job_ids:
+            continue
+        try:
+            conn = _connect()
+            try:
+                with conn:
+                    conn.execute(
+                        f"UPDATE jobs SET updated_at = ? WHERE status = ? AND id IN ({','.join('?' * len(job_ids))})",
+                        (time.time(), RUNNING, *job_ids)
+                    )
+            finally:
+                conn.close()
+        except Exception:
+            logger.exception("Could not renew the lease of running jobs")
+
+def start_workers():
+    """
+    Starts the worker threads once per process.
+
+    Jobs left running by a process that stopped are requeued once their lease of
+    LEASE_SECONDS expires, and resume from their last completed stage. Jobs another
+    live process is running keep their lease through its heartbeat.
+    """
+    global _workers_started
+    with _start_lock:
+        if _workers_started:
+            return
+        threading.Thread(target=_heartbeat_loop, name="job-heartbeat", daemon=True).start()
+        for i in range(WORKER_THREADS):
+            threading.Thread(target=_worker_loop, name=f"job-worker-{i}", daemon=True).start()
+        _workers_started = True
+
+def remove_spooled(*spooled_files):
+    """Delete the spooled copies of uploaded files once a job no longer needs them"""
+    for spooled in spooled_files:
+        shutil.rmtree(os.path.dirname(spooled["path"]), ignore_errors=True)
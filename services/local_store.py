@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import uuid
+
+# Root folder for data kept on the server's own disk (indexes, caches, queues)
+DATA_DIR = os.environ.get("ELAMP_DATA_DIR", ".elamp_data")
+
+def get_path(*parts):
+    """
+    Returns a path inside the local data folder, creating parent folders as needed.
+
+    Args:
+        *parts (str): Path components relative to the data folder.
+
+    Returns:
+        str: The absolute path.
+    """
+    path = os.path.abspath(os.path.join(DATA_DIR, *parts))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+def get_dir(*parts):
+    """
+    Returns a folder inside the local data folder, creating it if needed.
+
+    Args:
+        *parts (str): Path components relative to the data folder.
+
+    Returns:
+        str: The absolute folder path.
+    """
+    path = os.path.abspath(os.path.join(DATA_DIR, *parts))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def temp_path(path):
+    """
+    Returns a unique temporary name next to a file, to write it there and os.replace it into place.
+
+    Sessions are threads of one process and replicas may share the folder, so neither
+    the process id nor the thread id alone keeps two writers of the same file apart.
+
+    Args:
+        path (str): The file that will be replaced.
+
+    Returns:
+        str: A path in the same folder ending in ".tmp".
+    """
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+def connect(db_name: str):
+    """
+    Opens a SQLite database in the local data folder.
+
+    WAL mode lets the Streamlit threads read while a worker process or
+    thread is writing to the same file.
+
+    Args:
+        db_name (str): File name of the database, e.g. "fulltext.sqlite3".
+
+    Returns:
+        sqlite3.Connection: A new connection; callers should close it when done.
+    """
+    conn = sqlite3.connect(get_path(db_name), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def trim_dir(path, max_bytes, suffix=""):
+    """
+    Deletes the least recently used files in a folder until it fits a size limit.
+
+    Recency is the file's modification time; cache readers touch files on use.
+
+    Args:
+        path (str): The folder to trim.
+        max_bytes (int): Size limit in bytes.
+        suffix (str, optional): Only consider files with this suffix.
+
+    Returns:
+        int: Total size in bytes after trimming.
+    """
+    entries = []
+    total = 0
+    with os.scandir(path) as it:
+        for entry in it:
+            if not entry.is_file() or not entry.name.endswith(suffix):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    if total <= max_bytes:
+        return total
+    entries.sort()
+    for _, size, file_path in entries:
+        try:
+            os.remove(file_path)
+        except OSError:
+            continue
+        total -= size
+        if total <= max_bytes:
+            break
+    return total
@@ -0,0 +1,283 @@
+import atexit
+import itertools
+import logging
+import os
+import threading
+import time
+
+from services import local_store
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = "metrics.sqlite3"
+N_SHARDS = 16
+FLUSH_INTERVAL = int(os.environ.get("ELAMP_METRICS_FLUSH_SECONDS", "30"))
+# Distinct pending counters that force an early flush
+MAX_PENDING = 10_000
+# Counters kept for retry while flushes fail; the oldest beyond this are dropped
+MAX_RETRY = MAX_PENDING * 10
+# Minimum time between checks for flushes by other replicas sharing the data folder
+GENERATION_POLL_SECONDS = 5
+
+VIEW, DOWNLOAD, CITATION_COPY = "view", "download", "citation_copy"
+
+
+class ShardedCounter:
+    """
+    In-process counters split across independently locked shards.
+
+    Sessions run on separate threads; spreading keys over shards keeps them
+    from queuing on a single lock when they record at the same time.
+    """
+
+    def __init__(self, n_shards=N_SHARDS):
+        self._shards = [({}, threading.Lock()) for _ in range(n_shards)]
+        self._pending = 0
+
+    def add(self, key, n=1):
+        """Add n to a counter and return the approximate number of distinct pending counters"""
+        counts, lock = self._shards[hash(key) % len(self._shards)]
+        with lock:
+            if key not in counts:
+                self._pending += 1
+            counts[key] = counts.get(key, 0) + n
+        return self._pending
+
+    def peek(self, event):
+        """Return pending counts of one event without draining them"""
+        merged = {}
+        for counts, lock in self._shards:
+            with lock:
+                for (key_event, paper_id), n in counts.items():
+                    if key_event == event:
+                        merged[paper_id] = merged.get(paper_id, 0) + n
+        return merged
+
+    def discard(self, paper_id):
+        """Remove the pending counts of one paper for every event"""
+        for counts, lock in self._shards:
+            with lock:
+                for key in [k for k in counts if k[1] == paper_id]:
+                    del counts[key]
+                    self._pending -= 1
+
+    def drain(self):
+        """Empty every shard and return the merged pending counts"""
+        merged = {}
+        for counts, lock in self._shards:
+            with lock:
+                items = list(counts.items())
+                counts.clear()
+            for key, n in items:
+                merged[key] = merged.get(key, 0) + n
+        self._pending = 0
+        return merged
+
+_pending = ShardedCounter()
+# Counts of failed flushes, oldest first, written by the next flush
+_retry = {}
+_retry_lock = threading.Lock()
+# Flushed totals per event, loaded from SQLite on first use and again after another replica flushes
+_totals = None
+_totals_generation = None
+_totals_lock = threading.Lock()
+# Stored with the counters and increased by every flush of any replica, so cached
+# "Most viewed" orderings and the totals above are refreshed
+_generation = 0
+_generation_checked_at = None
+_flush_requested = threading.Event()
+_flusher_started = False
+_flusher_lock = threading.Lock()
+
+
+def _connect():
+    conn = local_store.connect(DB_NAME)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS counters ("
+        "event TEXT NOT NULL, paper_id TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (event, paper_id))"
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    return conn
+
+def _read_generation(conn):
+    row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+    return row[0] if row else 0
+
+def _load_totals():
+    global _totals, _totals_generation
+    current = generation()
+    with _totals_lock:
+        if _totals is None or _totals_generation != current:
+            try:
+                conn = _connect()
+                try:
+                    # Read first: a flush landing in between only causes one more reload
+                    loaded_generation = _read_generation(conn)
+                    rows = conn.execute("SELECT event, paper_id, count FROM counters").fetchall()
+                finally:
+                    conn.close()
+            except Exception:
+                if _totals is None:
+                    raise
+                logger.exception("Could not reload usage counters, keeping the previous totals")
+                return _totals
+            _totals = {}
+            for event, paper_id, count in rows:
+                _totals.setdefault(event, {})[paper_id] = count
+            _totals_generation = loaded_generation
+        return _totals
+
+def flush():
+    """
+    Writes pending counts to SQLite in one transaction and folds them into the in-memory totals.
+
+    Returns:
+        int: Number of counters written.
+    """
+    global _totals, _totals_generation, _generation, _generation_checked_at
+    with _retry_lock:
+        drained = dict(_retry)
+        _retry.clear()
+    for key, n in _pending.drain().items():
+        drained[key] = drained.get(key, 0) + n
+    if not drained:
+        return 0
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO counters (event, paper_id, count) VALUES (?, ?, ?) "
+                    "ON CONFLICT (event, paper_id) DO UPDATE SET count = count + excluded.count",
+                    [(event, paper_id, n) for (event, paper_id), n in drained.items()]
+                )
+                conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('generation', 1) "
+                    "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+                )
+                new_generation = _read_generation(conn)
+        finally:
+            conn.close()
+    except Exception:
+        _keep_for_retry(drained)
+        raise
+
+    with _totals_lock:
+        if _totals is not None and _totals_generation == new_generation - 1:
+            for (event, paper_id), n in drained.items():
+                event_totals = _totals.setdefault(event, {})
+                event_totals[paper_id] = event_totals.get(paper_id, 0) + n
+            _totals_generation = new_generation
+        else:
+            # Another replica flushed since the totals were loaded; read them again on next use
+            _totals = None
+        _generation = new_generation
+        _generation_checked_at = time.monotonic()
+    return len(drained)
+
+def _keep_for_retry(counts):
+    # Failed flushes must not grow memory without bound while the database stays unavailable
+    with _retry_lock:
+        for key, n in counts.items():
+            _retry[key] = _retry.get(key, 0) + n
+        excess = len(_retry) - MAX_RETRY
+        if excess > 0:
+            for key in list(itertools.islice(_retry, excess)):
+                del _retry[key]
+            logger.warning("Usage counters cannot be flushed; dropped the %d oldest unsaved counters", excess)
+
+def _flush_loop():
+    while True:
+        _flush_requested.wait(timeout=FLUSH_INTERVAL)
+        _flush_requested.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception("Could not flush usage counters")
+
+def _start_flusher():
+    global _flusher_started
+    with _flusher_lock:
+        if _flusher_started:
+            return
+        threading.Thread(target=_flush_loop, name="metrics-flusher", daemon=True).start()
+        # Do not lose the last interval's counts when the server stops
+        atexit.register(flush)
+        _flusher_started = True
+
+def record(event, paper_id, n=1):
+    """
+    Counts a usage event in memory; it reaches SQLite on the next periodic flush.
+
+    Args:
+        event (str): VIEW, DOWNLOAD or CITATION_COPY.
+        paper_id: The paper's id in the research data.
+        n (int, optional): Amount to add. Defaults to 1.
+    """
+    _start_flusher()
+    if _pending.add((event, str(paper_id)), n) >= MAX_PENDING:
+        _flush_requested.set()
+
+def delete_counts(paper_id):
+    """Removes every counter of a paper, flushed or pending, e.g. after the paper was deleted"""
+    global _totals, _generation_checked_at
+    paper_id = str(paper_id)
+    _pending.discard(paper_id)
+    with _retry_lock:
+        for key in [k for k in _retry if k[1] == paper_id]:
+            del _retry[key]
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("DELETE FROM counters WHERE paper_id = ?", (paper_id,))
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('generation', 1) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+            )
+    finally:
+        conn.close()
+    with _totals_lock:
+        # Reloaded on next use; the generation change refreshes other replicas and cached orderings
+        _totals = None
+        _generation_checked_at = None
+
+def get_totals(event):
+    """Return flushed counts of an event as a dict of paper id (str) to count"""
+    totals = _load_totals()
+    with _totals_lock:
+        return dict(totals.get(event, {}))
+
+def get_counts(event):
+    """Return flushed plus pending counts of an event as a dict of paper id (str) to count"""
+    counts = get_totals(event)
+    for paper_id, n in _pending.peek(event).items():
+        counts[paper_id] = counts.get(paper_id, 0) + n
+    with _retry_lock:
+        for (key_event, paper_id), n in _retry.items():
+            if key_event == event:
+                counts[paper_id] = counts.get(paper_id, 0) + n
+    return counts
+
+def generation():
+    """
+    Return a number that changes whenever flushed totals change, on this replica or on
+    another one sharing the data folder; the database is checked every GENERATION_POLL_SECONDS.
+    """
+    global _generation, _generation_checked_at
+    now = time.monotonic()
+    with _totals_lock:
+        if _generation_checked_at is not None and now - _generation_checked_at < GENERATION_POLL_SECONDS:
+            return _generation
+    try:
+        conn = _connect()
+        try:
+            current = _read_generation(conn)
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning("Could not check usage counters for updates: %s", e)
+        return _generation
+    with _totals_lock:
+        _generation = current
+        _generation_checked_at = now
+    return current
@@ -0,0 +1,129 @@
+import logging
+import os
+import threading
+
+import requests
+
+from services import drive_service as ds
+from services import local_store
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = local_store.get_dir("pdf_cache")
+MAX_BYTES = int(os.environ.get("ELAMP_PDF_CACHE_MB", "2048")) * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+_evict_lock = threading.Lock()
+# One lock per file being downloaded, so concurrent misses fetch it from Drive once
+_download_locks = {}
+_download_locks_lock = threading.Lock()
+
+
+def get_cached_path(file_id):
+    """
+    Returns the local path of a cached PDF and marks it as recently used.
+
+    Args:
+        file_id (str): The Drive file ID.
+
+    Returns:
+        str | None: The path, or None if the PDF is not cached.
+    """
+    path = os.path.join(CACHE_DIR, f"{file_id}.pdf")
+    try:
+        os.utime(path)
+        return path
+    except OSError:
+        return None
+
+def _download(file_id, path):
+    url = f"https://drive.google.com/uc?export=download&id={file_id}"
+    response = requests.get(url, stream=True, timeout=60)
+    # Large files get a virus-scan interstitial page instead of the PDF
+    if response.headers.get("Content-Type", "").startswith("text/html"):
+        response.close()
+        response = requests.get(f"{url}&confirm=t", stream=True, timeout=60)
+    response.raise_for_status()
+    if response.headers.get("Content-Type", "").startswith("text/html"):
+        raise ValueError(f"Drive did not return a file for {file_id}")
+
+    tmp_path = local_store.temp_path(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    finally:
+        response.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def fetch(file_url):
+    """
+    Returns the local path of a paper's PDF, downloading it from Drive on a cache miss.
+
+    The download is streamed to disk, so memory use does not depend on the file size.
+
+    Args:
+        file_url (str): The Drive share link stored in the sheet.
+
+    Returns:
+        str: Path of the cached PDF.
+    """
+    file_id = ds.get_file_id(file_url)
+    if not file_id:
+        raise ValueError(f"Not a Drive file link: {file_url}")
+    return fetch_id(file_id)
+
+def fetch_id(file_id):
+    """Same as fetch, for a Drive file ID"""
+    path = get_cached_path(file_id)
+    if path:
+        return path
+    with _download_locks_lock:
+        lock = _download_locks.setdefault(file_id, threading.Lock())
+    with lock:
+        # Another thread may have finished the download while this one waited
+        path = get_cached_path(file_id)
+        if path:
+            return path
+        path = os.path.join(CACHE_DIR, f"{file_id}.pdf")
+        try:
+            _download(file_id, path)
+        finally:
+            with _download_locks_lock:
+                _download_locks.pop(file_id, None)
+    evict()
+    return path
+
+def put(file_id, pdf_bytes):
+    """Store PDF bytes that are already in memory, such as a fresh upload"""
+    path = os.path.join(CACHE_DIR, f"{file_id}.pdf")
+    tmp_path = local_store.temp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(pdf_bytes)
+    os.replace(tmp_path, path)
+    evict()
+    return path
+
+def evict(max_bytes=None):
+    """
+    Removes least recently used PDFs until the cache fits its size limit.
+
+    Args:
+        max_bytes (int, optional): Size limit in bytes. Defaults to MAX_BYTES.
+    """
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    with _evict_lock:
+        total = local_store.trim_dir(CACHE_DIR, max_bytes, suffix=".pdf")
+    logger.debug("PDF cache holds %.1f MB", total / 1024 / 1024)
+
+def stats():
+    """Return the number of cached PDFs and their total size in bytes"""
+    count = total = 0
+    with os.scandir(CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".pdf"):
+                count += 1
+                total += entry.stat().st_size
+    return {"files": count, "bytes": total, "max_bytes": MAX_BYTES}
@@ -0,0 +1,241 @@
+import hashlib
+import hmac
+import logging
+import os
+import re
+import secrets
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services import bulk_download_service as bd
+from services import drive_service as ds
+from services import metrics_service as ms
+from services import pdf_cache
+
+logger = logging.getLogger(__name__)
+
+# Port of the in-process proxy; unset runs no proxy in this process
+PROXY_PORT = os.environ.get("ELAMP_PDF_PROXY_PORT", "")
+# Public base URL of the proxy as visitors reach it, e.g. https://elamp.example.edu/files;
+# unset keeps downloads on Drive links
+PROXY_URL = os.environ.get("ELAMP_PDF_PROXY_URL", "").rstrip("/")
+# Shared by every process that builds or serves proxy links; random when unset,
+# which only works when pages and proxy run in the same process
+PROXY_SECRET = (os.environ.get("ELAMP_PDF_PROXY_SECRET") or secrets.token_hex(32)).encode()
+CACHE_MAX_AGE = 7 * 24 * 60 * 60
+
+_PATH_PATTERN = re.compile(r"^/pdf/([a-zA-Z0-9_-]+)$")
+_ZIP_PATH_PATTERN = re.compile(r"^/zip/([a-zA-Z0-9_.-]+)$")
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def sign(file_id, paper_id=None):
+    """
+    Returns the signature that lets the proxy serve a Drive file, or an archive as zip/<name>.
+
+    A paper id is signed with the file, so a link only counts downloads of its own paper.
+    """
+    message = file_id if paper_id is None else f"{file_id}:{paper_id}"
+    return hmac.new(PROXY_SECRET, message.encode(), hashlib.sha256).hexdigest()[:32]
+
+def is_enabled():
+    """Return True when download links should go through the proxy, i.e. its public URL is configured"""
+    return bool(PROXY_URL)
+
+if PROXY_PORT and not PROXY_URL:
+    logger.warning(
+        "ELAMP_PDF_PROXY_PORT is set without ELAMP_PDF_PROXY_URL; download links use Drive "
+        "because visitors cannot reach the proxy through localhost"
+    )
+
+def download_url(file_url, paper_id=None, file_name=None):
+    """
+    Builds the link visitors use to download a paper.
+
+    Args:
+        file_url (str): The Drive share link stored in the sheet.
+        paper_id (optional): The paper's id, so the proxy can count the download.
+        file_name (str, optional): Name the browser saves the file as.
+
+    Returns:
+        str: A signed proxy link when the proxy is enabled, otherwise the Drive download link.
+    """
+    file_id = ds.get_file_id(file_url)
+    if not file_id or not is_enabled():
+        return ds.get_download_url(file_url) if file_id else file_url
+    query = {}
+    if paper_id is not None:
+        query["paper"] = str(paper_id)
+    query["sig"] = sign(file_id, query.get("paper"))
+    if file_name:
+        query["name"] = file_name
+    return f"{PROXY_URL}/pdf/{file_id}?{urllib.parse.urlencode(query)}"
+
+def zip_url(file_name, download_name="papers.zip"):
+    """
+    Builds the link visitors use to download an archive from bulk_download_service.
+
+    Args:
+        file_name (str): The archive name a ZIP job reported.
+        download_name (str, optional): Name the browser saves the file as.
+
+    Returns:
+        str | None: A signed proxy link, or None when the proxy is not enabled.
+    """
+    if not is_enabled():
+        return None
+    query = {"sig": sign(f"zip/{file_name}"), "name": download_name}
+    return f"{PROXY_URL}/zip/{file_name}?{urllib.parse.urlencode(query)}"
+
+def parse_range(header, size):
+    """
+    Parses a single-range Range header.
+
+    Args:
+        header (str | None): The Range header value.
+        size (int): File size in bytes.
+
+    Returns:
+        tuple[int, int] | None | bool: Inclusive (start, end) for a valid range, None to send
+                                      the whole file, or False when the range is unsatisfiable.
+    """
+    match = _RANGE_PATTERN.match(header or "")
+    if not match or match.group(1) == match.group(2) == "":
+        # Absent, malformed or multi-range requests get the whole file
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _send_empty(self, code, headers=None):
+        self.send_response(code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _serve(self, send_body):
+        parsed = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parsed.query)
+        signature = query.get("sig", [""])[0]
+        pdf_match = _PATH_PATTERN.match(parsed.path)
+        zip_match = _ZIP_PATH_PATTERN.match(parsed.path)
+        if pdf_match:
+            file_id = pdf_match.group(1)
+            paper_id = query["paper"][0] if "paper" in query else None
+            if not hmac.compare_digest(signature, sign(file_id, paper_id)):
+                return self._send_empty(403)
+            try:
+                path = pdf_cache.fetch_id(file_id)
+                f = open(path, "rb")
+            except Exception as e:
+                logger.warning("Could not fetch %s for download: %s", file_id, e)
+                return self._send_empty(502)
+            with f:
+                # Not the modification time: the PDF cache touches it on every fetch to track use
+                etag = f'"{file_id}-{os.fstat(f.fileno()).st_size}"'
+                self._send_file(f, query, send_body, "application/pdf", f"{file_id}.pdf", etag, paper_id)
+        elif zip_match:
+            file_name = zip_match.group(1)
+            if not hmac.compare_digest(signature, sign(f"zip/{file_name}")):
+                return self._send_empty(403)
+            path = bd.archive_path(file_name)
+            try:
+                f = open(path, "rb")
+            except (OSError, TypeError):
+                # Removed after ZIP_MAX_AGE; the visitor prepares it again
+                return self._send_empty(404)
+            with f:
+                # Archive names are derived from the data version and the selection
+                etag = f'"{file_name}-{os.fstat(f.fileno()).st_size}"'
+                self._send_file(f, query, send_body, "application/zip", "papers.zip", etag)
+        else:
+            return self._send_empty(404)
+
+    def _send_file(self, f, query, send_body, content_type, default_name, etag, paper_id=None):
+        size = os.fstat(f.fileno()).st_size
+        headers = {
+            "ETag": etag,
+            "Accept-Ranges": "bytes",
+            "Cache-Control": f"public, max-age={CACHE_MAX_AGE}",
+        }
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            return self._send_empty(304, headers)
+
+        byte_range = None
+        # A stale If-Range means the client's partial copy is outdated: send everything
+        if self.headers.get("If-Range", etag) == etag:
+            byte_range = parse_range(self.headers.get("Range"), size)
+        if byte_range is False:
+            return self._send_empty(416, {**headers, "Content-Range": f"bytes */{size}"})
+
+        start, end = byte_range or (0, size - 1)
+        self.send_response(206 if byte_range else 200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        file_name = query.get("name", [default_name])[0]
+        self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{urllib.parse.quote(file_name)}")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if not send_body:
+            return
+        # Count a download once, not for every range a resuming client requests
+        if start == 0 and paper_id is not None:
+            ms.record(ms.DOWNLOAD, paper_id)
+        # Zero-copy: the kernel moves the file to the socket (os.sendfile on Linux)
+        self.connection.sendfile(f, offset=start, count=end - start + 1)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+def serve(port):
+    """Serve the proxy in the calling thread"""
+    ThreadingHTTPServer(("0.0.0.0", port), ProxyHandler).serve_forever()
+
+def start():
+    """Start the proxy in a background thread once per process, if ELAMP_PDF_PROXY_PORT is set"""
+    global _started
+    with _start_lock:
+        if _started or not PROXY_PORT:
+            return
+        _started = True
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", int(PROXY_PORT)), ProxyHandler)
+    except OSError as e:
+        logger.error("Could not start the PDF proxy on port %s: %s", PROXY_PORT, e)
+        return
+    threading.Thread(target=server.serve_forever, name="pdf-proxy", daemon=True).start()
+    logger.info("PDF proxy listening on port %s", PROXY_PORT)
+
+if __name__ == "__main__":
+    # Standalone proxy: python -m services.pdf_proxy [port]
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    serve(int(sys.argv[1]) if len(sys.argv) > 1 else int(PROXY_PORT or "8600"))
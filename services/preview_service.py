@@ -0,0 +1,135 @@
+import logging
+import os
+import threading
+import time
+
+from services import drive_service as ds
+from services import local_store
+from services import pdf_cache
+from services import workers
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_DIR = local_store.get_dir("previews")
+MAX_BYTES = int(os.environ.get("ELAMP_PREVIEW_CACHE_MB", "256")) * 1024 * 1024
+# Rendered width in pixels; the feed shows previews at half this size
+PREVIEW_WIDTH = 240
+
+# Wait before rendering a preview again after it failed, e.g. for a broken PDF
+RETRY_FAILED_SECONDS = int(os.environ.get("ELAMP_PREVIEW_RETRY_MINUTES", "60")) * 60
+
+# Drive file ids with a render in flight, so each preview is rendered once
+_pending = set()
+# Drive file id to the time its last render failed
+_failed = {}
+_pending_lock = threading.Lock()
+
+
+def _preview_path(file_id):
+    return os.path.join(PREVIEW_DIR, f"{file_id}.webp")
+
+def get_preview(file_url):
+    """
+    Returns the cached first-page preview of a paper and marks it as recently used.
+
+    Args:
+        file_url (str): The Drive share link stored in the sheet.
+
+    Returns:
+        str | None: Path of the WebP preview, or None if it has not been rendered yet.
+    """
+    file_id = ds.get_file_id(file_url)
+    if not file_id:
+        return None
+    path = _preview_path(file_id)
+    try:
+        os.utime(path)
+        return path
+    except OSError:
+        return None
+
+def delete_preview(file_url):
+    """
+    Removes a paper's cached preview, e.g. after the paper was deleted.
+
+    Args:
+        file_url (str): The Drive share link stored in the sheet.
+    """
+    file_id = ds.get_file_id(file_url)
+    if not file_id:
+        return
+    with _pending_lock:
+        _failed.pop(file_id, None)
+    try:
+        os.remove(_preview_path(file_id))
+    except FileNotFoundError:
+        pass
+
+# Worker process task
+def render_preview(file_url):
+    """Render the first page of a paper's PDF to a small WebP image in the preview cache"""
+    import pypdfium2 as pdfium
+
+    file_id = ds.get_file_id(file_url)
+    pdf = pdfium.PdfDocument(pdf_cache.fetch(file_url))
+    try:
+        page = pdf[0]
+        scale = PREVIEW_WIDTH / page.get_width()
+        image = page.render(scale=scale).to_pil()
+    finally:
+        pdf.close()
+
+    path = _preview_path(file_id)
+    tmp_path = local_store.temp_path(path)
+    image.convert("RGB").save(tmp_path, format="WEBP", quality=70, method=6)
+    os.replace(tmp_path, path)
+    local_store.trim_dir(PREVIEW_DIR, MAX_BYTES, suffix=".webp")
+
+def _done(file_id):
+    def callback(future):
+        failed = future.cancelled() or future.exception() is not None
+        now = time.time()
+        with _pending_lock:
+            _pending.discard(file_id)
+            if failed:
+                _failed[file_id] = now
+                for stale_id in [f for f, at in _failed.items() if at < now - RETRY_FAILED_SECONDS]:
+                    del _failed[stale_id]
+            else:
+                _failed.pop(file_id, None)
+    return callback
+
+def _failed_recently(file_id):
+    with _pending_lock:
+        failed_at = _failed.get(file_id)
+    return failed_at is not None and failed_at > time.time() - RETRY_FAILED_SECONDS
+
+def preview_unavailable(file_url):
+    """
+    Returns True if a paper has no preview to wait for.
+
+    That is the case when the link is not a Drive file, or when its last render failed
+    less than RETRY_FAILED_SECONDS ago, such as for a broken PDF or a Drive error page.
+
+    Args:
+        file_url (str): The Drive share link stored in the sheet.
+    """
+    file_id = ds.get_file_id(file_url)
+    return not file_id or _failed_recently(file_id)
+
+def request_preview(file_url):
+    """
+    Queues rendering of a paper's preview in a worker process unless it is cached, already
+    queued, or failed recently.
+
+    Args:
+        file_url (str): The Drive share link stored in the sheet.
+    """
+    file_id = ds.get_file_id(file_url)
+    if not file_id or os.path.exists(_preview_path(file_id)) or _failed_recently(file_id):
+        return
+    with _pending_lock:
+        if file_id in _pending:
+            return
+        _pending.add(file_id)
+    workers.submit(render_preview, file_url).add_done_callback(_done(file_id))
@@ -0,0 +1,137 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from services import local_store
+
+PROFILE_DIR = local_store.get_dir("profiles")
+# Collapsed stack files kept on disk, oldest removed first
+MAX_BYTES = int(os.environ.get("ELAMP_PROFILE_MB", "20")) * 1024 * 1024
+# Time between stack samples
+SAMPLE_INTERVAL = int(os.environ.get("ELAMP_PROFILE_INTERVAL_MS", "5")) / 1000
+# Session state key holding how many more reruns to profile
+SESSION_KEY = "profile_runs"
+SUFFIX = ".folded"
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the thread that enters it from a background thread.
+
+    Use as a context manager around the code to profile. Only frames below the
+    caller are recorded, and identical stacks are counted once per sample, giving
+    the collapsed format flame graph tools read ("outer;inner;leaf count").
+    """
+
+    def __init__(self, label, interval=SAMPLE_INTERVAL):
+        self.label = label
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.seconds = 0.0
+        self._labels = {}
+        self._stop = threading.Event()
+
+    def _frame_label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            file_name = code.co_filename
+            if file_name.startswith(os.getcwd()):
+                file_name = os.path.relpath(file_name)
+            else:
+                file_name = os.path.basename(file_name)
+            label = f"{code.co_name} ({file_name}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None and frame is not self._root:
+                stack.append(self._frame_label(frame.f_code))
+                frame = frame.f_back
+            if frame is None:
+                # The profiled block has returned
+                continue
+            stack.append(self.label)
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._root = sys._getframe(1)
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample_loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self._start
+        self._root = None
+        return False
+
+    def collapsed(self):
+        """Return the samples as collapsed stacks, one 'frame;frame;frame count' line per stack"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def save(profiler):
+    """
+    Writes a profile to the profile folder and trims the folder to MAX_BYTES.
+
+    Returns:
+        str: The file name.
+    """
+    now = time.time()
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
+    slug = re.sub(r"[^a-z0-9]+", "-", profiler.label.lower()).strip("-") or "run"
+    file_name = f"{stamp}-{slug}-{profiler.seconds * 1000:.0f}ms{SUFFIX}"
+    path = os.path.join(PROFILE_DIR, file_name)
+    tmp_path = local_store.temp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(profiler.collapsed())
+    os.replace(tmp_path, path)
+    local_store.trim_dir(PROFILE_DIR, MAX_BYTES, suffix=SUFFIX)
+    return file_name
+
+def run_profiled(session_state, label, run):
+    """
+    Calls run() under the sampling profiler if this session asked for it, otherwise just calls it.
+
+    When profiling is off this costs one dictionary lookup.
+
+    Args:
+        session_state: The session's st.session_state.
+        label (str): Name of what runs, e.g. the page title.
+        run (callable): The page script, e.g. pg.run.
+    """
+    if not session_state.get(SESSION_KEY):
+        return run()
+    session_state[SESSION_KEY] -= 1
+    profiler = SamplingProfiler(label)
+    try:
+        with profiler:
+            return run()
+    finally:
+        # st.rerun and st.stop end the script with an exception; their runs are profiled too
+        save(profiler)
+
+def list_profiles(limit=20):
+    """Return the newest saved profiles as dicts with 'name', 'bytes' and 'modified'"""
+    profiles = []
+    with os.scandir(PROFILE_DIR) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith(SUFFIX):
+                stat = entry.stat()
+                profiles.append({"name": entry.name, "bytes": stat.st_size, "modified": stat.st_mtime})
+    return sorted(profiles, key=lambda p: p["modified"], reverse=True)[:limit]
+
+def read_profile(name):
+    """Return the contents of a saved profile"""
+    with open(os.path.join(PROFILE_DIR, os.path.basename(name)), "rb") as f:
+        return f.read()
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import time
+
+from services import catalog_service as cs
+from services import drive_service as ds
+from services import fulltext_service as ft
+from services import job_queue as jq
+from services import pdf_cache
+from services import preview_service as pv
+from services import sheet_journal as sj
+
+JOB_KIND = "publish"
+
+
+# Publish stages; each result is recorded so an interrupted job resumes where it stopped
+def _upload_img(payload, results):
+    return ds.upload_img(jq.open_spooled(payload["author_img_file"]))
+
+def _upload_pdf(payload, results):
+    return ds.upload_pdf(jq.open_spooled(payload["paper_file"]))
+
+def _add_row(payload, results):
+    fields = {
+        **payload["fields"],
+        "author_img_url": results["upload_img"],
+        "file_url": results["upload_pdf"],
+    }
+    # A retried job yields the same key, but publishing the paper again after it was
+    # deleted is a new submission and must append a new row
+    identity = {**fields, "submitted_at": payload["submitted_at"]} if "submitted_at" in payload else fields
+    key = hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()[:32]
+    # Acknowledged once on local disk; the journal flusher writes it to the sheet
+    entry = sj.append("research_data", {**fields, "created_at": time.strftime("%Y-%m-%d %H:%M:%S")}, key)
+    return entry["key"]
+
+def _render_preview(payload, results):
+    # Seed the PDF cache with the uploaded bytes so workers do not download them again
+    pdf_cache.put(ds.get_file_id(results["upload_pdf"]), jq.open_spooled(payload["paper_file"]).getvalue())
+    pv.request_preview(results["upload_pdf"])
+    return True
+
+def _on_rows_added(entries):
+    # Runs in the journal flusher once rows are in the sheet and have ids
+    for entry in entries:
+        if entry["sheet"] == "research_data":
+            ft.submit_pdf_url(entry["id"], entry["fields"]["file_url"])
+    cs.invalidate_research_data()
+
+sj.on_ack(_on_rows_added)
+
+def _on_done(payload, results):
+    jq.remove_spooled(payload["author_img_file"], payload["paper_file"])
+
+jq.register_stages(
+    JOB_KIND,
+    [
+        ("upload_img", _upload_img),
+        ("upload_pdf", _upload_pdf),
+        ("render_preview", _render_preview),
+        ("add_row", _add_row),
+    ],
+    on_done=_on_done
+)
+
+STAGE_LABELS = {
+    "upload_img": "Uploading author image",
+    "upload_pdf": "Uploading PDF",
+    "render_preview": "Queueing the first-page preview",
+    "add_row": "Saving to the publish journal",
+}
+
+def submit_publish(title, abstract, author_name, category, created_year, keywords, author_img_file, paper_file):
+    """
+    Queues a paper for publishing in the background.
+
+    The uploaded files are saved to local disk first, so the job survives
+    the admin closing the dialog or refreshing the page.
+
+    Returns:
+        int: The job id.
+    """
+    payload = {
+        "fields": {
+            "title": title,
+            "abstract": abstract,
+            "author_name": author_name,
+            "category": category,
+            "created_year": int(created_year),
+            "keywords": keywords,
+        },
+        "author_img_file": jq.spool_file(author_img_file),
+        "paper_file": jq.spool_file(paper_file),
+        "submitted_at": time.time(),
+    }
+    return jq.submit(JOB_KIND, payload)
+
+def list_publish_jobs(limit=5, since=None):
+    """Return recent publish jobs, newest first"""
+    return jq.list_jobs(kind=JOB_KIND, limit=limit, since=since)
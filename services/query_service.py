@@ -0,0 +1,357 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import streamlit as st
+
+from services import catalog_service as cs
+
+# Field names users can qualify a term with, and what they stand for
+FIELD_ALIASES = {
+    'author': 'author', 'by': 'author',
+    'title': 'title',
+    'category': 'category', 'cat': 'category',
+    'keyword': 'keyword', 'keywords': 'keyword', 'kw': 'keyword',
+    'year': 'year',
+    'text': 'text',
+}
+# Compiled plans kept across sessions
+MAX_PLANS = 256
+# Relative cost of checking one row: answered by an index, verified against a column, or scanned in the full text
+INDEX_COST, VERIFY_COST, SCAN_COST = 1, 4, 50
+
+_TOKEN_PATTERN = re.compile(r'(-?)(?:(\w+):)?(?:"([^"]*)"?|(\S+))')
+_RANGE_PATTERN = re.compile(r'^(\d{4})?\.\.(\d{4})?$|^(\d{4})$')
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+@dataclass(frozen=True)
+class Term:
+    """One parsed query term"""
+    field: str
+    value: str
+    negated: bool = False
+    phrase: bool = False
+
+def parse(query):
+    """
+    Parses a search box query into terms.
+
+    Supports field qualifiers (author:Santos), quoted phrases ("pressure ulcer"),
+    year ranges (year:2019..2023, year:2019.., year:..2023) and negation (-pediatric).
+    Unknown qualifiers are kept as plain text.
+
+    Args:
+        query (str): The search box text.
+
+    Returns:
+        list[Term]: Terms in the order they were typed; unqualified ones have field 'any'.
+    """
+    terms = []
+    for match in _TOKEN_PATTERN.finditer(str(query or '')):
+        negated, field, phrase, word = match.groups()
+        value = phrase if phrase is not None else word
+        field = (field or '').lower()
+        if field and field not in FIELD_ALIASES:
+            # "ratio:1" is text, not a field
+            value, field = f"{match.group(2)}:{value}", ''
+        value = value.strip().lower()
+        if not value:
+            continue
+        terms.append(Term(FIELD_ALIASES.get(field, 'any'), value, bool(negated), phrase is not None))
+    return terms
+
+def is_structured(query):
+    """Return True if the query uses qualifiers, phrases or negation; plain queries keep the substring search"""
+    return any(term.field != 'any' or term.negated or term.phrase for term in parse(query))
+
+
+class QueryIndex:
+    """
+    Per-version lookup structures the query planner evaluates predicates against.
+
+    Categories and authors are matched once per distinct value and mapped to rows
+    through their category codes; words of titles, authors and keywords have
+    posting lists, so text predicates only verify rows that contain every word.
+    """
+
+    def __init__(self, research_df, search_text):
+        self.n_rows = len(research_df)
+        self.years = research_df['created_year'].to_numpy(dtype=float, na_value=np.nan)
+        self.sorted_years = np.sort(self.years[~np.isnan(self.years)])
+        self.category_codes = research_df['category'].cat.codes.to_numpy()
+        self.categories = [str(c).lower() for c in research_df['category'].cat.categories]
+        self.author_codes = research_df['author_name'].cat.codes.to_numpy()
+        self.authors = [str(a).lower() for a in research_df['author_name'].cat.categories]
+        self.columns = {
+            'search': search_text.to_numpy(dtype=object),
+            'title': research_df['title'].astype(str).str.lower().to_numpy(dtype=object),
+            'keyword': research_df['keywords'].astype(str).str.lower().to_numpy(dtype=object),
+        }
+        postings = {}
+        for position, text in enumerate(self.columns['search']):
+            for word in set(_WORD_PATTERN.findall(text)):
+                postings.setdefault(word, []).append(position)
+        self.vocabulary = sorted(postings)
+        self.postings = {word: np.array(rows, dtype=np.int32) for word, rows in postings.items()}
+        self._word_rows = {}
+
+    def word_rows(self, word):
+        """Rows whose search text has a word containing the given one, as a sorted array"""
+        # Read once: another session may clear the memo between a check and a lookup
+        rows = self._word_rows.get(word)
+        if rows is None:
+            matches = [self.postings[w] for w in self.vocabulary if word in w]
+            rows = np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int32)
+            if len(self._word_rows) >= 1024:
+                self._word_rows.clear()
+            self._word_rows[word] = rows
+        return rows
+
+    def text_candidates(self, value):
+        """Rows that can contain the text, from the posting lists, or None when the text has no words"""
+        words = _WORD_PATTERN.findall(value)
+        if not words:
+            return None
+        rows = self.word_rows(words[0])
+        for word in words[1:]:
+            rows = np.intersect1d(rows, self.word_rows(word), assume_unique=True)
+        return rows
+
+    def year_count(self, first, last):
+        """Number of rows published in an inclusive year range"""
+        return int(np.searchsorted(self.sorted_years, last, 'right') - np.searchsorted(self.sorted_years, first, 'left'))
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _get_query_index(version, _research_df, _search_text):
+    return QueryIndex(_research_df, _search_text)
+
+def get_query_index(research_df, search_text):
+    """Return the query index of a catalog frame, built once per data version"""
+    return _get_query_index(cs.catalog_version(research_df), research_df, search_text)
+
+
+class Predicate:
+    """A condition on catalog rows with an estimate of how many rows it keeps and what it costs"""
+
+    cost = INDEX_COST
+    needs_fulltext = False
+
+    def __init__(self, label, negated=False):
+        self.label = label
+        self.negated = negated
+        self.estimate = 0
+
+    def matches(self, index, df, rows):
+        """Return a boolean mask of which of the given rows satisfy the condition"""
+        raise NotImplementedError
+
+    def describe(self):
+        return f"NOT {self.label}" if self.negated else self.label
+
+class CodesPredicate(Predicate):
+    """Rows whose categorical code is one of the matching distinct values"""
+
+    def __init__(self, label, codes, wanted, negated=False):
+        super().__init__(label, negated)
+        self.codes = codes
+        self.wanted = np.array(sorted(wanted), dtype=codes.dtype)
+        self.estimate = int(np.isin(codes, self.wanted).sum()) if len(self.wanted) else 0
+
+    def matches(self, index, df, rows):
+        return np.isin(self.codes[rows], self.wanted)
+
+class YearPredicate(Predicate):
+    def __init__(self, label, first, last, index, negated=False):
+        super().__init__(label, negated)
+        self.first, self.last = first, last
+        self.estimate = index.year_count(first, last)
+
+    def matches(self, index, df, rows):
+        years = index.years[rows]
+        with np.errstate(invalid='ignore'):
+            return (years >= self.first) & (years <= self.last)
+
+class TextPredicate(Predicate):
+    """
+    A substring of one text column, optionally also of the full text.
+
+    Candidates come from the posting lists; only they are verified against the column.
+    The full text has no index, so when it is included the rows still in play are scanned.
+    """
+
+    def __init__(self, label, value, column, index, fulltext=False, negated=False):
+        super().__init__(label, negated)
+        self.value = value
+        self.column = column
+        self.candidates = index.text_candidates(value)
+        self.needs_fulltext = fulltext
+        if fulltext:
+            self.cost = SCAN_COST
+            self.estimate = index.n_rows
+        elif self.candidates is None:
+            self.cost = VERIFY_COST
+            self.estimate = index.n_rows
+        else:
+            self.cost = VERIFY_COST
+            self.estimate = len(self.candidates)
+
+    def matches(self, index, df, rows):
+        column = index.columns[self.column]
+        if self.candidates is not None:
+            in_candidates = np.isin(rows, self.candidates, assume_unique=True)
+            mask = np.zeros(len(rows), dtype=bool)
+            mask[in_candidates] = [self.value in column[r] for r in rows[in_candidates]]
+        else:
+            mask = np.array([self.value in column[r] for r in rows], dtype=bool)
+        if self.needs_fulltext:
+            rest = ~mask
+            fulltext = df['fulltext'].to_numpy(dtype=object)
+            mask[rest] = [self.value in fulltext[r] for r in rows[rest]]
+        return mask
+
+class AnyKeywordPredicate(Predicate):
+    """The sidebar keyword filter: any of the keywords is a substring of the paper's keywords"""
+
+    def __init__(self, label, keywords, index):
+        super().__init__(label)
+        self.keywords = keywords
+        self.cost = VERIFY_COST
+        self.estimate = index.n_rows
+
+    def matches(self, index, df, rows):
+        column = index.columns['keyword']
+        return np.array([any(k in column[r] for k in self.keywords) for r in rows], dtype=bool)
+
+
+class QueryPlan:
+    """
+    An ordered list of predicates, cheapest and most selective first.
+
+    Positive predicates narrow a shrinking set of candidate rows; negated ones run
+    last and remove rows from what is left, so expensive checks see as few rows as possible.
+    """
+
+    def __init__(self, query, predicates):
+        self.query = query
+        self.positive = sorted((p for p in predicates if not p.negated), key=lambda p: (p.estimate * p.cost, p.cost))
+        self.negative = sorted((p for p in predicates if p.negated), key=lambda p: (p.cost, -p.estimate))
+        self.needs_fulltext = any(p.needs_fulltext for p in predicates)
+
+    @property
+    def steps(self):
+        return self.positive + self.negative
+
+    def execute(self, df, index, trace=None):
+        """
+        Runs the plan against the catalog.
+
+        Args:
+            df (pd.DataFrame): The catalog the index was built from.
+            index (QueryIndex): Its query index.
+            trace (list, optional): Receives (predicate, rows in, rows out, seconds) per step.
+
+        Returns:
+            np.ndarray: Matching row positions in catalog order.
+        """
+        rows = np.arange(index.n_rows, dtype=np.int32)
+        for predicate in self.steps:
+            if not len(rows):
+                break
+            start = time.perf_counter()
+            rows_in = len(rows)
+            mask = predicate.matches(index, df, rows)
+            rows = rows[~mask] if predicate.negated else rows[mask]
+            if trace is not None:
+                trace.append((predicate, rows_in, len(rows), time.perf_counter() - start))
+        return rows
+
+    def explain(self, trace=None):
+        """Return a readable description of the plan and, given a trace, of each step's effect"""
+        lines = [f"Plan for: {self.query}"]
+        ran = {id(step[0]): step for step in trace or []}
+        cost_names = {INDEX_COST: "index", VERIFY_COST: "index + verify", SCAN_COST: "full-text scan"}
+        for number, predicate in enumerate(self.steps, 1):
+            line = f"{number}. {predicate.describe()} [{cost_names[predicate.cost]}, est. {predicate.estimate} rows]"
+            if id(predicate) in ran:
+                _, rows_in, rows_out, seconds = ran[id(predicate)]
+                line += f" {rows_in} → {rows_out} rows in {seconds * 1000:.2f} ms"
+            elif trace:
+                line += " skipped, no rows left"
+            lines.append(line)
+        return "\n".join(lines)
+
+def _term_predicate(term, index):
+    label = f'{term.field}:"{term.value}"' if term.field != 'any' else f'"{term.value}"'
+    if term.field == 'category':
+        wanted = [code for code, name in enumerate(index.categories) if name == term.value]
+        return CodesPredicate(label, index.category_codes, wanted, term.negated)
+    if term.field == 'author':
+        wanted = [code for code, name in enumerate(index.authors) if term.value in name]
+        return CodesPredicate(label, index.author_codes, wanted, term.negated)
+    if term.field == 'year':
+        match = _RANGE_PATTERN.match(term.value)
+        if match:
+            first, last, single = match.groups()
+            first, last = (int(single), int(single)) if single else (int(first or 0), int(last or 9999))
+            return YearPredicate(f"year:{first}..{last}", first, last, index, term.negated)
+        # Not a year or range: nothing can match
+        return CodesPredicate(label, index.category_codes, [], term.negated)
+    if term.field in ('title', 'keyword'):
+        return TextPredicate(label, term.value, term.field, index, negated=term.negated)
+    # Unqualified terms and text: match titles, authors and keywords, or the paper's full text
+    return TextPredicate(label, term.value, 'search', index, fulltext=True, negated=term.negated)
+
+def compile_plan(query, categories, keywords, year_range, index):
+    """
+    Compiles a query and the sidebar filters into one plan.
+
+    Args:
+        query (str): The search box text.
+        categories (list[str]): Sidebar categories; a paper must be in one of them.
+        keywords (tuple[str]): Sidebar keywords, lowercased; a paper must match one of them.
+        year_range (tuple[int, int]): Sidebar publication years.
+        index (QueryIndex): Index of the catalog the plan will run on.
+
+    Returns:
+        QueryPlan: The plan, ordered by estimated cost.
+    """
+    predicates = [_term_predicate(term, index) for term in parse(query)]
+    if categories:
+        wanted = [code for code, name in enumerate(index.categories) if name in {c.lower() for c in categories}]
+        predicates.append(CodesPredicate(f"category in {sorted(categories)}", index.category_codes, wanted))
+    if keywords:
+        predicates.append(AnyKeywordPredicate(f"keywords any of {list(keywords)}", keywords, index))
+    predicates.append(YearPredicate(f"year:{year_range[0]}..{year_range[1]}", int(year_range[0]), int(year_range[1]), index))
+    return QueryPlan(query, predicates)
+
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+def get_plan(df, search_text, query, categories, keywords, year_range):
+    """
+    Returns the compiled plan of a query, compiling it once per query, filters and data version.
+
+    Args:
+        df (pd.DataFrame): The catalog.
+        search_text (pd.Series): Its search text, from search_service.get_search_text.
+        query, categories, keywords, year_range: As for compile_plan.
+
+    Returns:
+        tuple[QueryPlan, bool]: The plan, and whether it came from the cache.
+    """
+    key = (cs.catalog_version(df), query, tuple(sorted(categories or [])), tuple(keywords or ()), tuple(year_range))
+    with _plans_lock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+            return plan, True
+    plan = compile_plan(query, categories, keywords, year_range, get_query_index(df, search_text))
+    with _plans_lock:
+        _plans[key] = plan
+        while len(_plans) > MAX_PLANS:
+            _plans.popitem(last=False)
+    return plan, False
@@ -0,0 +1,133 @@
+import numpy as np
+import streamlit as st
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from services import catalog_service as cs
+from services import shared_cache as sc
+
+# Dimensions kept after SVD; plenty for a college thesis archive
+N_COMPONENTS = 128
+TOP_K = 5
+# Rows per similarity block, keeps the temporary score matrix at BATCH_SIZE x n_papers
+BATCH_SIZE = 512
+MIN_SCORE = 0.05
+
+
+class RelatedIndex:
+    """Precomputed nearest neighbours of every paper in the catalog"""
+
+    def __init__(self, ids, vectors, neighbors, scores):
+        self.ids = ids
+        self.vectors = vectors
+        self.neighbors = neighbors
+        self.scores = scores
+        self.positions = {paper_id: pos for pos, paper_id in enumerate(ids)}
+
+    def related(self, paper_id, k=TOP_K):
+        """
+        Returns the most similar papers to the given one.
+
+        Args:
+            paper_id: The paper's id in the research data.
+            k (int, optional): Maximum number of papers to return. Defaults to TOP_K.
+
+        Returns:
+            list[tuple]: (paper id, cosine similarity) pairs, most similar first.
+        """
+        pos = self.positions.get(paper_id)
+        if pos is None:
+            return []
+        return [
+            (self.ids[n], float(score))
+            for n, score in zip(self.neighbors[pos, :k], self.scores[pos, :k])
+            if n >= 0 and score >= MIN_SCORE
+        ]
+
+def build_vectors(texts, n_components=N_COMPONENTS):
+    """
+    Embeds documents with TF-IDF reduced by truncated SVD.
+
+    Args:
+        texts (list[str]): One document per paper.
+        n_components (int, optional): Target dimensions. Defaults to N_COMPONENTS.
+
+    Returns:
+        np.ndarray: C-contiguous float32 matrix of L2-normalized rows, one per document.
+    """
+    tfidf = TfidfVectorizer(stop_words="english", sublinear_tf=True, max_features=50_000)
+    try:
+        matrix = tfidf.fit_transform(texts)
+    except ValueError:
+        # Every document is empty or made of stop words
+        return np.zeros((len(texts), 1), dtype=np.float32)
+
+    n_components = min(n_components, matrix.shape[0] - 1, matrix.shape[1] - 1)
+    if n_components >= 2:
+        vectors = TruncatedSVD(n_components=n_components, random_state=0).fit_transform(matrix)
+    else:
+        vectors = matrix.toarray()
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+def top_k_neighbors(vectors, k=TOP_K, batch_size=BATCH_SIZE):
+    """
+    Finds the k most similar rows of every row with blocked matrix multiplies.
+
+    Args:
+        vectors (np.ndarray): L2-normalized float32 row vectors.
+        k (int, optional): Neighbours per row. Defaults to TOP_K.
+        batch_size (int, optional): Rows scored per block. Defaults to BATCH_SIZE.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: int32 neighbour positions (-1 when missing) and float32 scores, both (n, k).
+    """
+    n = vectors.shape[0]
+    neighbors = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    kk = min(k, n - 1)
+    if kk <= 0:
+        return neighbors, scores
+
+    for start in range(0, n, batch_size):
+        end = min(start + batch_size, n)
+        sims = vectors[start:end] @ vectors.T
+        # A paper is never related to itself
+        sims[np.arange(end - start), np.arange(start, end)] = -np.inf
+        top = np.argpartition(-sims, kk - 1, axis=1)[:, :kk]
+        top_scores = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        neighbors[start:end, :kk] = np.take_along_axis(top, order, axis=1)
+        scores[start:end, :kk] = np.take_along_axis(top_scores, order, axis=1)
+    return neighbors, scores
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _build_related_index(version, _research_df):
+    # Built by one replica and shared with the others
+    return sc.get_or_build(f"related:{version}", lambda: build_related_index(_research_df))
+
+def build_related_index(df):
+    """Vectorize every paper and precompute its nearest neighbours"""
+    # The catalog does not hold abstracts, so they are read on their own here
+    abstracts = df['id'].astype(str).map(cs.load_abstract_column()).fillna('')
+    texts = (
+        df['title'].astype(str) + ' ' +
+        abstracts + ' ' +
+        df['keywords'].astype(str)
+    ).tolist()
+    vectors = build_vectors(texts)
+    neighbors, scores = top_k_neighbors(vectors)
+    return RelatedIndex(df['id'].tolist(), vectors, neighbors, scores)
+
+def get_related_index(research_df):
+    """
+    Return the related-papers index for the current data version, building it once per version.
+
+    Admin edits keep the index of the last sheet load; papers deleted since then are
+    skipped when callers look them up in the catalog.
+    """
+    return _build_related_index(cs.base_version(research_df), research_df)
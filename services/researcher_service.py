@@ -0,0 +1,137 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from services import catalog_service as cs
+from services import suggest_service as sg
+
+# Columns of researchers_data that may hold the name papers are filed under, in order of preference
+NAME_COLUMNS = ['author_name', 'researcher_name', 'name']
+# Columns of researchers_data that may hold a profile photo link
+IMAGE_COLUMNS = ['author_img_url', 'img_url', 'image_url', 'photo_url']
+# Keywords and categories listed per researcher
+TOP_TERMS = 5
+
+
+def researcher_key(name):
+    """Return the join key of a researcher name; spellings differing in case or punctuation share it"""
+    return sg.normalize(name)
+
+def _first_column(df, candidates):
+    return next((col for col in candidates if col in df.columns), None)
+
+def _year(value):
+    return None if np.isnan(value) else int(value)
+
+
+class ResearcherDirectory:
+    """
+    Researchers joined with their papers through a hash index on researcher_key.
+
+    Profiles come from the researchers_data worksheet; researchers who only appear
+    on papers are listed too. Aggregates are computed once when the directory is
+    built, so looking up an author is a dictionary hit instead of a scan of the
+    paper table.
+    """
+
+    def __init__(self, research_df, researchers_df):
+        # Hash the distinct spellings once, then map every paper through its category code
+        names = research_df['author_name'].astype('category')
+        category_keys = np.array([researcher_key(n) for n in names.cat.categories] + [''], dtype=object)
+        row_keys = category_keys[names.cat.codes.to_numpy()]
+        codes, keys = pd.factorize(row_keys)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.cumsum(np.bincount(codes, minlength=len(keys)))
+        positions = {
+            key: order[start:end]
+            for key, start, end in zip(keys, np.concatenate([[0], bounds[:-1]]), bounds)
+            if key
+        }
+
+        profiles = {}
+        name_col = _first_column(researchers_df, NAME_COLUMNS)
+        image_col = _first_column(researchers_df, IMAGE_COLUMNS)
+        if name_col:
+            for profile in researchers_df.to_dict('records'):
+                key = researcher_key(profile[name_col])
+                if key:
+                    profiles.setdefault(key, profile)
+
+        years = research_df['created_year'].to_numpy(dtype=float, na_value=np.nan)
+        author_names = research_df['author_name'].astype(str).to_numpy()
+        img_urls = research_df['author_img_url'].astype(str).to_numpy()
+        categories = research_df['category'].astype(str).to_numpy()
+        keywords = research_df['keywords'].astype(str).to_numpy()
+
+        self._entries = {}
+        for key in positions.keys() | profiles.keys():
+            rows = positions.get(key, np.empty(0, dtype=np.intp))
+            profile = profiles.get(key, {})
+            paper_years = years[rows]
+            known_years = paper_years[~np.isnan(paper_years)]
+            # Newest papers first, undated ones last
+            rows = rows[np.argsort(-np.nan_to_num(paper_years, nan=-1), kind='stable')]
+            name = str(profile.get(name_col, '')).strip() or Counter(author_names[rows]).most_common(1)[0][0]
+            img_url = str(profile.get(image_col, '')).strip() if image_col else ''
+            if not img_url:
+                img_url = next((url for url in img_urls[rows] if url), '')
+            keyword_counts = Counter(
+                k.strip() for text in keywords[rows] for k in text.split(',') if k.strip()
+            )
+            self._entries[key] = {
+                'key': key,
+                'name': name,
+                'img_url': img_url,
+                'positions': rows,
+                'paper_count': len(rows),
+                'first_year': _year(known_years.min()) if len(known_years) else None,
+                'last_year': _year(known_years.max()) if len(known_years) else None,
+                'categories': [c for c, _ in Counter(c for c in categories[rows] if c).most_common(TOP_TERMS)],
+                'keywords': [k for k, _ in keyword_counts.most_common(TOP_TERMS)],
+                'profile': {
+                    col: value for col, value in profile.items()
+                    if col not in (name_col, image_col) and str(value).strip()
+                },
+            }
+        self._ranking = sorted(self._entries.values(), key=lambda e: (-e['paper_count'], e['name'].casefold()))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, name):
+        """Return a researcher's entry by any spelling of the name, or None"""
+        return self._entries.get(researcher_key(name))
+
+    def search(self, text=''):
+        """Return the researchers whose name contains the text, most papers first"""
+        needle = researcher_key(text)
+        if not needle:
+            return list(self._ranking)
+        return [entry for entry in self._ranking if needle in entry['key']]
+
+    def titles(self, research_df, name):
+        """Return the titles of a researcher's papers, newest first"""
+        entry = self.get(name)
+        if entry is None:
+            return []
+        return research_df['title'].iloc[entry['positions']].tolist()
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _get_directory(version, _research_df, _researchers_df):
+    return ResearcherDirectory(_research_df, _researchers_df)
+
+def get_directory(research_df):
+    """
+    Returns the researcher directory of a catalog frame, built once per data version.
+
+    Args:
+        research_df (pd.DataFrame): A frame from catalog_service.
+
+    Returns:
+        ResearcherDirectory: Its row positions refer to research_df.
+    """
+    researchers_df = cs.get_researchers(research_df)
+    version = (cs.catalog_version(research_df), researchers_df.attrs.get('version'))
+    return _get_directory(version, research_df, researchers_df)
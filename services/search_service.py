@@ -0,0 +1,267 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import streamlit as st
+from fuzzywuzzy import fuzz
+
+from services import catalog_service as cs
+from services import metrics_service as ms
+from services import query_service as qs
+
+
+# Optimized filtering function
+def apply_filters(df, categories, keywords, year_range):
+    """Filter research data using pandas for better performance"""
+    # Partitions wholly inside or outside the year range are decided without looking at rows
+    inside, boundary = cs.partitions_in_range(df, year_range)
+    positions = [partition['positions'] for partition in inside]
+    year_min, year_max = year_range
+    for partition in boundary:
+        years = df['created_year'].iloc[partition['positions']]
+        # Years are nullable; papers without one never match a range
+        in_range = ((years >= year_min) & (years <= year_max)).fillna(False).to_numpy(dtype=bool)
+        positions.append(partition['positions'][in_range])
+    filtered_df = df.iloc[np.sort(np.concatenate(positions)) if positions else []]
+    if categories:
+        filtered_df = filtered_df[filtered_df['category'].isin(categories)]
+    if keywords:
+        keyword_list = [k.strip().lower() for k in keywords.split(',')]
+        mask = filtered_df['keywords'].astype(str).str.lower().apply(
+            lambda x: any(k in x for k in keyword_list)
+        )
+        filtered_df = filtered_df[mask]
+    return filtered_df
+
+# Search text lives here rather than as a column of the cached catalog
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _get_search_text(version, _research_df):
+    return cs.build_search_text(_research_df)
+
+def get_search_text(research_df):
+    """Return the lowercased search text of every catalog row, built once per data version"""
+    return _get_search_text(cs.catalog_version(research_df), research_df)
+
+# Exact matches needed after filtering before fuzzy matching is skipped
+MIN_EXACT_MATCHES = 10
+FUZZY_THRESHOLD = 70
+
+def _exact_mask(query, search_text, fulltext):
+    return (
+        search_text.str.contains(query, na=False, regex=False) |
+        fulltext.str.contains(query, na=False, regex=False)
+    )
+
+def _fuzzy_scores(query, search_text):
+    return search_text.apply(lambda x: fuzz.partial_ratio(query, x))
+
+# Optimized search function
+def search_data(df, query, search_text, threshold=FUZZY_THRESHOLD):
+    """Match the query against the search text and full text, falling back to fuzzy matching"""
+    if not query:
+        return df
+    query = query.lower().strip()
+    search_text = search_text.reindex(df.index)
+    exact_matches = df[_exact_mask(query, search_text, df['fulltext'])]
+    if len(exact_matches) >= MIN_EXACT_MATCHES:
+        return exact_matches
+    match_score = _fuzzy_scores(query, search_text)
+    fuzzy_scores = match_score[match_score >= threshold].sort_values(ascending=False)
+    return df.loc[fuzzy_scores.index]
+
+# Sorting function
+def sort_data(df, sort_option):
+    """Sort the DataFrame based on selected option"""
+    if sort_option == "Alphabetical (A-Z)":
+        return df.sort_values('title')
+    elif sort_option == "Alphabetical (Z-A)":
+        return df.sort_values('title', ascending=False)
+    elif sort_option == "Year (Newest First)":
+        return df.sort_values('created_year', ascending=False, na_position='last')
+    elif sort_option == "Year (Oldest First)":
+        return df.sort_values('created_year', na_position='last')
+    elif sort_option == "Most viewed":
+        views = df['id'].astype(str).map(ms.get_totals(ms.VIEW)).fillna(0)
+        return df.loc[views.sort_values(ascending=False, kind='stable').index]
+    return df  # Default case returns unsorted (Relevance)
+
+
+class ResultCache:
+    """
+    Process-wide LRU of query results shared by every session.
+
+    Values are read-only arrays of row positions into the catalog frame, so a
+    hit costs one dictionary lookup and an iloc. The cache is bounded by the
+    total bytes of the stored arrays.
+    """
+
+    # Rough per-entry cost of the key tuple and bookkeeping
+    ENTRY_OVERHEAD = 256
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            positions = self._entries.get(key)
+            if positions is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return positions
+
+    def put(self, key, positions):
+        size = positions.nbytes + self.ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key).nbytes + self.ENTRY_OVERHEAD
+            self._entries[key] = positions
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes + self.ENTRY_OVERHEAD
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current size"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+result_cache = ResultCache(int(os.environ.get("ELAMP_RESULT_CACHE_MB", "64")) * 1024 * 1024)
+
+def make_query_key(df, query, categories, keywords, year_range, sort_option):
+    """
+    Builds the cache key of a query, normalizing inputs that produce the same results.
+
+    Args:
+        df (pd.DataFrame): The catalog being searched.
+        query (str): The search box text.
+        categories (list[str]): Selected categories.
+        keywords (str): Comma-separated keyword filter.
+        year_range (tuple[int, int]): Inclusive publication year range.
+        sort_option (str): The selected sort option.
+
+    Returns:
+        tuple: A hashable key that includes the catalog and full-text versions.
+    """
+    normalized_query = " ".join(str(query or "").lower().split())
+    normalized_keywords = tuple(sorted({k.strip().lower() for k in str(keywords or "").split(',') if k.strip()}))
+    return (
+        normalized_query,
+        tuple(sorted(categories or [])),
+        normalized_keywords,
+        (int(year_range[0]), int(year_range[1])),
+        sort_option,
+        cs.catalog_version(df),
+        df.attrs.get('fulltext_version'),
+        # View counts change the order, so that ordering is refreshed after every flush
+        ms.generation() if sort_option == "Most viewed" else None,
+    )
+
+def run_query(df, query, categories, keywords, year_range, sort_option):
+    """
+    Filters, searches and sorts the catalog, reusing results computed by any session.
+
+    Args:
+        df (pd.DataFrame): The catalog from catalog_service.get_research_data.
+        query (str): The search box text.
+        categories (list[str]): Selected categories.
+        keywords (str): Comma-separated keyword filter.
+        year_range (tuple[int, int]): Inclusive publication year range.
+        sort_option (str): The selected sort option.
+
+    Returns:
+        np.ndarray: Read-only int32 row positions into df, in display order.
+    """
+    key = make_query_key(df, query, categories, keywords, year_range, sort_option)
+    positions = result_cache.get(key)
+    if positions is not None:
+        return positions
+
+    if key[0]:
+        # Only the partitions this range touches need their full text for the search
+        cs.add_fulltext(df, year_range)
+    if qs.is_structured(key[0]):
+        # Qualifiers, phrases and negation: search and sidebar filters run as one index-backed plan
+        search_text = get_search_text(df)
+        plan, _ = qs.get_plan(df, search_text, key[0], categories, key[2], year_range)
+        result = sort_data(df.iloc[plan.execute(df, qs.get_query_index(df, search_text))], sort_option)
+    else:
+        filtered_df = apply_filters(df, categories, ", ".join(key[2]), year_range)
+        result = sort_data(search_data(filtered_df, key[0], get_search_text(df)), sort_option)
+    positions = df.index.get_indexer(result.index).astype(np.int32)
+    positions.setflags(write=False)
+    result_cache.put(key, positions)
+    return positions
+
+def text_matches(df, query, year_range, fuzzy=False):
+    """
+    Returns the rows in a year range that a plain text query matches, before category and keyword filters.
+
+    search_data keeps the exact matches when at least MIN_EXACT_MATCHES remain after
+    filtering, and the fuzzy ones otherwise. Callers that count several filter
+    combinations intersect both sets with each filter instead of searching again.
+    Results are kept in the shared result cache.
+
+    Args:
+        df (pd.DataFrame): The catalog from catalog_service.get_research_data.
+        query (str): The search box text; not a structured query.
+        year_range (tuple[int, int]): Inclusive publication year range.
+        fuzzy (bool, optional): Return fuzzy instead of exact matches. Defaults to False.
+
+    Returns:
+        np.ndarray: Read-only int32 row positions into df, in catalog order.
+    """
+    key = ("fuzzy" if fuzzy else "exact",) + make_query_key(df, query, None, "", year_range, "Relevance")
+    positions = result_cache.get(key)
+    if positions is not None:
+        return positions
+    cs.add_fulltext(df, year_range)
+    in_range = df.index.get_indexer(apply_filters(df, None, "", year_range).index)
+    search_text = get_search_text(df).iloc[in_range]
+    if fuzzy:
+        mask = (_fuzzy_scores(key[1], search_text) >= FUZZY_THRESHOLD).to_numpy(dtype=bool)
+    else:
+        mask = _exact_mask(key[1], search_text, df['fulltext'].iloc[in_range]).to_numpy(dtype=bool)
+    positions = in_range[mask].astype(np.int32)
+    positions.setflags(write=False)
+    result_cache.put(key, positions)
+    return positions
+
+def explain_query(df, query, categories, keywords, year_range):
+    """
+    Runs a structured query's plan once more, timing every step, for admins.
+
+    Returns:
+        str | None: The plan with estimated and actual rows per step, or None for plain queries.
+    """
+    key = make_query_key(df, query, categories, keywords, year_range, "Relevance")
+    if not qs.is_structured(key[0]):
+        return None
+    search_text = get_search_text(df)
+    plan, cached = qs.get_plan(df, search_text, key[0], categories, key[2], year_range)
+    trace = []
+    plan.execute(df, qs.get_query_index(df, search_text), trace)
+    return plan.explain(trace) + ("\n(compiled plan reused)" if cached else "\n(plan compiled now)")
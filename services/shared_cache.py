@@ -0,0 +1,348 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+
+from services import local_store
+
+logger = logging.getLogger(__name__)
+
+# "disk:///shared/path", "redis://host:6379/0", "memory://" or unset for no shared tier
+SHARED_CACHE_URL = os.environ.get("ELAMP_SHARED_CACHE", "")
+# Disk tier size limit
+MAX_BYTES = int(os.environ.get("ELAMP_SHARED_CACHE_MB", "1024")) * 1024 * 1024
+# Entries expire after a week in Redis; the disk tier is trimmed by size instead
+TTL_SECONDS = 7 * 24 * 60 * 60
+# Minimum time between version checks against the shared tier
+VERSION_POLL_SECONDS = 1.0
+# A build lock left by a replica that stopped mid-build expires after this long
+BUILD_LOCK_SECONDS = int(os.environ.get("ELAMP_BUILD_LOCK_SECONDS", "300"))
+# Time between checks for the value while another replica builds it
+BUILD_WAIT_POLL_SECONDS = 0.5
+
+
+class DiskBackend:
+    """
+    Shared tier on a directory that every replica mounts.
+
+    Values are written atomically, so readers never see a partial file. Each
+    replica unpickles its own copy; only the file's pages in the OS cache are shared.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.join(path, "values"), exist_ok=True)
+        os.makedirs(os.path.join(path, "versions"), exist_ok=True)
+        os.makedirs(os.path.join(path, "locks"), exist_ok=True)
+
+    def _file(self, folder, key):
+        return os.path.join(self.path, folder, hashlib.sha1(key.encode()).hexdigest())
+
+    def _write(self, path, value):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        path = self._file("values", key)
+        try:
+            with open(path, "rb") as f:
+                os.utime(path)
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key, value):
+        self._write(self._file("values", key), value)
+        local_store.trim_dir(os.path.join(self.path, "values"), MAX_BYTES)
+
+    def get_version(self, name):
+        try:
+            with open(self._file("versions", name), "r") as f:
+                return f.read()
+        except OSError:
+            return "0"
+
+    def bump_version(self, name):
+        version = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        self._write(self._file("versions", name), version.encode())
+        return version
+
+    def acquire(self, key, token, ttl):
+        path = self._file("locks", key)
+        for _ in range(2):
+            try:
+                # O_EXCL makes creation atomic, also on shared mounts
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(path) < ttl:
+                        return False
+                    # Left by a replica that stopped before releasing it
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(token)
+            return True
+        return False
+
+    def release(self, key, token):
+        path = self._file("locks", key)
+        try:
+            with open(path, "r") as f:
+                if f.read() != token:
+                    return
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class RedisBackend:
+    """Shared tier on a Redis-compatible server"""
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(f"elamp:value:{key}")
+
+    def set(self, key, value):
+        self.client.set(f"elamp:value:{key}", value, ex=TTL_SECONDS)
+
+    def get_version(self, name):
+        version = self.client.get(f"elamp:version:{name}")
+        return version.decode() if version else "0"
+
+    def bump_version(self, name):
+        return str(self.client.incr(f"elamp:version:{name}"))
+
+    def acquire(self, key, token, ttl):
+        return bool(self.client.set(f"elamp:lock:{key}", token, nx=True, ex=ttl))
+
+    def release(self, key, token):
+        # Delete only if this replica still holds it, in one step on the server
+        self.client.eval(
+            "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0",
+            1, f"elamp:lock:{key}", token
+        )
+
+
+class MemoryBackend:
+    """In-process stand-in with the same interface, for tests and single-process setups"""
+
+    def __init__(self):
+        self.values = {}
+        self.versions = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            return self.values.get(key)
+
+    def set(self, key, value):
+        with self.lock:
+            self.values[key] = value
+
+    def get_version(self, name):
+        with self.lock:
+            return self.versions.get(name, "0")
+
+    def bump_version(self, name):
+        with self.lock:
+            self.versions[name] = str(int(self.versions.get(name, "0")) + 1)
+            return self.versions[name]
+
+    def acquire(self, key, token, ttl):
+        with self.lock:
+            held = self.locks.get(key)
+            if held and held[1] > time.time():
+                return False
+            self.locks[key] = (token, time.time() + ttl)
+            return True
+
+    def release(self, key, token):
+        with self.lock:
+            if self.locks.get(key, (None,))[0] == token:
+                del self.locks[key]
+
+
+def create_backend(url):
+    """
+    Creates a backend from a URL.
+
+    Args:
+        url (str): "disk:///path", "redis://...", "rediss://..." or "memory://".
+
+    Returns:
+        DiskBackend | RedisBackend | MemoryBackend | None: None when url is empty.
+    """
+    if not url:
+        return None
+    if url.startswith("disk://"):
+        return DiskBackend(url[len("disk://"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    raise ValueError(f"Unsupported shared cache URL: {url}")
+
+backend = create_backend(SHARED_CACHE_URL)
+
+_seen_versions = {}
+_checked_at = {}
+_listeners = {}
+_version_lock = threading.Lock()
+
+
+def set_backend(new_backend):
+    """Replace the shared tier, e.g. with a MemoryBackend in tests"""
+    global backend
+    backend = new_backend
+    with _version_lock:
+        _seen_versions.clear()
+        _checked_at.clear()
+
+def on_version_change(name, callback):
+    """Run callback in this process whenever another replica bumps the named version"""
+    _listeners.setdefault(name, []).append(callback)
+
+def current_version(name):
+    """
+    Returns the shared version of a named dataset, polling the shared tier at most once a second.
+
+    When the version changed since the last check, the callbacks registered
+    with on_version_change run first so local caches are dropped.
+
+    Args:
+        name (str): Dataset name, e.g. "catalog".
+
+    Returns:
+        str: The version, or "local" when no shared tier is configured.
+    """
+    if backend is None:
+        return "local"
+    now = time.monotonic()
+    with _version_lock:
+        if name in _seen_versions and now - _checked_at.get(name, 0) < VERSION_POLL_SECONDS:
+            return _seen_versions[name]
+    try:
+        version = backend.get_version(name)
+    except Exception as e:
+        logger.warning("Shared cache unavailable, using local data: %s", e)
+        return _seen_versions.get(name, "local")
+    with _version_lock:
+        previous = _seen_versions.get(name)
+        _seen_versions[name] = version
+        _checked_at[name] = now
+    if previous is not None and previous != version:
+        for callback in _listeners.get(name, []):
+            callback()
+    return version
+
+def bump_version(name):
+    """Mark a named dataset as changed on every replica"""
+    if backend is None:
+        return "local"
+    version = backend.bump_version(name)
+    with _version_lock:
+        _seen_versions[name] = version
+        _checked_at[name] = time.monotonic()
+    return version
+
+def acquire_lock(key, ttl=BUILD_LOCK_SECONDS):
+    """
+    Takes a lock shared by every replica, e.g. so only one of them rebuilds a value.
+
+    Args:
+        key (str): Name of the lock.
+        ttl (int, optional): Seconds after which the lock expires if it is never released.
+
+    Returns:
+        str | None: A token to pass to release_lock, or None if another replica holds the lock.
+        Without a shared tier, or when it fails, the lock is always granted.
+    """
+    token = uuid.uuid4().hex
+    if backend is None:
+        return token
+    try:
+        return token if backend.acquire(key, token, ttl) else None
+    except Exception as e:
+        logger.warning("Could not lock %s in the shared cache: %s", key, e)
+        return token
+
+def release_lock(key, token):
+    """Release a lock taken with acquire_lock, unless it expired and another replica took it"""
+    if backend is None:
+        return
+    try:
+        backend.release(key, token)
+    except Exception as e:
+        logger.warning("Could not unlock %s in the shared cache: %s", key, e)
+
+def put(key, value):
+    """Store a value in the shared tier, e.g. a snapshot other replicas will load next"""
+    if backend is None:
+        return
+    try:
+        backend.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception as e:
+        logger.warning("Could not write %s to the shared cache: %s", key, e)
+
+def _get(key):
+    try:
+        cached = backend.get(key)
+        if cached is not None:
+            return pickle.loads(cached)
+    except Exception as e:
+        logger.warning("Could not read %s from the shared cache: %s", key, e)
+    return None
+
+def get_or_build(key, build):
+    """
+    Returns a value from the shared tier, building and storing it on a miss.
+
+    Values are pickled. Only one replica builds a missing value at a time; the others
+    wait for it, for up to BUILD_LOCK_SECONDS. Without a shared tier, or when it
+    fails, this just calls build.
+
+    Args:
+        key (str): Cache key; include the data version in it.
+        build (callable): Produces the value.
+
+    Returns:
+        The cached or freshly built value.
+    """
+    if backend is None:
+        return build()
+    value = _get(key)
+    if value is not None:
+        return value
+    lock_key = f"build:{key}"
+    deadline = time.monotonic() + BUILD_LOCK_SECONDS
+    token = acquire_lock(lock_key)
+    while token is None and time.monotonic() < deadline:
+        # Another replica is building it
+        time.sleep(BUILD_WAIT_POLL_SECONDS)
+        value = _get(key)
+        if value is not None:
+            return value
+        token = acquire_lock(lock_key)
+    try:
+        # Built by the replica that held the lock just before this one
+        value = _get(key)
+        if value is None:
+            value = build()
+            put(key, value)
+        return value
+    finally:
+        if token is not None:
+            release_lock(lock_key, token)
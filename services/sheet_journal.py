@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from services import local_store
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_NAME = "sheet_journal.jsonl"
+# Seconds between flushes; appends wake the flusher early
+FLUSH_INTERVAL = 2
+# Largest number of rows sent to Sheets in one request
+MAX_BATCH = 50
+# Longest wait between retries while Sheets keeps failing
+MAX_BACKOFF = 300
+# Acknowledged entries kept when the journal is compacted, for idempotency
+KEEP_ACKED_SECONDS = 30 * 24 * 60 * 60
+
+INTENT, ACK = "intent", "ack"
+
+_lock = threading.Lock()
+_wakeup = threading.Condition()
+# Idempotency key to entry: {"key", "sheet", "fields", "ts", "id" once acknowledged}
+_entries = None
+_ack_handlers = []
+_status = {"last_flush": None, "last_error": None}
+_started = False
+_start_lock = threading.Lock()
+
+
+def _path():
+    return local_store.get_path(JOURNAL_NAME)
+
+def _append_lines(records):
+    with open(_path(), "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        # The write is acknowledged to the admin only once it is on disk
+        os.fsync(f.fileno())
+
+def _load():
+    global _entries
+    if _entries is not None:
+        return _entries
+    _entries = {}
+    try:
+        with open(_path(), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write
+                    continue
+                if record["type"] == INTENT:
+                    _entries.setdefault(record["key"], {k: record[k] for k in ("key", "sheet", "fields", "ts")})
+                elif record["type"] == ACK and record["key"] in _entries:
+                    _entries[record["key"]]["id"] = record["id"]
+    except FileNotFoundError:
+        pass
+    _compact()
+    return _entries
+
+def _compact():
+    # Rewrite the journal without old acknowledged entries
+    cutoff = time.time() - KEEP_ACKED_SECONDS
+    for key in [k for k, e in _entries.items() if "id" in e and e["ts"] < cutoff]:
+        del _entries[key]
+    tmp_path = f"{_path()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry in _entries.values():
+            f.write(json.dumps({"type": INTENT, **{k: entry[k] for k in ("key", "sheet", "fields", "ts")}}, ensure_ascii=False) + "\n")
+            if "id" in entry:
+                f.write(json.dumps({"type": ACK, "key": entry["key"], "id": entry["id"], "ts": entry["ts"]}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, _path())
+
+def on_ack(handler):
+    """Register handler(entries) to run after rows reach the sheet; each entry has its new 'id'"""
+    _ack_handlers.append(handler)
+
+def append(sheet, fields, key):
+    """
+    Records a row to append to a sheet and returns once it is safely on local disk.
+
+    The row reaches Sheets on the next flush. Appending the same key again
+    returns the existing entry, so retries never add a second row.
+
+    Args:
+        sheet (str): Worksheet name.
+        fields (dict): Column values; must include 'title' and 'created_at'.
+        key (str): Idempotency key of the row.
+
+    Returns:
+        dict: The journal entry, with 'id' once the row is in the sheet.
+    """
+    start()
+    with _lock:
+        entries = _load()
+        if key not in entries:
+            entry = {"key": key, "sheet": sheet, "fields": fields, "ts": time.time()}
+            _append_lines([{"type": INTENT, **entry}])
+            entries[key] = entry
+        entry = dict(entries[key])
+    with _wakeup:
+        _wakeup.notify()
+    return entry
+
+def pending():
+    """Return the entries not yet written to Sheets, oldest first"""
+    with _lock:
+        return sorted((dict(e) for e in _load().values() if "id" not in e), key=lambda e: e["ts"])
+
+def status():
+    """Return the pending count, last successful flush time and last error"""
+    with _lock:
+        return {"pending": sum("id" not in e for e in _load().values()), **_status}
+
+def flush():
+    """
+    Writes pending rows to Sheets, one append per sheet for up to MAX_BATCH rows.
+
+    Returns:
+        int: Number of rows acknowledged.
+    """
+    from services import sheets_service as ss
+
+    batch = pending()[:MAX_BATCH]
+    acked = 0
+    for sheet in {e["sheet"] for e in batch}:
+        entries = [e for e in batch if e["sheet"] == sheet]
+        ids = ss.append_papers([e["fields"] for e in entries], sheet_name=sheet)
+        now = time.time()
+        with _lock:
+            _append_lines([{"type": ACK, "key": e["key"], "id": paper_id, "ts": now} for e, paper_id in zip(entries, ids)])
+            for entry, paper_id in zip(entries, ids):
+                _entries[entry["key"]]["id"] = paper_id
+                entry["id"] = paper_id
+        acked += len(entries)
+        for handler in _ack_handlers:
+            try:
+                handler(entries)
+            except Exception:
+                logger.exception("Journal acknowledgement handler failed")
+    if batch:
+        _status["last_flush"] = time.time()
+        _status["last_error"] = None
+    return acked
+
+def _flush_loop():
+    backoff = FLUSH_INTERVAL
+    while True:
+        with _wakeup:
+            _wakeup.wait(timeout=backoff)
+        try:
+            # Keep draining while full batches remain
+            while flush() == MAX_BATCH:
+                pass
+            backoff = FLUSH_INTERVAL
+        except Exception as e:
+            # Quota errors and outages: keep the rows and retry later
+            logger.warning("Could not write journal to Sheets, retrying in %d s: %s", backoff, e)
+            _status["last_error"] = str(e)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+def start():
+    """Start the background flusher once per process; rows left by a previous process are sent too"""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_flush_loop, name="sheet-journal-flusher", daemon=True).start()
@@ -25,6 +25,13 @@ sheet_names = [
     "researchers_data",
 ]
 
+# Header rows by sheet name, so single-row reads and writes need no extra request
+_headers = {}
+
+
+class RowConflictError(Exception):
+    """Raised when a row changed in the sheet since the caller read it"""
+
 def get_data_ls_dict(sheet_name: str):
     """
     Retrieves data from a specified Google Sheets worksheet and returns it as a list of dictionaries.
@@ -60,17 +67,104 @@ def get_data_df(sheet_name: str, columns_to_access: list[str] = None):
     """
     try:
         if sheet_name.lower() in sheet_names:
-            worksheet = sh.worksheet(sheet_name)
-            data = worksheet.get_all_records()
-            df = pd.DataFrame(data)
             if columns_to_access is None:
-                return df
-            missing_columns = [col for col in columns_to_access if col not in df.columns]
-            if missing_columns:
-                return f"Columns {missing_columns} not found in the sheet {sheet_name}"
-            return df[columns_to_access]
+                worksheet = sh.worksheet(sheet_name)
+                data = worksheet.get_all_records()
+                return pd.DataFrame(data)
+            # Only the requested columns are read from the sheet
+            return get_columns(sheet_name, columns_to_access)[columns_to_access]
+    except KeyError as e:
+        return f"Columns {e.args[0]} not found in the sheet {sheet_name}"
     except Exception as e:
         return f"An error occurred: {str(e)}"
+
+def get_modified_time():
+    """Return when the spreadsheet last changed, from its Drive metadata, or None if that cannot be read"""
+    try:
+        return sh.get_lastUpdateTime()
+    except Exception:
+        return None
+
+def _column_letter(col: int):
+    return gspread.utils.rowcol_to_a1(1, col)[:-1]
+
+def get_header(sheet_name: str, refresh: bool = False):
+    """Return the header row of a worksheet, read once per process"""
+    if refresh or sheet_name not in _headers:
+        _headers[sheet_name] = sh.worksheet(sheet_name).row_values(1)
+    return _headers[sheet_name]
+
+def get_columns(sheet_name: str, columns: list[str]):
+    """
+    Reads only the given columns of a worksheet with one batched request.
+
+    Values are converted to numbers the same way get_all_records does.
+
+    Args:
+        sheet_name (str): The name of the worksheet.
+        columns (list[str]): Headers of the columns to read.
+
+    Returns:
+        pd.DataFrame: The columns, plus '_row' holding each record's sheet row number.
+
+    Raises:
+        KeyError: If a column is not in the header row.
+    """
+    worksheet = sh.worksheet(sheet_name)
+    header = get_header(sheet_name, refresh=True)
+    missing_columns = [col for col in columns if col not in header]
+    if missing_columns:
+        raise KeyError(missing_columns)
+    letters = [_column_letter(header.index(col) + 1) for col in columns]
+    value_ranges = worksheet.batch_get(
+        [f"{letter}2:{letter}" for letter in letters],
+        major_dimension=gspread.utils.Dimension.cols
+    )
+    # Trailing blank cells are not returned, so columns can differ in length
+    values = [value_range[0] if value_range else [] for value_range in value_ranges]
+    n_rows = max((len(v) for v in values), default=0)
+    df = pd.DataFrame({
+        col: gspread.utils.numericise_all(v + [""] * (n_rows - len(v)))
+        for col, v in zip(columns, values)
+    })
+    df["_row"] = range(2, n_rows + 2)
+    return df
+
+def get_cells(sheet_name: str, columns: list[str], rows: list[int]):
+    """
+    Reads some columns of specific rows with one batched request.
+
+    Args:
+        sheet_name (str): The name of the worksheet.
+        columns (list[str]): Headers of the columns to read.
+        rows (list[int]): Sheet row numbers.
+
+    Returns:
+        dict: Row number to a dict of column header to value.
+    """
+    worksheet = sh.worksheet(sheet_name)
+    header = get_header(sheet_name)
+    letters = [_column_letter(header.index(col) + 1) for col in columns]
+
+    # Consecutive rows are read as one range
+    spans = []
+    for row in sorted(set(rows)):
+        if spans and spans[-1][1] == row - 1:
+            spans[-1][1] = row
+        else:
+            spans.append([row, row])
+    ranges = [f"{letter}{start}:{letter}{end}" for start, end in spans for letter in letters]
+    value_ranges = iter(worksheet.batch_get(ranges, major_dimension=gspread.utils.Dimension.cols))
+
+    cells = {}
+    for start, end in spans:
+        for col in columns:
+            value_range = next(value_ranges)
+            values = value_range[0] if value_range else []
+            for offset in range(end - start + 1):
+                value = values[offset] if offset < len(values) else ""
+                cells.setdefault(start + offset, {})[col] = gspread.utils.numericise(value)
+    return cells
     
 def post_add_new_paper(title, abstract, author_name, author_img_url, category, created_year, keywords, file_url, sheet_name="research_data"):
     """
@@ -88,7 +182,7 @@ def post_add_new_paper(title, abstract, author_name, author_img_url, category, c
         sheet_name (str, optional): The name of the worksheet to add the entry to. Defaults to "research_data".
 
     Returns:
-        None
+        int: The id assigned to the new paper.
     """
     worksheet = sh.worksheet(sheet_name)
 
@@ -111,4 +205,113 @@ def post_add_new_paper(title, abstract, author_name, author_img_url, category, c
             id = 1
     created_at = time.strftime("%Y-%m-%d %H:%M:%S")
     body = [id, title, abstract, author_name, author_img_url, category, created_year, keywords, file_url, created_at]  # the values should be a list
-    worksheet.append_row(body, table_range=f"A{id}:J{id}")
\ No newline at end of file
+    worksheet.append_row(body, table_range=f"A{id}:J{id}")
+    return id
+
+# Column order of the research sheet
+PAPER_COLUMNS = ["id", "title", "abstract", "author_name", "author_img_url", "category", "created_year", "keywords", "file_url", "created_at"]
+
+def append_papers(papers: list[dict], sheet_name: str = "research_data"):
+    """
+    Appends several papers with one write, skipping any that are already in the sheet.
+
+    A paper counts as present when a row has the same title and created_at, so
+    repeating a batch after a partial failure never duplicates rows. Only the
+    id, title and created_at columns are read.
+
+    Args:
+        papers (list[dict]): Papers with every PAPER_COLUMNS field except 'id'.
+        sheet_name (str, optional): The name of the worksheet. Defaults to "research_data".
+
+    Returns:
+        list[int]: The id of each paper, in input order.
+    """
+    existing = get_columns(sheet_name, ["id", "title", "created_at"])
+    present = {
+        (str(title), str(created_at)): paper_id
+        for paper_id, title, created_at in zip(existing["id"], existing["title"], existing["created_at"])
+    }
+    numeric_ids = pd.to_numeric(existing["id"], errors="coerce").dropna()
+    next_id = int(numeric_ids.max()) + 1 if not numeric_ids.empty else 1
+
+    ids = []
+    rows = []
+    for paper in papers:
+        key = (str(paper["title"]), str(paper["created_at"]))
+        if key not in present:
+            present[key] = next_id
+            rows.append([next_id] + [paper[col] for col in PAPER_COLUMNS[1:]])
+            next_id += 1
+        ids.append(int(present[key]))
+    if rows:
+        sh.worksheet(sheet_name).append_rows(rows, table_range="A1")
+    return ids
+
+def replace_column_values(column_name: str, replacements: dict, sheet_name: str = "research_data"):
+    """
+    Replaces values in one column of a worksheet with a single batched update.
+
+    Only the header row and the target column are read, and only the changed cells are written.
+
+    Args:
+        column_name (str): Header of the column to update.
+        replacements (dict): Mapping of current cell value to new value.
+        sheet_name (str, optional): The name of the worksheet. Defaults to "research_data".
+
+    Returns:
+        int: Number of cells updated.
+    """
+    worksheet = sh.worksheet(sheet_name)
+    col = worksheet.row_values(1).index(column_name) + 1
+    updates = [
+        {'range': gspread.utils.rowcol_to_a1(row, col), 'values': [[replacements[value]]]}
+        for row, value in enumerate(worksheet.col_values(col)[1:], start=2)
+        if value in replacements
+    ]
+    if updates:
+        worksheet.batch_update(updates)
+    return len(updates)
+
+def _check_row(sheet_name: str, row: int, expected: dict):
+    current = get_cells(sheet_name, list(expected), [row]).get(row, {})
+    changed = [col for col, value in expected.items() if str(current.get(col, "")) != str(value)]
+    if changed:
+        raise RowConflictError(f"Row {row} of {sheet_name} changed since it was read: {', '.join(changed)}")
+
+def update_row_cells(row: int, expected: dict, changes: dict, sheet_name: str = "research_data"):
+    """
+    Writes only the changed cells of one row, if the row still holds the expected values.
+
+    The check is optimistic: expected should hold the row's 'id' and 'created_at'
+    plus the values the caller saw in every column it changes.
+
+    Args:
+        row (int): Sheet row number.
+        expected (dict): Column header to the value the caller read.
+        changes (dict): Column header to new value.
+        sheet_name (str, optional): The name of the worksheet. Defaults to "research_data".
+
+    Raises:
+        RowConflictError: If any expected value differs from the sheet.
+    """
+    _check_row(sheet_name, row, expected)
+    header = get_header(sheet_name)
+    sh.worksheet(sheet_name).batch_update([
+        {'range': gspread.utils.rowcol_to_a1(row, header.index(col) + 1), 'values': [[value]]}
+        for col, value in changes.items()
+    ])
+
+def delete_row(row: int, expected: dict, sheet_name: str = "research_data"):
+    """
+    Deletes one row if it still holds the expected values.
+
+    Args:
+        row (int): Sheet row number.
+        expected (dict): Column header to the value the caller read, usually 'id' and 'created_at'.
+        sheet_name (str, optional): The name of the worksheet. Defaults to "research_data".
+
+    Raises:
+        RowConflictError: If any expected value differs from the sheet.
+    """
+    _check_row(sheet_name, row, expected)
+    sh.worksheet(sheet_name).delete_rows(row)
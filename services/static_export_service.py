@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+from services import catalog_service as cs
+from services import citation_service as cit
+from services import drive_service as ds
+from services import local_store
+from services import shared_cache as sc
+
+EXPORT_DIR = os.environ.get("ELAMP_STATIC_EXPORT_DIR", os.path.join("dist", "catalog"))
+MANIFEST_NAME = "manifest.json"
+# Papers per JSON shard
+PAGE_SIZE = 50
+# Shortest word kept in the search index
+MIN_TERM_LENGTH = 2
+
+
+def _slugify(text):
+    return re.sub(r"[^a-z0-9]+", "-", str(text).lower()).strip("-") or "author"
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _year(value):
+    return None if pd.isna(value) else int(value)
+
+def build_records(research_df, abstracts):
+    """
+    Converts the catalog into the plain records stored in the JSON shards.
+
+    Args:
+        research_df (pd.DataFrame): The catalog from load_research_data.
+        abstracts (pd.Series): Abstracts indexed by paper id (str).
+
+    Returns:
+        list[dict]: One record per paper, in catalog order.
+    """
+    slugs = {}
+    taken = set()
+    records = []
+    for row in research_df.itertuples(index=False):
+        author = str(row.author_name)
+        if author not in slugs:
+            slug = _slugify(author)
+            n = 2
+            while slug in taken:
+                slug = f"{_slugify(author)}-{n}"
+                n += 1
+            slugs[author] = slug
+            taken.add(slug)
+        records.append({
+            "id": str(row.id),
+            "title": str(row.title),
+            "author": author,
+            "author_slug": slugs[author],
+            "author_img_url": str(row.author_img_url),
+            "category": str(row.category),
+            "year": _year(row.created_year),
+            "keywords": [k.strip() for k in str(row.keywords).split(",") if k.strip()],
+            "abstract": abstracts.get(str(row.id), ""),
+            "file_url": str(row.file_url),
+            "download_url": ds.get_download_url(row.file_url) if ds.get_file_id(row.file_url) else "",
+            "cite_apa": str(row.cite_apa),
+            "cite_mla": str(row.cite_mla),
+        })
+    return records
+
+def build_search_index(records):
+    """
+    Builds a compact inverted index for client-side search.
+
+    Returns:
+        dict: 'docs' holds [title, author, year] per paper in catalog order, so results
+              render without loading shards; a paper's shard is its position // page_size.
+              'terms' maps each lowercase word to the gaps between the positions of the
+              papers containing it, which keeps the numbers small.
+    """
+    postings = {}
+    for position, record in enumerate(records):
+        text = " ".join([record["title"], record["author"], " ".join(record["keywords"])]).lower()
+        for term in set(re.findall(r"\w+", text)):
+            if len(term) >= MIN_TERM_LENGTH:
+                postings.setdefault(term, []).append(position)
+    terms = {}
+    for term in sorted(postings):
+        positions = postings[term]
+        terms[term] = [positions[0]] + [b - a for a, b in zip(positions, positions[1:])]
+    return {
+        "docs": [[r["title"], r["author"], r["year"]] for r in records],
+        "terms": terms,
+    }
+
+def build_author_pages(records):
+    """Return one page per author slug with the author's details and papers"""
+    pages = {}
+    for position, record in enumerate(records):
+        page = pages.setdefault(record["author_slug"], {
+            "name": record["author"],
+            "img_url": record["author_img_url"],
+            "papers": [],
+        })
+        page["papers"].append({"id": record["id"], "title": record["title"], "year": record["year"], "position": position})
+    return pages
+
+def build_bundle(research_df, abstracts):
+    """
+    Builds every file of the static bundle in memory.
+
+    Returns:
+        dict: Logical name (e.g. "papers/page-0.json") to file content.
+    """
+    records = build_records(research_df, abstracts)
+    files = {}
+    for start in range(0, len(records), PAGE_SIZE):
+        files[f"papers/page-{start // PAGE_SIZE}.json"] = _dumps(records[start:start + PAGE_SIZE])
+    files["search/index.json"] = _dumps(build_search_index(records))
+    author_pages = build_author_pages(records)
+    files["authors/index.json"] = _dumps(sorted(
+        [{"slug": slug, "name": page["name"], "papers": len(page["papers"])} for slug, page in author_pages.items()],
+        key=lambda a: a["name"].lower()
+    ))
+    for slug, page in author_pages.items():
+        files[f"authors/{slug}.json"] = _dumps(page)
+    for fmt, extension in cit.FORMATS.items():
+        files[f"citations/{fmt.lower()}.{extension}"] = "".join(cit.iter_citations(research_df, fmt)).encode("utf-8")
+    return files
+
+def _fingerprinted(name, content):
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    stem, extension = os.path.splitext(name)
+    return f"{stem}.{digest}{extension}"
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = local_store.temp_path(path)
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+def _bundle_fingerprint(paths):
+    # The names carry content hashes, so any change to any file, abstracts included, changes this
+    return hashlib.sha256("\n".join(f"{name}={path}" for name, path in sorted(paths.items())).encode("utf-8")).hexdigest()[:16]
+
+def _read_manifest(export_dir):
+    try:
+        with open(os.path.join(export_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def export_catalog(export_dir=EXPORT_DIR, force=False):
+    """
+    Writes the static catalog bundle, skipping work that the last export already did.
+
+    Every file except manifest.json has a content hash in its name, so CDNs can cache
+    them forever. Unchanged files are not rewritten, and nothing is written when the
+    bundle's fingerprint matches the last export. Files used by the previous manifest
+    are kept for clients still holding it; those of the export before it are deleted.
+
+    Args:
+        export_dir (str, optional): Output folder. Defaults to EXPORT_DIR.
+        force (bool, optional): Write a new manifest even if the bundle did not change.
+
+    Returns:
+        dict: 'version', 'written', 'unchanged' and 'removed' file counts, or
+              'skipped': True when the bundle was already current.
+
+    Raises:
+        ValueError: If export_dir is a non-empty folder without a manifest from an earlier export.
+    """
+    # The same snapshot the app serves; abstracts are not part of its version, so they are compared below
+    research_df = cs.load_research_data(sc.current_version(cs.CATALOG))
+    version = cs.catalog_version(research_df)
+    files = build_bundle(research_df, cs.load_abstract_column())
+    paths = {name: _fingerprinted(name, content) for name, content in files.items()}
+    fingerprint = _bundle_fingerprint(paths)
+    previous = _read_manifest(export_dir)
+    if previous is None and os.path.isdir(export_dir) and os.listdir(export_dir):
+        # Not a folder an earlier export created, e.g. a mistyped path or the repository itself
+        raise ValueError(f"{export_dir} is not empty and has no {MANIFEST_NAME}; choose an empty or new folder")
+    if previous and previous.get("fingerprint") == fingerprint and not force:
+        return {"version": version, "skipped": True}
+
+    written = unchanged = 0
+    for name, content in files.items():
+        path = paths[name]
+        if os.path.exists(os.path.join(export_dir, path)):
+            unchanged += 1
+        else:
+            _write(os.path.join(export_dir, path), content)
+            written += 1
+
+    manifest = {
+        "version": version,
+        "fingerprint": fingerprint,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "page_size": PAGE_SIZE,
+        "papers": len(research_df),
+        "pages": (len(research_df) + PAGE_SIZE - 1) // PAGE_SIZE,
+        "files": paths,
+        "previous_files": sorted(previous["files"].values()) if previous else [],
+    }
+    _write(os.path.join(export_dir, MANIFEST_NAME), json.dumps(manifest, indent=1).encode("utf-8"))
+
+    # Only files an earlier export wrote are deleted; anything else in the folder is left alone
+    keep = set(paths.values()) | set(manifest["previous_files"]) | {MANIFEST_NAME}
+    removed = 0
+    for path in sorted(set(previous.get("previous_files", [])) - keep if previous else []):
+        try:
+            os.remove(os.path.join(export_dir, path))
+            removed += 1
+        except OSError:
+            pass
+    return {"version": version, "written": written, "unchanged": unchanged, "removed": removed}
+
+if __name__ == "__main__":
+    # Export command: python -m services.static_export_service [output folder] [--force]
+    args = [a for a in sys.argv[1:] if a != "--force"]
+    try:
+        result = export_catalog(args[0] if args else EXPORT_DIR, force="--force" in sys.argv[1:])
+    except ValueError as e:
+        sys.exit(str(e))
+    if result.get("skipped"):
+        print(f"Catalog {result['version']} is already exported")
+    else:
+        print(
+            f"Exported catalog {result['version']}: {result['written']} files written, "
+            f"{result['unchanged']} unchanged, {result['removed']} removed"
+        )
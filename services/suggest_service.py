@@ -0,0 +1,114 @@
+import re
+from bisect import bisect_left
+from collections import Counter
+
+import streamlit as st
+
+from services import catalog_service as cs
+from services import shared_cache as sc
+
+# Suggestion kinds, in the order they are offered
+AUTHOR, KEYWORD, TITLE = 0, 1, 2
+KIND_LABELS = {AUTHOR: "Author", KEYWORD: "Keyword", TITLE: "Title"}
+
+# Index keys are truncated; nobody types further than this before choosing
+MAX_KEY_CHARS = 48
+# Upper bound on index entries inspected per lookup, keeps every lookup O(log n + MAX_SCAN)
+MAX_SCAN = 256
+
+
+def normalize(text):
+    """Casefold and collapse whitespace and punctuation so spellings of a name compare equal"""
+    return " ".join(re.sub(r"[^\w\s]", " ", str(text).casefold()).split())
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index over titles, canonical author names and keywords.
+
+    Every word start of a suggestion is indexed, so "ulcer" finds
+    "Pressure Ulcer Prevention". Lookups are a binary search followed by a
+    bounded forward scan.
+    """
+
+    def __init__(self, suggestions):
+        # suggestions: list of (display text, kind, weight)
+        self.displays = [display for display, _, _ in suggestions]
+        self.kinds = [kind for _, kind, _ in suggestions]
+        self.weights = [weight for _, _, weight in suggestions]
+
+        entries = []
+        for entry_id, display in enumerate(self.displays):
+            words = normalize(display).split()
+            for start in range(len(words)):
+                entries.append((" ".join(words[start:])[:MAX_KEY_CHARS], entry_id))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.entry_ids = [entry_id for _, entry_id in entries]
+
+    def lookup(self, prefix, k=8):
+        """
+        Returns up to k suggestions whose words start with the prefix.
+
+        Args:
+            prefix (str): What the user has typed so far.
+            k (int, optional): Maximum suggestions. Defaults to 8.
+
+        Returns:
+            list[tuple[str, str]]: (display text, kind label) pairs, authors then keywords then titles, most used first.
+        """
+        prefix = normalize(prefix)[:MAX_KEY_CHARS]
+        if not prefix:
+            return []
+        pos = bisect_left(self.keys, prefix)
+        end = min(pos + MAX_SCAN, len(self.keys))
+        found = set()
+        while pos < end and self.keys[pos].startswith(prefix):
+            found.add(self.entry_ids[pos])
+            pos += 1
+        ranked = sorted(found, key=lambda e: (self.kinds[e], -self.weights[e], self.displays[e]))[:k]
+        return [(self.displays[e], KIND_LABELS[self.kinds[e]]) for e in ranked]
+
+def canonical_authors(author_names):
+    """
+    Groups spellings of the same author and picks the most common one.
+
+    Args:
+        author_names (Iterable[str]): Author names as entered on each paper.
+
+    Returns:
+        dict: Canonical display name to number of papers.
+    """
+    spellings = {}
+    for name in author_names:
+        name = " ".join(str(name).split())
+        if not name:
+            continue
+        spellings.setdefault(normalize(name), Counter())[name] += 1
+    return {counts.most_common(1)[0][0]: sum(counts.values()) for counts in spellings.values()}
+
+def build_prefix_index(research_df):
+    """Builds the prefix index for a catalog frame"""
+    suggestions = [
+        (name, AUTHOR, count)
+        for name, count in canonical_authors(research_df['author_name']).items()
+    ]
+    keyword_counts = Counter()
+    keyword_display = {}
+    for keywords in research_df['keywords'].dropna().astype(str):
+        for keyword in keywords.split(','):
+            keyword = " ".join(keyword.split())
+            if keyword:
+                keyword_counts[normalize(keyword)] += 1
+                keyword_display.setdefault(normalize(keyword), keyword)
+    suggestions += [(keyword_display[key], KEYWORD, count) for key, count in keyword_counts.items()]
+    suggestions += [(" ".join(str(title).split()), TITLE, 1) for title in research_df['title'].dropna()]
+    return PrefixIndex(suggestions)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _get_prefix_index(version, _research_df):
+    return sc.get_or_build(f"prefix:{version}", lambda: build_prefix_index(_research_df))
+
+def get_prefix_index(research_df):
+    """Return the prefix index for the current data version, building it once per version"""
+    return _get_prefix_index(cs.catalog_version(research_df), research_df)
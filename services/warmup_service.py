@@ -0,0 +1,187 @@
+import atexit
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Author thumbnails fetched ahead of the first visitor
+PREFETCH_IMAGES = 50
+# Wait before retrying a failed warm-up, e.g. while Sheets is unreachable
+RETRY_SECONDS = 30
+# Time between checks for the Streamlit runtime when started by the launcher
+RUNTIME_POLL_SECONDS = 0.1
+# Optional readiness probe: an HTTP port serving /ready, and/or a file that exists while ready
+READY_PORT = os.environ.get("ELAMP_READY_PORT", "")
+READY_FILE = os.environ.get("ELAMP_READY_FILE", "")
+
+WARMING, READY, FAILED = "warming", "ready", "failed"
+
+_state = {"status": WARMING, "step": "Starting", "started_at": None, "ready_at": None, "error": None}
+_state_lock = threading.Lock()
+_started = False
+_start_lock = threading.Lock()
+
+
+def _set_state(**changes):
+    with _state_lock:
+        _state.update(changes)
+
+def status():
+    """Return the warm-up status, current step, timings and last error"""
+    with _state_lock:
+        return dict(_state)
+
+def is_ready():
+    """Return True once the catalog and its indexes are loaded in this process"""
+    with _state_lock:
+        return _state["status"] == READY
+
+def is_warming():
+    """Return True while the first warm-up attempt is still running"""
+    with _state_lock:
+        return _state["status"] == WARMING
+
+def popular_author_images(research_df, limit=PREFETCH_IMAGES):
+    """
+    Picks the author images visitors are most likely to open first.
+
+    Args:
+        research_df (pd.DataFrame): The catalog.
+        limit (int, optional): Number of images. Defaults to PREFETCH_IMAGES.
+
+    Returns:
+        list[str]: Drive links, authors with the most viewed papers first,
+                   then authors with the most papers.
+    """
+    from services import metrics_service as ms
+
+    views = research_df['id'].astype(str).map(ms.get_totals(ms.VIEW)).fillna(0)
+    ranking = (
+        research_df.assign(_views=views.to_numpy(), _papers=1)
+        .groupby('author_img_url', observed=True)[['_views', '_papers']].sum()
+        .sort_values(['_views', '_papers'], ascending=False)
+    )
+    return [url for url in ranking.index if url][:limit]
+
+def warm_up():
+    """
+    Loads the catalog, builds every derived structure and prefetches popular author images.
+
+    Everything is cached process-wide, so sessions that start afterwards find it ready.
+    """
+    from services import catalog_service as cs
+    from services import facet_service as fc
+    from services import image_service as img
+    from services import recommender_service as rs
+    from services import researcher_service as rd
+    from services import search_service as se
+    from services import suggest_service as sg
+
+    _set_state(step="Loading the catalog")
+    research_df = cs.get_research_data(fulltext=True)
+    _set_state(step="Building search indexes")
+    cs.get_positions(research_df)
+    se.get_search_text(research_df)
+    fc.get_facet_index(research_df)
+    sg.get_prefix_index(research_df)
+    rd.get_directory(research_df)
+    _set_state(step="Finding related papers")
+    rs.get_related_index(research_df)
+    _set_state(step="Fetching author photos")
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(img.fetch_drive_image, popular_author_images(research_df)))
+
+def _wait_for_runtime():
+    # st.cache_data only stores into the server's caches once the runtime exists;
+    # before that, warmed entries would land in a throwaway in-memory cache
+    from streamlit import runtime
+
+    while not runtime.exists():
+        time.sleep(RUNTIME_POLL_SECONDS)
+
+def _run():
+    _wait_for_runtime()
+    _set_state(started_at=time.time())
+    while True:
+        try:
+            warm_up()
+            break
+        except Exception as e:
+            logger.exception("Warm-up failed, retrying in %d seconds", RETRY_SECONDS)
+            _set_state(status=FAILED, error=str(e))
+            time.sleep(RETRY_SECONDS)
+    _set_state(status=READY, step="Ready", ready_at=time.time(), error=None)
+    state = status()
+    logger.info("Warm-up finished in %.1f s", state["ready_at"] - state["started_at"])
+    if READY_FILE:
+        with open(READY_FILE, "w") as f:
+            f.write(str(os.getpid()))
+
+def _remove_ready_file():
+    if READY_FILE:
+        try:
+            os.remove(READY_FILE)
+        except OSError:
+            pass
+
+
+class _ProbeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/live":
+            code = 200
+        elif self.path == "/ready":
+            code = 200 if is_ready() else 503
+        else:
+            code = 404
+        body = status()["status"].encode() if code != 404 else b"not found"
+        self.send_response(code)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def _start_probe_server(port):
+    server = ThreadingHTTPServer(("0.0.0.0", port), _ProbeHandler)
+    threading.Thread(target=server.serve_forever, name="readiness-probe", daemon=True).start()
+    logger.info("Readiness probe listening on port %d", port)
+
+def start():
+    """
+    Starts the warm-up thread and the readiness probe once per process.
+
+    Safe to call on every script run; only the first call does anything. When called
+    before the server is up, as by the launcher below, the warm-up waits for its runtime.
+    """
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    # A ready file left by a previous process must not let traffic in early
+    _remove_ready_file()
+    atexit.register(_remove_ready_file)
+    if READY_PORT:
+        try:
+            _start_probe_server(int(READY_PORT))
+        except OSError as e:
+            logger.error("Could not start the readiness probe on port %s: %s", READY_PORT, e)
+    threading.Thread(target=_run, name="warm-up", daemon=True).start()
+
+if __name__ == "__main__":
+    # Launcher that starts the readiness probe right away and warms the caches as soon as the server's runtime exists:
+    # python -m services.warmup_service [streamlit run options]
+    from streamlit.web import cli
+    # Through the package so the pages see the same warm-up state
+    from services import warmup_service
+
+    warmup_service.start()
+    sys.argv = ["streamlit", "run", "streamlit_app.py", *sys.argv[1:]]
+    sys.exit(cli.main())
@@ -0,0 +1,51 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Process pool shared by every session of this server process
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_process_pool():
+    """
+    Returns the process-wide worker pool, creating it on first use.
+
+    Workers are started with "spawn" so they never inherit the Streamlit
+    server's threads or open sockets.
+
+    Returns:
+        ProcessPoolExecutor: The shared pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            max_workers = int(os.environ.get("ELAMP_WORKER_PROCESSES", "2"))
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error("Background task failed: %s", error)
+
+def submit(fn, *args):
+    """
+    Runs a picklable, module-level function in a worker process without waiting for it.
+
+    Args:
+        fn (callable): The task to run.
+        *args: Arguments passed to the task.
+
+    Returns:
+        concurrent.futures.Future: The future of the task; failures are logged.
+    """
+    future = get_process_pool().submit(fn, *args)
+    future.add_done_callback(_log_failure)
+    return future
@@ -1,6 +1,7 @@
 import streamlit as st
 import os
 from services.auth_service import login_page
+from services import profiler_service as prof
 
 # Page configuration
 st.set_page_config(page_title="E-LAMP", page_icon="static/images/MC_MIDNURSING_Logo.gif", layout="wide", initial_sidebar_state="collapsed")
@@ -12,15 +13,16 @@ with open("static/styles.css") as css:
 login = st.Page(login_page, title="Login", icon="🔑")
 admin = st.Page("interfaces/admin.py", title="Admin", icon="🏠", default=True)
 visitor = st.Page("interfaces/visitor.py", title="Visitor", icon="📊")
+researchers = st.Page("interfaces/researchers.py", title="Researchers", icon="🧑‍🔬")
 about = st.Page("about_us.py", title="About Us", icon="ℹ️")
 
 # Set up navigation based on authentication status and authorization
 if not st.experimental_user.is_logged_in or st.experimental_user.email not in st.secrets.allowed_users.emails:
     # Only show login page if not authenticated or not authorized
-    pg = st.navigation([login, visitor, about], position="hidden")  
+    pg = st.navigation([login, visitor, researchers, about], position="hidden")  
 else:
     # Show all pages if authenticated and authorized
-    pg = st.navigation([admin])
+    pg = st.navigation([admin, researchers])
 
-# Run the selected page
-pg.run()
\ No newline at end of file
+# Run the selected page, under the sampling profiler when an admin turned it on for this session
+prof.run_profiled(st.session_state, pg.title, pg.run)
\ No newline at end of file